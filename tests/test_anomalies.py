@@ -0,0 +1,126 @@
+import collections
+from itertools import count
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from usherwood_ds.time_series.anomalies import detect_anomalies, StreamingAnomalyDetector
+from usherwood_ds.time_series.time_series_funcs import explain_anomalies, explain_anomalies_rolling_std
+
+
+def make_series(n=60, n_series=3, seed=0):
+    rng = np.random.RandomState(seed)
+    y = rng.poisson(20, (n, n_series)).astype(np.float64)
+    # planted spikes and a drop, where the series is long enough
+    y[[i for i in [7, 30, 31] if i < n], 0] += 40
+    y[[i for i in [15] if i < n], 1] = 0
+
+    return y
+
+
+def loop_explain_anomalies(y, window_size, sigma=1.0):
+    """The original explain_anomalies"""
+
+    avg = np.convolve(y, np.ones(int(window_size)) / float(window_size), 'same').tolist()
+    residual = y - avg
+    std = np.std(residual)
+
+    anomalies_dict = collections.OrderedDict([(index, y_i) for index, y_i, avg_i in zip(count(), y, avg)
+                                              if (y_i > avg_i + (sigma * std)) | (y_i < avg_i - (sigma * std))])
+
+    return {'standard_deviation': round(std, 3), 'anomalies_dict': anomalies_dict}
+
+
+def loop_explain_anomalies_rolling_std(y, window_size, sigma=1.0):
+    """The original explain_anomalies_rolling_std, with pd.rolling_std and .ix in their current spellings"""
+
+    avg = np.convolve(y, np.ones(int(window_size)) / float(window_size), 'same')
+    avg_list = avg.tolist()
+    residual = y - avg
+    testing_std_as_df = pd.DataFrame(pd.Series(residual).rolling(window_size).std())
+    rolling_std = testing_std_as_df.replace(np.nan,
+                                            testing_std_as_df.iloc[window_size - 1]).round(3).iloc[:, 0].tolist()
+    std = np.std(residual)
+
+    return {'stationary standard_deviation': round(std, 3),
+            'anomalies_dict': collections.OrderedDict([(index, y_i)
+                                                       for index, y_i, avg_i, rs_i in zip(count(), y, avg_list,
+                                                                                          rolling_std)
+                                                       if (y_i > avg_i + (sigma * rs_i)) |
+                                                       (y_i < avg_i - (sigma * rs_i))])}
+
+
+@pytest.mark.parametrize('window_size', [3, 4, 10])
+@pytest.mark.parametrize('sigma', [1.0, 2.0])
+def test_explain_anomalies_match_the_loops(window_size, sigma):
+    y = make_series()
+
+    for series in y.T:
+        expected = loop_explain_anomalies(series, window_size, sigma)
+        found = explain_anomalies(pd.Series(series), window_size, sigma)
+        assert found['standard_deviation'] == pytest.approx(expected['standard_deviation'])
+        assert found['anomalies_dict'] == expected['anomalies_dict']
+
+        expected = loop_explain_anomalies_rolling_std(series, window_size, sigma)
+        found = explain_anomalies_rolling_std(pd.Series(series), window_size, sigma)
+        assert found['stationary standard_deviation'] == pytest.approx(expected['stationary standard_deviation'])
+        assert found['anomalies_dict'] == expected['anomalies_dict']
+
+
+@pytest.mark.parametrize('rolling_std', [False, True])
+def test_detect_anomalies_columns_match_the_loops(rolling_std):
+    y = make_series()
+    loop = loop_explain_anomalies_rolling_std if rolling_std else loop_explain_anomalies
+
+    events = detect_anomalies(pd.DataFrame(y), window_size=5, sigma=1.5, rolling_std=rolling_std)
+
+    assert events['anomalies'].shape == y.shape
+    for i, series in enumerate(y.T):
+        assert np.flatnonzero(events['anomalies'][:, i]).tolist() == list(loop(series, 5, 1.5)['anomalies_dict'])
+    # a planted spike is found
+    assert events['anomalies'][7, 0] and events['z_scores'][7, 0] > 1.5
+    residuals = y - events['moving_average']
+    np.testing.assert_allclose(events['z_scores'], residuals / events['standard_deviation'])
+
+
+def brute_force_z_scores(y, window_size):
+    z_scores = np.full(y.shape, np.nan)
+    for i in range(len(y)):
+        previous = y[max(0, i - window_size):i]
+        if len(previous) >= 2:
+            z_scores[i] = (y[i] - previous.mean(axis=0)) / previous.std(axis=0, ddof=1)
+
+    return z_scores
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 5, 60])
+def test_streaming_z_scores_match_a_rolling_window(n):
+    y = make_series(n=n)
+    # a constant series has a zero standard deviation once the window is full
+    y[:, 2] = 5
+
+    detector = StreamingAnomalyDetector(n_series=3, window_size=5, sigma=1.5)
+    anomalies, z_scores = detector.update_many(y)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = brute_force_z_scores(y, 5)
+
+    # the first two points have no window to compare with, the constant series none with any spread
+    assert np.isnan(z_scores[:2]).all()
+    assert np.isnan(z_scores[:, 2]).all()
+    np.testing.assert_allclose(z_scores, expected, rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(anomalies, np.abs(np.nan_to_num(expected, nan=0)) > 1.5)
+
+
+def test_streaming_point_by_point_matches_many():
+    y = make_series(n=20)
+
+    one = StreamingAnomalyDetector(n_series=3, window_size=4)
+    many = StreamingAnomalyDetector(n_series=3, window_size=4)
+
+    points = [one.update(values) for values in y]
+    anomalies, z_scores = many.update_many(y)
+
+    np.testing.assert_array_equal(np.array([a for a, _ in points]), anomalies)
+    np.testing.assert_allclose(np.array([z for _, z in points]), z_scores)
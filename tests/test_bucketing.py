@@ -0,0 +1,25 @@
+import numpy as np
+
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.bucketing import bucket_batches, feed_lengths
+
+
+def test_bucket_batches_groups_similar_lengths():
+    lengths = np.array([30, 2, 15, 3, 29, 1, 16])
+
+    batches = bucket_batches(lengths, batch_size=3)
+
+    assert [sorted(lengths[batch].tolist()) for batch in batches] == [[1, 2, 3], [15, 16, 29], [30]]
+    assert sorted(np.concatenate(batches).tolist()) == list(range(len(lengths)))
+
+
+def test_bucket_batches_shuffle_keeps_every_text():
+    batches = bucket_batches(np.arange(100), batch_size=7, shuffle=True)
+
+    assert sorted(np.concatenate(batches).tolist()) == list(range(100))
+
+
+def test_feed_lengths_gives_empty_texts_one_step():
+    lengths = feed_lengths([0, 4, 1])
+
+    assert lengths.dtype == np.int32
+    assert lengths.tolist() == [1, 4, 1]
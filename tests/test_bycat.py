@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from usherwood_ds.nlp.taxonomy.bycat import encoded_to_bycat_counts, week_numbers
+from usherwood_ds.nlp.taxonomy.category_matrix import CategoryMatrix
+
+
+def make_encoded(n=300, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({'e_' + str(i): (rng.rand(n) < .1 + .1 * i).astype(int) for i in range(4)})
+    df['e_empty'] = 0
+    df['e_single_week'] = 0
+    df.loc[:4, 'e_single_week'] = 1
+    for i in range(3):
+        df['c_' + str(i)] = (rng.rand(n) < .3).astype(int)
+    df['Sentiment'] = rng.choice([-1, 0, 1], n)
+    df['Date (Local)'] = pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.randint(0, 200, n), unit='D')
+    df.loc[:4, 'Date (Local)'] = pd.Timestamp('2016-03-02')
+
+    return df
+
+
+def loop_slopes(df, tax_cols, manual_range):
+    """The original per category resample and polyfit"""
+
+    dvolumedts = []
+    dsentimentdts = []
+    for tax in tax_cols:
+        sub = df[df[tax] == 1][['Sentiment']].copy()
+        sub['Volume'] = 1
+        sub.index = pd.to_datetime(df[df[tax] == 1]['Date (Local)'])
+        if manual_range is not None:
+            sub = sub.combine_first(pd.DataFrame(0, index=manual_range, columns=['Volume', 'Sentiment']))
+
+        weekly = sub.resample('W').sum().fillna(0)
+        x = np.arange(len(weekly))
+        if len(x) <= 1:
+            mv, ms = 0, 0
+        else:
+            mv = np.polyfit(x=x, y=weekly['Volume'].values.astype(float), deg=1)[0]
+            ms = np.polyfit(x=x, y=weekly['Sentiment'].values.astype(float), deg=1)[0]
+        dvolumedts.append(mv)
+        dsentimentdts.append(ms)
+
+    return np.array(dvolumedts), np.array(dsentimentdts)
+
+
+@pytest.mark.parametrize('manual_range', [None, pd.date_range('2015-12-01', '2016-09-01')])
+def test_slopes_match_the_per_category_fits(manual_range):
+    df = make_encoded()
+    tax_cols = [column for column in df.columns if column.startswith('e_')]
+
+    bycat_counts = encoded_to_bycat_counts(df.copy(), manual_range=manual_range)
+    dvolumedts, dsentimentdts = loop_slopes(df, tax_cols, manual_range)
+
+    assert bycat_counts.index.tolist() == tax_cols
+    np.testing.assert_allclose(bycat_counts['dVolume dt'].values, dvolumedts, atol=1e-9)
+    np.testing.assert_allclose(bycat_counts['dSentiment dt'].values, dsentimentdts, atol=1e-9)
+
+
+def test_counts_match_the_dense_cooccurrence():
+    df = make_encoded()
+    tax_cols = [column for column in df.columns if column.startswith('e_')]
+
+    bycat_counts = encoded_to_bycat_counts(df.copy(), prediction=False, include_sentiment=False)
+
+    cross_cols = ['c_0', 'c_1', 'c_2']
+    expected = df[tax_cols].T.dot(df[cross_cols])
+    expected.insert(0, 'Volume', df[tax_cols].sum().values)
+    pd.testing.assert_frame_equal(bycat_counts, expected, check_dtype=False)
+
+
+def test_categories_matrix_gives_the_same_counts():
+    df = make_encoded()
+    categories = CategoryMatrix.from_df(df, col_indicator='e_')
+
+    from_columns = encoded_to_bycat_counts(df.copy(), manual_range=None)
+    from_matrix = encoded_to_bycat_counts(df.drop(columns=categories.columns), manual_range=None, categories=categories)
+
+    pd.testing.assert_frame_equal(from_columns, from_matrix)
+
+
+def test_week_numbers_start_on_monday():
+    weeks = week_numbers(pd.Series(pd.to_datetime(['2016-02-28', '2016-02-29', '2016-03-06', '2016-03-07'])))
+
+    assert (weeks[1] - weeks[0], weeks[2] - weeks[1], weeks[3] - weeks[2]) == (1, 0, 1)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from usherwood_ds.nlp.taxonomy.category_matrix import CategoryMatrix
+from usherwood_ds.nlp.taxonomy.create_macro_tags import create_map, populate_df_with_macro_cats
+
+
+def make_df(n=200, seed=0):
+    rng = np.random.RandomState(seed)
+    tags = ['a.x', 'a.y', 'a.y.p', 'a.y.q', 'b', 'b.z', 'c']
+    df = pd.DataFrame({tag: (rng.rand(n) < .2).astype(int) for tag in tags}, index=np.arange(n) * 3)
+    df['Snippet'] = 'text'
+
+    return df, tags
+
+
+def test_from_df_round_trip():
+    df, tags = make_df()
+
+    categories = CategoryMatrix.from_df(df, columns=tags)
+
+    assert categories.shape == (len(df), len(tags))
+    pd.testing.assert_frame_equal(categories.to_df(), df[tags])
+    pd.testing.assert_frame_equal(categories.to_sparse_df().sparse.to_dense(), df[tags])
+    assert 'b.z' in categories and 'Snippet' not in categories
+    np.testing.assert_array_equal(categories['a.y'], df['a.y'].values == 1)
+    pd.testing.assert_series_equal(categories.counts(), df[tags].sum(), check_dtype=False)
+
+
+def test_from_df_col_indicator():
+    df = pd.DataFrame({'e_a': [1, 0, np.nan], 'e_b': [0, 2, 1], 'Other': [1, 1, 1]})
+
+    categories = CategoryMatrix.from_df(df, col_indicator='e_')
+
+    assert categories.columns == ['e_a', 'e_b']
+    assert categories.to_df().values.tolist() == [[1, 0], [0, 1], [0, 1]]
+
+
+def test_cooccurrence_matches_the_dense_product():
+    df, tags = make_df()
+    categories = CategoryMatrix.from_df(df, columns=tags)
+    other = np.random.RandomState(1).rand(len(df), 3)
+
+    np.testing.assert_array_equal(categories.cooccurrence(categories).toarray(), df[tags].T.dot(df[tags]).values)
+    np.testing.assert_allclose(categories.cooccurrence(other), df[tags].T.values.dot(other))
+
+
+def test_any_of_select_and_hstack():
+    df, tags = make_df()
+    categories = CategoryMatrix.from_df(df, columns=tags)
+
+    groups = categories.any_of({'a': ['a.x', 'a.y', 'missing'], 'c': ['c'], 'none': []})
+    np.testing.assert_array_equal(groups['a'], (df['a.x'] | df['a.y']).values == 1)
+    np.testing.assert_array_equal(groups['c'], df['c'].values == 1)
+    assert not groups['none'].any()
+
+    combined = categories.select(['c', 'b']).hstack(groups)
+    assert combined.columns == ['b', 'a', 'c', 'none']
+    np.testing.assert_array_equal(combined['c'], groups['c'])
+    assert combined.index.equals(df.index)
+
+
+def test_bad_shapes_and_names():
+    with pytest.raises(ValueError):
+        CategoryMatrix(np.zeros((2, 2)), ['a', 'a'])
+    with pytest.raises(ValueError):
+        CategoryMatrix(np.zeros((2, 2)), ['a', 'b', 'c'])
+
+
+def test_macro_cats_match_the_row_wise_or():
+    df, tags = make_df()
+    level_maps = create_map(tags)
+
+    populated = populate_df_with_macro_cats(df.copy(), level_maps)
+
+    # every summary is the OR of each tag at or below it
+    for summary in [summary for level_map in level_maps for summary in level_map]:
+        prefix = summary[:-len('-ALL')]
+        below = [tag for tag in tags if tag == prefix or tag.startswith(prefix + '.')]
+        np.testing.assert_array_equal(populated[summary].values, df[below].max(axis=1).values, err_msg=summary)
+    pd.testing.assert_frame_equal(populated[df.columns], df)
+
+
+def test_create_map_levels():
+    level_maps = create_map(['a.b.c', 'a.b.d', 'a.b', 'a.e', 'f'])
+
+    assert level_maps == [{'a.b-ALL': ['a.b.c', 'a.b.d', 'a.b']},
+                          {'a-ALL': ['a.b', 'a.b-ALL', 'a.e']}]
@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+import pytest
+
+from usherwood_ds.neural_networks.projects.convolutional.profile_picture_demographics.chunk_loader import ChunkLoader
+
+SIZES = [4, 3, 5]
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    image = 0
+    for i, size in enumerate(SIZES):
+        # every pixel of an image holds its image number, and its target the image number too
+        numbers = np.arange(image, image + size)
+        train_x = np.repeat(numbers, 2 * 2).reshape(size, 2, 2).astype(np.float32)
+        train_y = np.stack([numbers, -numbers], axis=1)
+        np.save(str(tmp_path / ('train_X' + str(i + 1) + '.npy')), train_x)
+        np.save(str(tmp_path / ('train_Y' + str(i + 1) + '.npy')), train_y)
+        image += size
+
+    return str(tmp_path) + '/'
+
+
+def images(chunk):
+    train_x, train_y, seconds = chunk
+    assert (train_x[:, 0, 0] == train_y[:, 0]).all() and (train_y[:, 1] == -train_y[:, 0]).all()
+    assert seconds >= 0
+
+    return train_y[:, 0].tolist()
+
+
+def test_chunks_in_disk_order_without_shuffle(data_path):
+    chunks = ChunkLoader(data_path, n_chunks=3, prefetch=1)
+
+    read = [images(chunk) for chunk in chunks]
+
+    assert len(chunks) == 3
+    assert read == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9, 10, 11]]
+
+
+def test_shuffled_chunks_mix_images_across_chunks(data_path):
+    np.random.seed(0)
+    chunks = ChunkLoader(data_path, n_chunks=3, prefetch=1, shuffle=True, mix_chunks=2)
+
+    epochs = [[images(chunk) for chunk in chunks] for _ in range(5)]
+
+    for read in epochs:
+        assert sorted(sum(read, [])) == list(range(12))
+        assert sorted(len(chunk) for chunk in read) == sorted(SIZES)
+    # the chunk order and the images within the chunks change from epoch to epoch
+    assert any(read != epochs[0] for read in epochs[1:])
+    disk_chunks = [set(np.searchsorted(np.cumsum(SIZES), chunk, side='right')) for read in epochs for chunk in read]
+    assert any(len(chunk) > 1 for chunk in disk_chunks)
+
+
+def test_read_failure_is_raised(data_path, monkeypatch):
+    chunks = ChunkLoader(data_path, n_chunks=3, prefetch=1)
+    read_chunk = chunks.read_chunk
+    calls = []
+
+    def failing_read_chunk(positions):
+        calls.append(positions)
+        if len(calls) == 2:
+            raise IOError('chunk unreadable')
+        return read_chunk(positions)
+
+    monkeypatch.setattr(chunks, 'read_chunk', failing_read_chunk)
+
+    read = []
+    with pytest.raises(IOError, match='chunk unreadable'):
+        for chunk in chunks:
+            read.append(images(chunk))
+    assert read == [[0, 1, 2, 3]]
+
+
+def test_leaving_early_stops_the_reader(data_path):
+    chunks = ChunkLoader(data_path, n_chunks=3, prefetch=1)
+    n_threads = threading.active_count()
+
+    iterator = iter(chunks)
+    next(iterator)
+    assert threading.active_count() == n_threads + 1
+    iterator.close()
+    assert threading.active_count() == n_threads
+
+    # a second epoch reads normally, the first one's reader has stopped
+    assert [images(chunk) for chunk in chunks] == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9, 10, 11]]
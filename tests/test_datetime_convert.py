@@ -0,0 +1,74 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil import tz
+
+from usherwood_ds.tools.datetime_convert import df_convert_gmt_to_local, get_zone
+
+
+def row_by_row(df, gmt_col='Date (GMT)', zone_col='Date (Local - Zone)'):
+    """The original conversion of one row at a time, unknown zones are left empty"""
+
+    local = []
+    for gmt_time, zone in zip(df[gmt_col], df[zone_col]):
+        if gmt_time is None or pd.isna(gmt_time):
+            local.append(None)
+        elif zone is None or pd.isna(zone) or zone == 'nan':
+            local.append(gmt_time)
+        elif tz.gettz(zone) is None:
+            local.append(None)
+        else:
+            local.append(gmt_time.replace(tzinfo=tz.gettz('UTC')).astimezone(tz.gettz(zone)))
+
+    return local
+
+
+def make_df():
+    zones = ['Europe/London', 'America/Sao_Paulo', None, 'Asia/Kolkata', 'nan', 'Not/AZone', 'Europe/London',
+             'America/Sao_Paulo', np.nan, 'Asia/Kolkata']
+    dates = [datetime.datetime(2018, 1, 1, 12, 0) + datetime.timedelta(days=40 * i, hours=i) for i in range(10)]
+    dates[3] = None
+
+    return pd.DataFrame({'Date (GMT)': dates, 'Date (Local - Zone)': zones}, index=range(10, 20))
+
+
+def same_time(found, expected):
+    if expected is None:
+        return found is None or pd.isna(found)
+    if expected.tzinfo is None:
+        # rows without a zone keep the gmt time as it was
+        return pd.Timestamp(found) == pd.Timestamp(expected) and pd.Timestamp(found).tzinfo is None
+
+    return pd.Timestamp(found) == expected and pd.Timestamp(found).utcoffset() == expected.utcoffset()
+
+
+def test_matches_row_by_row(capsys):
+    df = make_df()
+    expected = row_by_row(df)
+
+    df_convert_gmt_to_local(df)
+
+    assert df.index.tolist() == list(range(10, 20))
+    for found, want in zip(df['Date (Local)'], expected):
+        assert same_time(found, want), (found, want)
+    # the unknown zone is printed
+    assert 'Not/AZone' in capsys.readouterr().out
+
+
+def test_local_times_and_summer_time():
+    df = make_df()
+
+    df_convert_gmt_to_local(df)
+
+    london_winter, london_summer = df['Date (Local)'].iloc[0], df['Date (Local)'].iloc[6]
+    assert london_winter.hour == 12 and london_winter.utcoffset() == datetime.timedelta(0)
+    assert london_summer.utcoffset() == datetime.timedelta(hours=1)
+    assert df['Date (Local)'].iloc[9].utcoffset() == datetime.timedelta(hours=5, minutes=30)
+    # no date, and an unknown zone, are left empty
+    assert pd.isna(df['Date (Local)'].iloc[3]) and pd.isna(df['Date (Local)'].iloc[5])
+
+
+def test_get_zone_is_cached():
+    assert get_zone('Europe/London') is get_zone('Europe/London')
+    assert get_zone('Not/AZone') is None
@@ -0,0 +1,111 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('progressbar')
+
+from usherwood_ds.neural_networks.utils.feed_forward_network import NeuralNetwork, save_network, load_network, \
+    compute_scaling_stats
+
+
+def make_network(seed=0):
+    np.random.seed(seed)
+    return NeuralNetwork(input_nodes=4, hidden_layers=[6, 5], output_nodes=3, learning_rate=.2)
+
+
+def test_save_load_directory_round_trip(tmp_path):
+    network = make_network()
+    inputs = np.random.rand(10, 4)
+    filepath = str(tmp_path / 'network')
+
+    save_network(network, filepath)
+    loaded = load_network(filepath)
+
+    assert loaded.hnodes == [6, 5]
+    assert loaded.lr == .2
+    np.testing.assert_array_equal(loaded.query_many(inputs), network.query_many(inputs))
+    assert not [name for name in os.listdir(filepath) if name.endswith('.tmp')]
+
+
+def test_pickle_round_trip(tmp_path):
+    network = make_network()
+    filepath = str(tmp_path / 'network.pkl')
+
+    save_network(network, filepath)
+
+    for m, loaded_m in zip(network.m, load_network(filepath).m):
+        np.testing.assert_array_equal(m, loaded_m)
+
+
+def test_resave_does_not_touch_a_memory_mapped_network(tmp_path):
+    filepath = str(tmp_path / 'network')
+    first = make_network(0)
+    save_network(first, filepath)
+    mapped = load_network(filepath, mmap_mode='r')
+
+    second = make_network(1)
+    save_network(second, filepath)
+
+    # the mapped reader still sees the first save in full, a new load sees the second
+    for m, mapped_m in zip(first.m, mapped.m):
+        np.testing.assert_array_equal(m, mapped_m)
+    for m, loaded_m in zip(second.m, load_network(filepath).m):
+        np.testing.assert_array_equal(m, loaded_m)
+    assert len([name for name in os.listdir(filepath) if name.endswith('.npy')]) == len(second.m)
+
+
+def test_load_format_version_1(tmp_path):
+    network = make_network()
+    filepath = tmp_path / 'network'
+    filepath.mkdir()
+    for i, m in enumerate(network.m):
+        np.save(str(filepath / ('layer_' + str(i) + '.npy')), m)
+    with open(str(filepath / 'network.json'), 'w') as output:
+        json.dump({'format_version': 1, 'input_nodes': 4, 'hidden_layers': [6, 5], 'output_nodes': 3,
+                   'learning_rate': .2, 'dtype': 'float64'}, output)
+
+    for m, loaded_m in zip(network.m, load_network(str(filepath)).m):
+        np.testing.assert_array_equal(m, loaded_m)
+
+
+def test_load_rejects_newer_format(tmp_path):
+    filepath = str(tmp_path / 'network')
+    save_network(make_network(), filepath)
+    with open(os.path.join(filepath, 'network.json')) as input_f:
+        metadata = json.load(input_f)
+    metadata['format_version'] += 1
+    with open(os.path.join(filepath, 'network.json'), 'w') as output:
+        json.dump(metadata, output)
+
+    with pytest.raises(ValueError):
+        load_network(filepath)
+
+
+def test_train_from_disk_matches_in_memory_training(tmp_path):
+    np.random.seed(2)
+    train_X = np.random.rand(40, 4) * 10
+    train_Y = np.full((40, 3), .01)
+    train_Y[np.arange(40), np.random.randint(0, 3, 40)] = .99
+    x_filepath = str(tmp_path / 'x.npy')
+    y_filepath = str(tmp_path / 'y.npy')
+    np.save(x_filepath, train_X)
+    np.save(y_filepath, train_Y)
+    min_val, max_val = compute_scaling_stats(x_filepath, batch_size=7)
+
+    in_memory = make_network()
+    scaled = ((train_X - min_val) / (max_val - min_val)) * .98 + .01
+    for e in range(2):
+        for start in range(0, 40, 10):
+            in_memory.train_batch(scaled[start:start + 10], train_Y[start:start + 10])
+
+    from_disk = make_network()
+    checkpoint_path = str(tmp_path / 'checkpoint')
+    from_disk.train_from_disk(x_filepath, y_filepath, min_val, max_val, epochs=2, batch_size=10, checkpoint_every=3,
+                              checkpoint_path=checkpoint_path)
+
+    assert (min_val, max_val) == (train_X.min(), train_X.max())
+    for m, disk_m, checkpoint_m in zip(in_memory.m, from_disk.m, load_network(checkpoint_path).m):
+        np.testing.assert_allclose(m, disk_m)
+        np.testing.assert_allclose(m, checkpoint_m)
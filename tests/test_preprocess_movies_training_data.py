@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('emoji')
+pytest.importorskip('nltk')
+pytest.importorskip('gensim')
+
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.preprocess_movies_training_data import \
+    drop_unscored, check_scores, parse_balanced_df_to_id_shard
+
+
+def make_reviews():
+    return pd.DataFrame({'Cleaned': ['great film', 'awful', 'fine', 'no score', 'odd score'],
+                         'Score': [5, 1, 3, np.nan, 7]}, index=[10, 11, 12, 13, 14])
+
+
+def test_drop_unscored(capsys):
+    scored = drop_unscored(make_reviews())
+
+    assert scored['Cleaned'].tolist() == ['great film', 'awful', 'fine']
+    assert scored.index.tolist() == [0, 1, 2]
+    assert 'Dropped 2 reviews' in capsys.readouterr().out
+
+
+def test_check_scores():
+    reviews = make_reviews()
+
+    with pytest.raises(ValueError, match='2 reviews'):
+        check_scores(reviews, classes=[1, 2, 3, 4, 5])
+    with pytest.raises(ValueError, match='1 reviews'):
+        check_scores(reviews)
+    check_scores(drop_unscored(reviews), classes=[1, 2, 3, 4, 5])
+
+
+def test_id_shard_refuses_unscored_reviews(tmp_path):
+    with pytest.raises(ValueError, match='score'):
+        parse_balanced_df_to_id_shard(make_reviews(), vocab={}, gen_words=None, gen_emoji=None,
+                                      save_path=str(tmp_path) + '/')
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PIL')
+
+from PIL import Image
+
+from usherwood_ds.neural_networks.projects.convolutional.profile_picture_demographics.predict import list_images, \
+    image_batches, predict_images
+
+# author ID: grey level of the picture, None for a file that is not an image
+PICTURES = [('a', '.png', 10), ('b', '.bmp', 20), ('c', '.txt', None), ('d', '.jpg', None), ('e', '.PNG', 30),
+            ('f', '.png', 40), ('g', '.png', 60)]
+
+
+@pytest.fixture
+def path_to_images(tmp_path):
+    for author_id, extension, grey in PICTURES:
+        filepath = tmp_path / (author_id + extension)
+        if grey is None:
+            # d.jpg has an image extension but cannot be decoded
+            filepath.write_bytes(b'not an image')
+        else:
+            Image.new('RGB', (12, 6), (grey, grey, grey)).save(str(filepath), format=extension[1:].upper())
+
+    return str(tmp_path)
+
+
+class StubNet:
+    """Scores a batch by its mean pixel, so each prediction can be traced back to its picture"""
+
+    output_num_units = 3
+
+    def __init__(self):
+        self.batch_shapes = []
+
+    def predict_proba(self, batch):
+        self.batch_shapes.append(batch.shape)
+        means = batch.mean(axis=(1, 2, 3))
+        return np.stack([means, 100 - means, np.zeros(len(batch))], axis=1) / 100.
+
+
+def test_list_images(path_to_images):
+    author_ids, filepaths = list_images(path_to_images)
+
+    assert author_ids == ['a', 'b', 'd', 'e', 'f', 'g']
+    assert [filepath[-5:] for filepath in filepaths] == ['a.png', 'b.bmp', 'd.jpg', 'e.PNG', 'f.png', 'g.png']
+
+
+def test_image_batches_in_order_with_a_padded_last_batch(path_to_images, capsys):
+    author_ids, filepaths = list_images(path_to_images)
+
+    batches = list(image_batches(filepaths, batch_size=2, size=8, pixel_scale=.5, processes=2))
+
+    assert [positions.tolist() for _, positions in batches] == [[0, 1], [3, 4], [5]]
+    assert all(batch.shape == (2, 3, 8, 8) and batch.dtype == np.float32 for batch, _ in batches)
+    greys = [batch[:len(positions)].mean(axis=(1, 2, 3)).tolist() for batch, positions in batches]
+    assert greys == [[5, 10], [15, 20], [30]]
+    # the padding of the last batch is zeros
+    assert not batches[-1][0][1].any()
+    assert 'Could not read ' + filepaths[2] in capsys.readouterr().out
+
+
+def test_predict_images_with_a_stub_model(path_to_images):
+    author_ids, filepaths = list_images(path_to_images)
+    net = StubNet()
+
+    predictions = predict_images(net, author_ids, filepaths, batch_size=4, processes=1)
+
+    assert net.batch_shapes == [(4, 3, 227, 227), (4, 3, 227, 227)]
+    assert predictions.index.name == 'Author ID'
+    assert predictions.index.tolist() == ['a', 'b', 'e', 'f', 'g']
+    np.testing.assert_allclose(predictions['Age Bucket 0 Probability'], [.1, .2, .3, .4, .6], rtol=1e-5)
+    assert predictions['Age Bucket'].tolist() == [1, 1, 1, 1, 0]
+    assert list(predictions.columns) == ['Age Bucket'] + ['Age Bucket ' + str(i) + ' Probability' for i in range(3)]
+
+
+def test_predict_images_with_nothing_readable(tmp_path):
+    (tmp_path / 'x.jpg').write_bytes(b'not an image')
+    author_ids, filepaths = list_images(str(tmp_path))
+
+    predictions = predict_images(StubNet(), author_ids, filepaths, batch_size=4, processes=1)
+
+    assert len(predictions) == 0
+    assert len(predictions.columns) == 4
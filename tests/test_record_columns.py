@@ -0,0 +1,64 @@
+import pandas as pd
+
+from usherwood_ds.data_imports.import_classes.common_classes import TextMention, RecordColumns
+from usherwood_ds.data_imports.import_classes.youtube_classes import YoutubeTextComment
+from usherwood_ds.data_imports.unified_import import create_common_mention_df
+from usherwood_ds.data_imports.youtube_import import create_youtube_comment_df
+
+
+def make_comment(i):
+    comment = YoutubeTextComment()
+    comment.youtube_comment_id = 'c' + str(i % 4)
+    comment.domain = 'youtube.com'
+    comment.source = 'YoutubeAPI'
+    comment.youtube_author_id = 'a' + str(i)
+    comment.author_name = 'Author ' + str(i)
+    comment.date = '2018-10-1' + str(i) + 'T20:19:24.000Z'
+    comment.snippet = 'comment ' + str(i)
+    comment.youtube_video_id = 'v'
+    comment.like_count = i
+    comment.reply_count = 0
+
+    return comment
+
+
+def test_record_columns():
+    columns = RecordColumns(YoutubeTextComment.fields)
+    assert len(columns) == 0
+
+    columns.extend(make_comment(i) for i in range(3))
+    columns.append(make_comment(3))
+
+    assert len(columns) == 4
+    assert columns.to_dict()['snippet'] == ['comment 0', 'comment 1', 'comment 2', 'comment 3']
+    assert list(columns.to_dict(['ID'] + list(YoutubeTextComment.fields[1:])).keys())[0] == 'ID'
+
+
+def test_builders_take_record_columns():
+    comments = [make_comment(i) for i in range(6)]
+    columns = RecordColumns(YoutubeTextComment.fields)
+    for comment in comments:
+        columns.append(comment)
+
+    from_columns = create_youtube_comment_df(columns)
+
+    pd.testing.assert_frame_equal(from_columns, create_youtube_comment_df(comments))
+    assert from_columns['Youtube Comment ID'].tolist() == ['c0', 'c1', 'c2', 'c3']
+    assert from_columns['Publish Date'].iloc[1] == pd.Timestamp('2018-10-11 20:19:24')
+
+
+def test_common_mentions_from_record_columns():
+    mentions = []
+    for i in range(3):
+        mention = TextMention()
+        mention.doc_id = i
+        mention.dategmt = 1539202764 + i
+        mention.long, mention.lat = -0.1, 51.5
+        mentions.append(mention)
+    columns = RecordColumns(TextMention.fields)
+    columns.extend(mentions)
+
+    mentions_df = create_common_mention_df(columns)
+
+    pd.testing.assert_frame_equal(mentions_df, create_common_mention_df(mentions))
+    assert (mentions_df['Long'] == -0.1).all() and (mentions_df['Lat'] == 51.5).all()
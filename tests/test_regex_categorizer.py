@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from usherwood_ds.nlp.taxonomy.regex_categorizer import LocalCategorizer
+
+RULES = '''Category,Query
+# comments and blank lines are skipped
+
+coffee,\\bcoffee\\b|espresso
+tea,\\b(green|black) tea\\b
+price,\\$\\d+(\\.\\d\\d)?
+negation,^no\\b
+invalid,(unclosed
+coffee_brand,starbucks|costa coffee
+'''
+
+SNIPPETS = ['I love coffee', 'Espresso at Costa Coffee', 'green tea is $3.50', 'NO COFFEE TODAY', 'black tea',
+            'teapot', None, '', 'starbucks sells tea for $4', 'Coffees everywhere']
+
+
+@pytest.fixture
+def rulelist_filename(tmp_path):
+    filename = tmp_path / 'rules.csv'
+    filename.write_text(RULES, encoding='utf-8')
+
+    return str(filename)
+
+
+def categorize(rulelist_filename, **kwargs):
+    df = pd.DataFrame({'Url': ['u' + str(i) for i in range(len(SNIPPETS) * 3)], 'Cleaned Snippet': SNIPPETS * 3})
+    categorizer = LocalCategorizer(df=df, chunk_size=4, **kwargs)
+    categorizer.load_rule_list(rulelist_filename)
+    categorizer.categorize_rulefile(print_results_found=False)
+
+    return categorizer
+
+
+def test_pool_matches_serial(rulelist_filename):
+    serial = categorize(rulelist_filename, processes=1, prefilter=False).categories_df()
+
+    for processes, prefilter in [(1, True), (2, False), (2, True)]:
+        result = categorize(rulelist_filename, processes=processes, prefilter=prefilter).categories_df()
+        pd.testing.assert_frame_equal(result, serial)
+
+
+def test_categories_match_the_rules(rulelist_filename):
+    categories = categorize(rulelist_filename, processes=1).categories
+
+    assert categories.columns == ['coffee', 'tea', 'price', 'negation', 'coffee_brand']
+    assert categories.index.tolist()[:2] == ['u0', 'u1']
+    expected = {'coffee': [1, 1, 0, 1, 0, 0, 0, 0, 0, 0],
+                'tea': [0, 0, 1, 0, 1, 0, 0, 0, 0, 0],
+                'price': [0, 0, 1, 0, 0, 0, 0, 0, 1, 0],
+                'negation': [0, 0, 0, 1, 0, 0, 0, 0, 0, 0],
+                'coffee_brand': [0, 1, 0, 0, 0, 0, 0, 0, 1, 0]}
+    for category, matches in expected.items():
+        np.testing.assert_array_equal(categories[category], np.array(matches * 3) == 1, err_msg=category)
+    assert categories.counts().to_dict() == {'coffee': 9, 'tea': 6, 'price': 6, 'negation': 3, 'coffee_brand': 6}
+
+
+def test_load_rule_list_reads_regex_by_default(rulelist_filename):
+    categorizer = LocalCategorizer(df=pd.DataFrame({'Url': [], 'Cleaned Snippet': []}))
+
+    assert categorizer.load_rule_list(rulelist_filename)
+    assert categorizer.rulelist_filename == rulelist_filename
+    assert categorizer.rulelist[0] == ['Category', 'Query']
+    assert len(categorizer.rulelist) == 7
+
+    with pytest.raises(ImportError):
+        categorizer.load_rule_list(rulelist_filename, translate=True)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import regex
+
+from usherwood_ds.nlp.taxonomy import rule_prefilter
+from usherwood_ds.nlp.taxonomy.regex_categorizer import compile_rules, match_snippets
+from usherwood_ds.nlp.taxonomy.rule_prefilter import RulePrefilter, required_literals
+
+PATTERNS = [
+    r'\bpizza\b',
+    r'\b(pizza|burger)s?\b',
+    r'(?i:Coffee) (shop|house)',
+    r'(?-i:BBC)',
+    r'(?x) green \s+ tea  # verbose',
+    r'colou?r',
+    r'(ab)+c|xyz',
+    r'a{2,3}rgh',
+    r'(?:straße|road)',
+    r'ΟΔΟΣ',
+    r'(?=.*vegan)(?=.*cheese)',
+    r'(?>atomic)ally',
+    r'^\d+$',
+    r'(pizza){e<=1}',
+    r'\p{Lu}{3}',
+    r'[[:digit:]]{2}',
+    r'(?V1)[[a-z]--[aeiou]]{4}',
+    r'(?f)strasse',
+    r'\mcafe\M',
+]
+
+TEXTS = ['I want PIZZA', 'Two burgers please', 'coffee SHOP', 'COFFEE house', 'bbc news', 'BBC news',
+         'GREEN   tea', 'red colour', 'ababc', 'XYZ', 'aargh', 'aaaargh', 'Die Straße', 'DIE STRASSE', 'οδος',
+         'Οδός', 'ΟΔΟΣ', 'vegan cheese', 'cheese, vegan', 'atomically', '12345', 'pizze', 'piza', 'ABC',
+         '42 rhythm', 'brrr', 'cafe', 'encafe', '']
+
+
+def test_required_literals():
+    assert required_literals(r'\b(pizza|burger)s?\b') == {'pizza', 'burger'}
+    assert required_literals(r'(?-i:BBC)') == {'bbc'}
+    assert required_literals(r'straße') == {'strasse'}
+    assert required_literals(r'^\d+$') is None
+    assert required_literals(r'pizza|\d+') is None
+    assert required_literals(r'(unclosed') is None
+
+
+@pytest.mark.parametrize('pattern', [r'(pizza){e<=1}', r'\p{L}+ pizza', r'[[:alpha:]] pizza', r'\Lnames pizza',
+                                     r'(?V1)[[a-z]--[aeiou]] pizza', r'(?f)pizza', r'\mpizza\M', r'(?|(a)|(b)) pizza',
+                                     r'(pizza)(?1)'])
+def test_regex_only_syntax_is_always_run(pattern):
+    assert required_literals(pattern) is None
+
+
+def test_counted_repeats_are_analysed():
+    assert required_literals(r'pizza{1,2}') == {'pizz'}
+    assert required_literals(r'(pizza){2}') == {'pizza'}
+
+
+@pytest.mark.parametrize('use_automaton', [True, False])
+def test_prefilter_matches_the_full_scan(monkeypatch, use_automaton):
+    if use_automaton:
+        pytest.importorskip('ahocorasick')
+    else:
+        monkeypatch.setattr(rule_prefilter, 'ahocorasick', None)
+
+    compiled_rules = compile_rules([(str(j), pattern) for j, pattern in enumerate(PATTERNS)])
+    assert len(compiled_rules) == len(PATTERNS)
+
+    full = match_snippets(TEXTS, compiled_rules)
+    prefiltered = match_snippets(TEXTS, compiled_rules, RulePrefilter(PATTERNS))
+
+    assert sorted(zip(*full)) == sorted(zip(*prefiltered))
+    # the rules that need a literal are only run on some texts
+    prefilter = RulePrefilter(PATTERNS)
+    assert 0 < len(prefilter.always) < len(PATTERNS)
+    assert prefilter.candidate_rules('nothing relevant') == set(prefilter.always)
+
+
+def test_casefolded_text_finds_casefolded_literals():
+    prefilter = RulePrefilter([r'straße', r'οδος', r'(?f)strasse'])
+
+    assert prefilter.candidate_rules('STRASSE') >= {0, 2}
+    assert 1 in prefilter.candidate_rules('ΟΔΟΣ')
+    assert regex.search(r'οδος', 'ΟΔΟΣ', flags=regex.IGNORECASE)
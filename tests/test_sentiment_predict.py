@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('tensorflow')
+pytest.importorskip('emoji')
+
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.predict import bin_sentiments
+
+
+def test_bin_sentiments():
+    probabilities = np.array([[.5, .2, .1, .1, .1],
+                              [.1, .1, .1, .3, .4],
+                              [.2, .2, .2, .2, .2]])
+
+    binned = bin_sentiments(probabilities)
+
+    assert binned.tolist() == [-1, 1, 0]
+    assert bin_sentiments(probabilities[0]).tolist() == [-1]
+
+
+def test_unscored_texts_are_not_neutral():
+    probabilities = np.array([[.1, .1, .1, .3, .4],
+                              [np.nan] * 5,
+                              [.2, .2, .2, .2, .2]])
+
+    binned = bin_sentiments(probabilities)
+
+    assert binned[0] == 1 and binned[2] == 0
+    assert np.isnan(binned[1])
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from usherwood_ds.nlp.taxonomy.regex_categorizer import LocalCategorizer
+from usherwood_ds.nlp.taxonomy.spark_regex_categorizer import match_rule_indices
+
+RULES = '''Category,Query
+coffee,\\bcoffee\\b|espresso
+tea,\\b(green|black) tea\\b
+price,\\$\\d+(\\.\\d\\d)?
+invalid,(unclosed
+fuzzy,(latte){e<=1}
+'''
+
+SNIPPETS = ['I love coffee', 'Espresso at Costa Coffee', 'green tea is $3.50', 'a lattes please', 'black tea',
+            'teapot', '', 'tea for $4, "quoted", and a\nnew line']
+
+
+@pytest.fixture
+def files(tmp_path):
+    rulelist_filename = tmp_path / 'rules.csv'
+    rulelist_filename.write_text(RULES, encoding='utf-8')
+    df = pd.DataFrame({'Url': ['u' + str(i) for i in range(len(SNIPPETS))], 'Cleaned Snippet': SNIPPETS})
+    df_path = tmp_path / 'snippets.csv'
+    df.to_csv(str(df_path), index=False, encoding='utf-8')
+
+    return str(df_path), str(rulelist_filename), df
+
+
+def test_match_rule_indices():
+    rules = (('coffee', r'\bcoffee\b'), ('tea', r'tea'), ('any', r'\w+'))
+
+    matches = match_rule_indices(pd.Series(['coffee tea', None, 'TEA']), rules)
+
+    assert matches.tolist() == [[0, 1, 2], [], [1, 2]]
+
+
+def test_spark_matches_local(files):
+    pytest.importorskip('pyspark')
+    pytest.importorskip('pyarrow')
+    from usherwood_ds.nlp.taxonomy.spark_regex_categorizer import Categorizer, get_spark_session
+
+    df_path, rulelist_filename, df = files
+
+    spark = get_spark_session(master='local[*]', config={'spark.ui.enabled': 'false'})
+    categorizer = Categorizer(df_path, spark=spark)
+    categorizer.load_rule_list(rulelist_filename)
+    categorizer.categorize_rulefile(print_results_found=False)
+
+    local = LocalCategorizer(df=df, processes=1)
+    local.load_rule_list(rulelist_filename)
+    local.categorize_rulefile(print_results_found=False)
+
+    spark_df = categorizer.df.toPandas().set_index('Url').loc[df['Url']]
+    assert (spark_df['invalid'] == 2).all()
+
+    spark_categories = categorizer.to_category_matrix().select(local.categories.columns)
+    local_df = local.categories.to_df()
+    pd.testing.assert_frame_equal(spark_categories.to_df().loc[local_df.index], local_df)
+    assert local_df['fuzzy'].tolist() == [0, 0, 0, 1, 0, 0, 0, 0]
+
+
+def test_to_category_matrix_with_dotted_categories(tmp_path):
+    pytest.importorskip('pyspark')
+    pytest.importorskip('pyarrow')
+    from usherwood_ds.nlp.taxonomy.spark_regex_categorizer import Categorizer, get_spark_session
+
+    rulelist_filename = tmp_path / 'rules.csv'
+    rulelist_filename.write_text('Category,Query\ndrinks.coffee,coffee\ndrinks.tea (hot),\\btea\\b\n',
+                                 encoding='utf-8')
+    df_path = tmp_path / 'snippets.csv'
+    pd.DataFrame({'Url': ['u0', 'u1', 'u2'], 'Cleaned Snippet': ['coffee', 'tea and coffee', 'juice']}) \
+        .to_csv(str(df_path), index=False, encoding='utf-8')
+
+    spark = get_spark_session(master='local[*]', config={'spark.ui.enabled': 'false'})
+    categorizer = Categorizer(str(df_path), spark=spark)
+    categorizer.load_rule_list(str(rulelist_filename))
+    categorizer.categorize_rulefile(print_results_found=False)
+
+    categories = categorizer.to_category_matrix().to_df().loc[['u0', 'u1', 'u2']]
+
+    assert list(categories.columns) == ['drinks.coffee', 'drinks.tea (hot)']
+    assert categories['drinks.coffee'].tolist() == [1, 1, 0]
+    assert categories['drinks.tea (hot)'].tolist() == [0, 1, 0]
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from usherwood_ds.data_imports.twitter_api.stream_sink import StreamSink, read_segments
+
+
+def tweet_line(i):
+    return json.dumps({'id': i, 'text': 'tweet ' + str(i)})
+
+
+def segment_files(directory):
+    return sorted(os.listdir(str(directory)))
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_rotates_by_size_and_reads_back_in_order(tmp_path, compress):
+    path_prefix = str(tmp_path / 'out' / 'raw_tweets')
+
+    with StreamSink(path_prefix, max_bytes=200, max_seconds=None, compress=compress, flush_interval=.05) as sink:
+        for i in range(50):
+            sink.write(tweet_line(i) if i % 2 else tweet_line(i).encode('utf-8'))
+        sink.write('   \n')
+
+    files = segment_files(tmp_path / 'out')
+    assert len(files) == len(sink.segment_paths) > 1
+    assert not [name for name in files if name.endswith('.part')]
+    assert all(name.endswith('.ndjson.gz' if compress else '.ndjson') for name in files)
+    assert sink.n_written == 50
+    assert [tweet['id'] for tweet in read_segments(path_prefix)] == list(range(50))
+    assert list(read_segments(path_prefix, raw=True))[0] == tweet_line(0) + '\n'
+
+
+def test_rotates_by_time(tmp_path):
+    path_prefix = str(tmp_path / 'raw_tweets')
+
+    with StreamSink(path_prefix, max_bytes=None, max_seconds=0, flush_interval=.05) as sink:
+        for i in range(3):
+            sink.write(tweet_line(i))
+
+    assert len(segment_files(tmp_path)) == 3
+    assert [tweet['id'] for tweet in read_segments(path_prefix)] == [0, 1, 2]
+
+
+def test_quiet_stream_is_flushed_and_rotated(tmp_path):
+    path_prefix = str(tmp_path / 'raw_tweets')
+    sink = StreamSink(path_prefix, max_bytes=None, max_seconds=.1, flush_interval=.05)
+
+    sink.write(tweet_line(0))
+    time.sleep(.5)
+
+    # the segment was closed by the writer thread without a new tweet or close
+    assert segment_files(tmp_path) == [os.path.basename(sink.segment_paths[0])]
+    sink.close()
+
+
+def test_writer_errors_are_raised(tmp_path):
+    directory = tmp_path / 'out'
+    sink = StreamSink(str(directory / 'raw_tweets'), flush_interval=.05)
+    shutil.rmtree(str(directory))
+
+    sink.write(tweet_line(0))
+    with pytest.raises(FileNotFoundError):
+        sink.close()
+    with pytest.raises(FileNotFoundError):
+        sink.write(tweet_line(1))
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    sink = StreamSink(str(tmp_path / 'raw_tweets'), max_queue=1, flush_interval=.05)
+    release = threading.Event()
+    write_line = sink._write_line
+
+    def slow_write_line(data):
+        release.wait()
+        write_line(data)
+
+    sink._write_line = slow_write_line
+
+    sink.write(tweet_line(0))
+    while not sink.queue.empty():
+        time.sleep(.01)
+    for i in range(1, 4):
+        sink.write(tweet_line(i))
+    release.set()
+    sink.close()
+
+    assert (sink.n_written, sink.n_dropped) == (2, 2)
+    assert [tweet['id'] for tweet in read_segments(str(tmp_path / 'raw_tweets'))] == [0, 1]
+
+
+def test_listener_finishes_the_tail_segment(tmp_path, monkeypatch):
+    pytest.importorskip('tweepy')
+    from usherwood_ds.data_imports.twitter_api import api_class
+
+    monkeypatch.setattr(api_class.time, 'sleep', lambda seconds: None)
+    path_prefix = str(tmp_path / 'raw_tweets')
+    listener = api_class.StdOutListener(time_limit=60, stream_save_path=path_prefix + '.json', regex_rule='coffee')
+
+    for close in [lambda: listener.on_error(420), listener.on_timeout, lambda: listener.on_disconnect('notice'),
+                  listener.close_sink]:
+        assert listener.on_data(json.dumps({'id': 0, 'text': 'Coffee'}))
+        assert listener.on_data(json.dumps({'id': 1, 'text': 'tea'}))
+        close()
+        assert listener.sink is None
+        assert not [name for name in segment_files(tmp_path) if name.endswith('.part')]
+
+    assert [tweet['id'] for tweet in read_segments(path_prefix)] == [0, 0, 0, 0]
+    listener.close_sink()
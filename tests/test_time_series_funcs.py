@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from usherwood_ds.time_series.time_series_funcs import day_of_week_and_hour_cross, day_of_week_and_hour_crosses, \
+    create_cat_summary_table, create_cat_summary_tables, \
+    get_top_snippets_and_authors_per_anomoly_for_cat
+
+
+def make_mentions(n=600, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({'when: Year': rng.choice([2015, 2016, 2017, 2018], n),
+                       'when: Week': rng.randint(0, 53, n),
+                       'Sentiment': rng.choice([-1, 0, 1], n),
+                       'Reach': rng.randint(0, 1000, n)})
+    # make sure the week 0 rollover into the year before is exercised
+    df.loc[:9, 'when: Year'] = 2016
+    df.loc[:9, 'when: Week'] = 0
+    for i in range(3):
+        df['cat_' + str(i)] = (rng.rand(n) < .2 + .2 * i).astype(int)
+
+    return df
+
+
+def loop_summary(df, year_list, cat, sentiment_column_key='Sentiment', reach_column_key='Reach'):
+    """The original scan of df per year, week and category"""
+
+    sents = pd.get_dummies(df[sentiment_column_key])
+    sent_cols = ['Sentiment ' + str(col) for col in sents.columns]
+    sents.columns = sent_cols
+    df = pd.concat([df, sents], axis=1)
+
+    rows = []
+    for year in year_list:
+        for week in range(0, 53):
+            sub = df[(df['when: Year'] == year) & (df['when: Week'] == week) & (df[cat] == 1)]
+            if week == 0 and year != year_list[0]:
+                rows[-1][3] += len(sub)
+                rows[-1][4] += sub[sentiment_column_key].sum()
+                rows[-1][5] += sub[reach_column_key].sum()
+            else:
+                rows.append([int(str(year) + str(week)), year, week, len(sub), sub[sentiment_column_key].sum(),
+                             sub[reach_column_key].sum()] + [sub[col].sum() for col in sent_cols])
+
+    summary = pd.DataFrame(rows, columns=['ID', 'Year', 'Week', 'Volume', 'Sentiment', 'Reach'] + sent_cols)
+    summary['Week Cumm'] = np.arange(len(summary))
+
+    return summary
+
+
+@pytest.mark.parametrize('year_list', [[2015, 2016, 2017], [2016, 2018]])
+def test_summary_tables_match_the_loop(year_list):
+    df = make_mentions()
+    cats = ['cat_0', 'cat_1', 'cat_2']
+
+    summaries = create_cat_summary_tables(df, year_list, cats)
+
+    assert list(summaries.keys()) == cats
+    for cat in cats:
+        pd.testing.assert_frame_equal(summaries[cat], loop_summary(df, year_list, cat), check_dtype=False)
+    pd.testing.assert_frame_equal(create_cat_summary_table(df, year_list, 'cat_1'), summaries['cat_1'])
+
+
+def test_summary_tables_leave_df_alone():
+    df = make_mentions().drop(columns=['Reach'])
+    df.loc[3, 'when: Week'] = np.nan
+    original = df.copy()
+
+    summary = create_cat_summary_table(df, [2016], 'cat_0', categorical_sentiment=False)
+
+    pd.testing.assert_frame_equal(df, original)
+    assert summary.columns.tolist() == ['ID', 'Year', 'Week', 'Volume', 'Sentiment', 'Reach', 'Week Cumm']
+    assert len(summary) == 53
+    assert (summary['Reach'] == 0).all()
+    assert summary['Volume'].sum() == ((df['when: Year'] == 2016) & df['when: Week'].notna() &
+                                       (df['cat_0'] == 1)).sum()
+
+
+def test_top_snippets_and_authors_per_anomaly():
+    df = make_mentions()
+    rng = np.random.RandomState(1)
+    df['Snippet'] = rng.choice(['s' + str(i) for i in range(30)], len(df))
+    df['Username'] = rng.choice(['u' + str(i) for i in range(10)], len(df))
+    df.loc[10:14, ['when: Year', 'when: Week', 'cat_2']] = [2016, 52, 1]
+    df.loc[15:19, ['when: Year', 'when: Week', 'cat_2']] = [2017, 0, 1]
+
+    summary = pd.DataFrame({'Year': [2016, 2016, 2017, 2018], 'Week': [3, 52, 20, 60],
+                            'Anomaly': [True, True, False, True]})
+
+    top_snippets, top_authors, weeks, years = get_top_snippets_and_authors_per_anomoly_for_cat(
+        'cat_2', {'cat_2': summary}, df, top_n=5)
+
+    assert (weeks, years) == ([3, 52, 60], [2016, 2016, 2018])
+    for i, (year, week) in enumerate(zip(years, weeks)):
+        sub = df[(df['cat_2'] == 1) & (((df['when: Year'] == year) & (df['when: Week'] == week)) |
+                                       ((week == 52) & (df['when: Year'] == year + 1) & (df['when: Week'] == 0)))]
+        for field, tops in [('Snippet', top_snippets[i]), ('Username', top_authors[i])]:
+            counts = sub[field].value_counts()
+            assert tops.index.name == field
+            assert len(tops) == min(5, len(counts))
+            assert tops.to_dict() == {value: counts[value] for value in tops.index}
+            if len(counts) > 5:
+                assert tops.min() >= counts.iloc[5]
+    assert len(top_snippets[2]) == 0
+
+
+def make_day_hour_mentions(n=300, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({'when: Day of Week': rng.randint(0, 7, n).astype(float),
+                       'when: Hour of Day': rng.randint(0, 24, n).astype(float),
+                       'Reach': rng.randint(0, 1000, n).astype(float),
+                       'Client': rng.choice(['a', 'b', 'c'], n)})
+    # missing and out of range days and hours are left out of the grid
+    df.loc[0, 'when: Day of Week'] = np.nan
+    df.loc[1, 'when: Hour of Day'] = 24
+    df.loc[2, 'Reach'] = np.nan
+    df.loc[3, 'Client'] = None
+    for i in range(2):
+        df['cat_' + str(i)] = (rng.rand(n) < .3 + .3 * i).astype(int)
+
+    return df
+
+
+def slot_cross(df, dependent_variable):
+    """The grid filled by filtering df for each day and hour"""
+
+    cross = np.zeros((7, 24))
+    for day in range(7):
+        for hour in range(24):
+            sub = df[(df['when: Day of Week'] == day) & (df['when: Hour of Day'] == hour)]
+            cross[day, hour] = len(sub) if dependent_variable == 'Volume' else sub[dependent_variable].sum()
+
+    return cross
+
+
+@pytest.mark.parametrize('dependent_variable', ['Volume', 'Reach'])
+def test_day_of_week_and_hour_cross_matches_the_slot_filter(dependent_variable):
+    df = make_day_hour_mentions()
+
+    cross = day_of_week_and_hour_cross(df, dependent_variable)
+
+    assert cross.index.tolist() == ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    assert cross.columns.tolist() == list(range(24))
+    np.testing.assert_allclose(cross.values, slot_cross(df, dependent_variable))
+    if dependent_variable == 'Volume':
+        assert cross.values.sum() == len(df) - 2
+
+
+@pytest.mark.parametrize('dependent_variable', ['Volume', 'Reach'])
+def test_day_of_week_and_hour_crosses_match_the_slot_filter(dependent_variable):
+    df = make_day_hour_mentions()
+
+    segments = day_of_week_and_hour_crosses(df, dependent_variable, segment_col='Client')
+    categories = day_of_week_and_hour_crosses(df, dependent_variable, cats=['cat_0', 'cat_1'])
+
+    assert sorted(segments) == ['a', 'b', 'c']
+    for client, cross in segments.items():
+        np.testing.assert_allclose(cross.values, slot_cross(df[df['Client'] == client], dependent_variable))
+    assert list(categories) == ['cat_0', 'cat_1']
+    for cat, cross in categories.items():
+        np.testing.assert_allclose(cross.values, slot_cross(df[df[cat] == 1], dependent_variable))
+        assert cross.index.tolist() == ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
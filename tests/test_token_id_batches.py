@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+import pytest
+
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.token_id_batches import TokenIdBatches
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    for folder in ['ids', 'lengths', 'labels']:
+        (tmp_path / folder).mkdir()
+
+    review = 0
+    for shard, n_reviews in enumerate([7, 5]):
+        lengths = np.arange(1, n_reviews + 1, dtype=np.int32)
+        ids = np.zeros((n_reviews, 8), dtype=np.int32)
+        for row, length in enumerate(lengths):
+            # each review's tokens are its review number + 1, so the batches can be traced back
+            ids[row, :length] = review + 1
+            review += 1
+        labels = (np.arange(n_reviews) % 3).astype(np.int8)
+
+        name = 'f=' + str(shard) + 'b=0.npy'
+        np.save(str(tmp_path / 'ids' / ('train_ids' + name)), ids)
+        np.save(str(tmp_path / 'lengths' / ('train_lengths' + name)), lengths)
+        np.save(str(tmp_path / 'labels' / ('train_labels' + name)), labels)
+
+    return str(tmp_path) + '/'
+
+
+def test_batches_cover_every_review(data_path):
+    batches = TokenIdBatches(data_path, batch_size=3, n_classes=3, pool_batches=2, prefetch=1)
+
+    read = list(batches)
+
+    assert len(read) == len(batches) == 4
+    reviews = []
+    for ids, lengths, targets in read:
+        assert ids.shape[1] == lengths.max()
+        assert targets.shape == (len(ids), 3)
+        for row, length in zip(ids, lengths):
+            assert (row[:length] == row[0]).all() and (row[length:] == 0).all()
+            reviews.append(row[0] - 1)
+    assert sorted(reviews) == list(range(12))
+
+    expected_labels = np.concatenate([np.arange(7) % 3, np.arange(5) % 3])
+    for ids, lengths, targets in read:
+        assert (targets.argmax(axis=1) == expected_labels[ids[:, 0] - 1]).all()
+
+
+def test_read_failure_is_raised(data_path, monkeypatch):
+    batches = TokenIdBatches(data_path, batch_size=3, n_classes=3, prefetch=1)
+    read_batch = batches.read_batch
+    calls = []
+
+    def failing_read_batch(positions):
+        calls.append(positions)
+        if len(calls) == 2:
+            raise IOError('shard unreadable')
+        return read_batch(positions)
+
+    monkeypatch.setattr(batches, 'read_batch', failing_read_batch)
+
+    read = []
+    with pytest.raises(IOError, match='shard unreadable'):
+        for batch in batches:
+            read.append(batch)
+    assert len(read) == 1
+
+
+def test_leaving_early_stops_the_reader(data_path):
+    batches = TokenIdBatches(data_path, batch_size=1, n_classes=3, prefetch=1)
+    n_threads = threading.active_count()
+
+    iterator = iter(batches)
+    next(iterator)
+    assert threading.active_count() == n_threads + 1
+    iterator.close()
+
+    assert threading.active_count() == n_threads
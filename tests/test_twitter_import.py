@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from usherwood_ds.data_imports.twitter_import import create_twitter_mention_df, create_twitter_mention_df_from_json
+
+
+def make_tweet(tweet_id, **kwargs):
+    tweet = {'id': tweet_id,
+             'created_at': 'Wed Oct 10 20:19:24 +0000 2018',
+             'text': 'tweet ' + str(tweet_id),
+             'source': '<a href="http://twitter.com">Twitter Web Client</a>',
+             'user': {'id': 100 + tweet_id, 'screen_name': 'user' + str(tweet_id)},
+             'favorite_count': 3,
+             'retweet_count': 5,
+             'geo': None,
+             'entities': {'hashtags': []},
+             'in_reply_to_status_id': None,
+             'in_reply_to_user_id': None,
+             'in_reply_to_screen_name': None}
+    tweet.update(kwargs)
+
+    return tweet
+
+
+def fixture_tweets():
+    original = make_tweet(1)
+    return [make_tweet(0, geo={'type': 'Point', 'coordinates': [51.5, -0.1]},
+                       place={'full_name': 'London'}, coordinates={'coordinates': [-0.1, 51.5]}),
+            make_tweet(2, retweeted_status=original, text='RT @user1: tweet 1'),
+            make_tweet(3, quoted_status=original,
+                       entities={'media': [{'media_url': 'http://pbs.twimg.com/media/a.jpg'}]}),
+            make_tweet(4, in_reply_to_status_id=1, in_reply_to_user_id=101, in_reply_to_screen_name='user1',
+                       entities={'media': [{'media_url': ''}]}),
+            make_tweet(5, entities=None),
+            make_tweet(3, text='a repeated tweet id')]
+
+
+def test_json_matches_the_mention_objects():
+    pytest.importorskip('tweepy')
+    from usherwood_ds.data_imports.twitter_api.api_class import TwitterAPI
+
+    tweets = fixture_tweets()
+    mentions = [TwitterAPI.parse_tweet_to_twitter_mention(tweet, parse_dates=False) for tweet in tweets]
+
+    from_json = create_twitter_mention_df_from_json(tweets)
+
+    pd.testing.assert_frame_equal(from_json, create_twitter_mention_df(mentions))
+
+
+def test_json_columns():
+    mentions_df = create_twitter_mention_df_from_json(fixture_tweets())
+
+    assert mentions_df['Tweet ID'].tolist() == ['0', '2', '3', '4', '5']
+    assert mentions_df['Retweet Count'].tolist() == [5, 0, 5, 5, 5]
+    assert mentions_df['is Retweet'].tolist() == [0, 1, 0, 0, 0]
+    assert mentions_df['is Quoting'].tolist() == [0, 0, 1, 0, 0]
+    assert mentions_df['is Response'].tolist() == [0, 0, 0, 1, 0]
+    assert mentions_df['Image URL'].isna().tolist() == [True, True, False, True, True]
+    assert mentions_df['Image URL'].iloc[2] == 'http://pbs.twimg.com/media/a.jpg'
+    assert (mentions_df['Long'].iloc[0], mentions_df['Lat'].iloc[0]) == (51.5, -0.1)
+    assert mentions_df['Long'].iloc[1:].isna().all()
+    assert mentions_df['Retweet Count'].dtype == np.int64
+    assert mentions_df['Date (GMT)'].iloc[0] == pd.Timestamp('2018-10-10 20:19:24', tz='UTC')
+
+
+def test_json_lines_match_dicts():
+    tweets = fixture_tweets()
+    lines = [json.dumps(tweet) + '\n' for tweet in tweets[:3]] + ['\n'] + \
+        [json.dumps(tweet).encode('utf-8') for tweet in tweets[3:]]
+
+    pd.testing.assert_frame_equal(create_twitter_mention_df_from_json(lines), create_twitter_mention_df_from_json(tweets))
+
+
+def test_missing_counts_are_nullable():
+    tweets = [make_tweet(0, favorite_count=None), make_tweet(1), make_tweet(2)]
+    del tweets[2]['retweet_count']
+
+    mentions_df = create_twitter_mention_df_from_json(tweets)
+
+    assert str(mentions_df['Favorite Count'].dtype) == 'Int64'
+    assert mentions_df['Favorite Count'].isna().tolist() == [True, False, False]
+    assert mentions_df['Retweet Count'].isna().tolist() == [False, False, True]
+    assert mentions_df['Retweet Count'].iloc[0] == 5
+    assert mentions_df['is Retweet'].dtype == np.int64
+
+
+def test_no_tweets():
+    mentions_df = create_twitter_mention_df_from_json([])
+
+    assert len(mentions_df) == 0
+    assert mentions_df['Retweet Count'].dtype == np.int64
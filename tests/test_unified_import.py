@@ -0,0 +1,119 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from usherwood_ds.data_imports.import_classes.common_classes import TextMention
+from usherwood_ds.data_imports.import_classes.youtube_classes import YoutubeVideo
+from usherwood_ds.data_imports.unified_import import TWITTER_DATE_FORMAT, YOUTUBE_DATE_FORMAT, parse_date_column, \
+    create_common_mention_df
+from usherwood_ds.data_imports.youtube_import import create_youtube_video_df
+
+
+def test_parse_formats_and_epochs():
+    dates = ['Wed Oct 10 20:19:24 +0000 2018', '2018-10-10T20:19:24.000Z', 1539202764, None]
+
+    parsed = parse_date_column(dates)
+
+    expected = pd.Timestamp('2018-10-10 20:19:24', tz='UTC')
+    assert parsed.iloc[:3].tolist() == [expected] * 3
+    assert pd.isna(parsed.iloc[3])
+
+
+def test_parse_matches_strptime():
+    dates = ['Wed Oct 10 20:19:24 +0100 2018', 'Sun Jan 01 00:00:00 +0000 2017']
+
+    parsed = parse_date_column(dates, TWITTER_DATE_FORMAT)
+
+    assert parsed.tolist() == [datetime.datetime.strptime(date, TWITTER_DATE_FORMAT) for date in dates]
+    assert parse_date_column(['2018-10-10T20:19:24.500Z'], YOUTUBE_DATE_FORMAT).tolist() == \
+        [datetime.datetime(2018, 10, 10, 20, 19, 24, 500000)]
+
+
+def test_unparseable_dates_raise():
+    dates = ['Wed Oct 10 20:19:24 +0000 2018', 'not a date', '2018-10-10']
+
+    with pytest.raises(ValueError, match='2 of 3 dates'):
+        parse_date_column(dates, TWITTER_DATE_FORMAT)
+    with pytest.raises(ValueError):
+        parse_date_column(dates, errors='ignore')
+
+
+def test_unparseable_dates_coerce_with_a_warning():
+    dates = ['Wed Oct 10 20:19:24 +0000 2018', 'not a date', 1539202764]
+
+    with pytest.warns(UserWarning, match='1 of 3 dates'):
+        parsed = parse_date_column(dates, errors='coerce')
+
+    assert parsed.iloc[0] == parsed.iloc[2]
+    assert pd.isna(parsed.iloc[1])
+
+
+def is_utc_datetime64(dates):
+    # the resolution (ns or us) depends on the pandas version
+    return pd.api.types.is_datetime64_any_dtype(dates) and str(getattr(dates.dtype, 'tz', None)) == 'UTC'
+
+
+def is_naive_datetime64(dates):
+    return pd.api.types.is_datetime64_dtype(dates)
+
+
+def test_parsed_dates_become_datetime64():
+    aware = [datetime.datetime.strptime('Wed Oct 10 20:19:24 +0000 2018', TWITTER_DATE_FORMAT), None]
+    naive = [datetime.datetime.strptime('2018-10-10T20:19:24.000Z', YOUTUBE_DATE_FORMAT), None]
+
+    assert is_utc_datetime64(parse_date_column(aware))
+    assert is_naive_datetime64(parse_date_column(naive))
+    assert parse_date_column(aware).dt.year.tolist()[0] == 2018
+
+
+def make_mention(i, dategmt):
+    mention = TextMention()
+    mention.doc_id = str(i)
+    mention.dategmt = dategmt
+
+    return mention
+
+
+def make_video(i, publish_date):
+    video = YoutubeVideo()
+    video.youtube_video_id = str(i)
+    video.publish_date = publish_date
+
+    return video
+
+
+@pytest.mark.parametrize('parse_dates', [True, False])
+def test_import_date_columns_are_datetime64(parse_dates):
+    twitter_dates = ['Wed Oct 10 20:19:24 +0000 2018', 'Sun Jan 01 00:00:00 +0000 2017']
+    youtube_dates = ['2018-10-10T20:19:24.000Z', '2017-01-01T00:00:00.000Z']
+    if parse_dates:
+        twitter_dates = [datetime.datetime.strptime(date, TWITTER_DATE_FORMAT) for date in twitter_dates]
+        youtube_dates = [datetime.datetime.strptime(date, YOUTUBE_DATE_FORMAT) for date in youtube_dates]
+
+    mentions_df = create_common_mention_df([make_mention(i, date) for i, date in enumerate(twitter_dates)])
+    videos_df = create_youtube_video_df([make_video(i, date) for i, date in enumerate(youtube_dates)])
+
+    assert is_utc_datetime64(mentions_df['Date (GMT)'])
+    assert mentions_df['Date (GMT)'].dt.year.tolist() == [2018, 2017]
+    assert is_naive_datetime64(videos_df['Publish Date'])
+    assert videos_df['Publish Date'].dt.year.tolist() == [2018, 2017]
+
+
+@pytest.mark.parametrize('parse_dates', [True, False])
+def test_twitter_date_columns_are_datetime64(parse_dates):
+    pytest.importorskip('tweepy')
+    from usherwood_ds.data_imports.twitter_api.api_class import TwitterAPI
+    from usherwood_ds.data_imports.twitter_import import create_twitter_mention_df
+
+    tweet = {'id': 0, 'created_at': 'Wed Oct 10 20:19:24 +0000 2018', 'text': 'tweet',
+             'source': '<a href="http://twitter.com">Twitter Web Client</a>',
+             'user': {'id': 100, 'screen_name': 'user'}, 'favorite_count': 3, 'retweet_count': 5, 'geo': None,
+             'entities': {'hashtags': []}, 'in_reply_to_status_id': None, 'in_reply_to_user_id': None,
+             'in_reply_to_screen_name': None}
+
+    mentions_df = create_twitter_mention_df([TwitterAPI.parse_tweet_to_twitter_mention(tweet,
+                                                                                       parse_dates=parse_dates)])
+
+    assert is_utc_datetime64(mentions_df['Date (GMT)'])
+    assert mentions_df['Date (GMT)'].dt.hour.tolist() == [20]
@@ -0,0 +1,50 @@
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pytest
+
+pytest.importorskip('gensim')
+
+from usherwood_ds.nlp.processing import word_embedding
+from usherwood_ds.nlp.processing.word_embedding import load_shared_word2vec_model, native_model_path
+
+
+def write_word2vec_text(filename):
+    vectors = {'cat': [1.0, 0.0, 0.5], 'dog': [0.9, 0.1, 0.4], 'car': [0.0, 1.0, 0.2]}
+    with open(filename, 'w', encoding='utf-8') as openfile:
+        openfile.write(str(len(vectors)) + ' 3\n')
+        for word, vector in vectors.items():
+            openfile.write(word + ' ' + ' '.join(str(v) for v in vector) + '\n')
+
+    return vectors
+
+
+def load_vector(filename):
+    return np.array(load_shared_word2vec_model(filename, binary=False).model['dog'])
+
+
+def test_load_shared_word2vec_model_converts_once(tmp_path):
+    filename = str(tmp_path / 'vectors.txt')
+    vectors = write_word2vec_text(filename)
+    word_embedding._shared_models.clear()
+
+    embedding = load_shared_word2vec_model(filename, binary=False)
+
+    assert os.path.exists(native_model_path(filename))
+    assert not [name for name in os.listdir(str(tmp_path)) if '.tmp' in name]
+    np.testing.assert_allclose(embedding.model['dog'], vectors['dog'], rtol=1e-6)
+    assert load_shared_word2vec_model(filename, binary=False) is embedding
+
+
+def test_concurrent_workers_load_the_same_conversion(tmp_path):
+    filename = str(tmp_path / 'vectors.txt')
+    vectors = write_word2vec_text(filename)
+    word_embedding._shared_models.clear()
+
+    with Pool(4) as pool:
+        results = pool.map(load_vector, [filename] * 8)
+
+    for result in results:
+        np.testing.assert_allclose(result, vectors['dog'], rtol=1e-6)
+    assert not [name for name in os.listdir(str(tmp_path)) if '.tmp' in name]
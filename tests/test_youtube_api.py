@@ -0,0 +1,195 @@
+import json
+import threading
+
+import pytest
+
+pytest.importorskip('tweepy')
+pytest.importorskip('googleapiclient')
+
+from googleapiclient.http import HttpMockSequence
+
+from usherwood_ds.data_imports.youtube_api import api_class
+from usherwood_ds.data_imports.youtube_api.api_class import YoutubeAPI, QuotaThrottle, QuotaExceeded, SEARCH_COST
+
+CREDENTIALS = {'Youtube': {'developer_key': 'key'}}
+
+
+class RecordingHttp(HttpMockSequence):
+    """HttpMockSequence that keeps the uris requested"""
+
+    def __init__(self, iterable):
+        super().__init__(iterable)
+        self.uris = []
+        self.lock = threading.Lock()
+
+    def request(self, uri, *args, **kwargs):
+        with self.lock:
+            self.uris.append(uri)
+            return super().request(uri, *args, **kwargs)
+
+
+def ok(body):
+    return {'status': '200'}, json.dumps(body)
+
+
+def error(status, reason):
+    return ({'status': str(status)},
+            json.dumps({'error': {'code': status, 'message': reason,
+                                  'errors': [{'reason': reason, 'domain': 'youtube.commentThread'}]}}))
+
+
+def make_api(responses, **kwargs):
+    http = RecordingHttp(responses)
+    # one worker thread shares the sequence, so the responses are used in submission order
+    api = YoutubeAPI(api_credentials=CREDENTIALS, http=http, http_factory=lambda: http, **kwargs)
+
+    return api, http
+
+
+def comments_page(video_id, n):
+    return ok({'items': [{'id': video_id + '_' + str(i)} for i in range(n)]})
+
+
+def requested_ids(uri):
+    return uri.split('id=')[1].split('&')[0].split('%2C')
+
+
+def test_fortify_videos_batch_chunks_of_50_in_input_order():
+    video_ids = ['v' + str(i) for i in range(120)]
+    missing = {'v3', 'v77', 'v119'}
+    responses = [ok({'items': [{'id': video_id} for video_id in reversed(video_ids[start:start + 50])
+                               if video_id not in missing]})
+                 for start in (0, 50, 100)]
+
+    api, http = make_api(responses)
+    videos = api.fortify_videos_batch(video_ids)
+
+    assert [len(requested_ids(uri)) for uri in http.uris] == [50, 50, 20]
+    assert [video['id'] for video in videos] == video_ids
+    assert [video for video in videos if video['id'] in missing] == [{'id': video_id} for video_id in ['v3', 'v77',
+                                                                                                      'v119']]
+    assert all('snippet' not in video for video in videos)
+
+
+def test_fortify_channels_batch_placeholders():
+    channel_ids = ['c0', 'c1', 'c2']
+    api, http = make_api([ok({'items': [{'id': 'c2'}, {'id': 'c0'}]})])
+
+    channels = api.fortify_channels_batch(channel_ids)
+
+    assert len(http.uris) == 1
+    assert channels == [{'id': 'c0'}, {'channel_id': 'c1', 'channel_name': None, 'found': False}, {'id': 'c2'}]
+
+
+def test_videos_comments_keep_going_past_unreadable_videos():
+    api, http = make_api([comments_page('a', 2),
+                          error(403, 'commentsDisabled'),
+                          error(404, 'videoNotFound'),
+                          comments_page('d', 1)])
+
+    comments = api.get_videos_comments(['a', 'b', 'c', 'd'], max_workers=1)
+
+    assert list(comments) == ['a', 'b', 'c', 'd']
+    assert [len(comments[video_id]) for video_id in comments] == [2, 0, 0, 1]
+    assert sorted(api.page_errors) == ['b', 'c']
+    assert api.page_errors['b'].resp.status == 403
+    assert api.page_errors['c'].resp.status == 404
+
+
+def test_videos_comments_quota_exceeded_returns_partial_results():
+    api, http = make_api([comments_page('a', 2),
+                          comments_page('b', 1),
+                          error(403, 'quotaExceeded'),
+                          comments_page('d', 1)])
+
+    comments = api.get_videos_comments(['a', 'b', 'c', 'd'], max_workers=1)
+
+    assert comments == {'a': [{'id': 'a_0'}, {'id': 'a_1'}], 'b': [{'id': 'b_0'}]}
+    assert api.page_errors == {}
+    # the video after the quota ran out was never requested
+    assert len(http.uris) == 3
+    # the stop flag is reset for the next call
+    assert not api.quota_exceeded.is_set()
+
+
+def test_execute_stops_once_quota_exceeded():
+    api, http = make_api([error(403, 'quotaExceeded')])
+
+    with pytest.raises(QuotaExceeded):
+        api.get_video_comments('a')
+    with pytest.raises(QuotaExceeded):
+        api.get_video_comments('b')
+
+    assert len(http.uris) == 1
+
+
+def test_worker_threads_get_their_own_http():
+    made = []
+
+    def factory():
+        http = RecordingHttp([comments_page('x', 1)])
+        made.append(http)
+        return http
+
+    api = YoutubeAPI(api_credentials=CREDENTIALS, http=RecordingHttp([]), http_factory=factory)
+    barrier = threading.Barrier(3)
+
+    def pager(video_id, num_comments):
+        # hold every worker until all three have started so each runs on its own thread
+        barrier.wait(timeout=5)
+        return api.get_video_comments(video_id, num_comments)
+
+    comments = api._page_concurrently(pager, ['a', 'b', 'c'], 100, max_workers=3)
+
+    assert list(comments) == ['a', 'b', 'c']
+    assert len(made) == 3
+    assert all(len(http.uris) == 1 for http in made)
+    assert api.http.uris == []
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(api_class.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(api_class.time, 'sleep', clock.sleep)
+
+    return clock
+
+
+def test_quota_throttle_waits_for_tokens(clock):
+    throttle = QuotaThrottle(10, burst=20)
+
+    throttle.acquire(20)
+    assert clock.sleeps == []
+
+    throttle.acquire(5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+    clock.now += 10
+    throttle.acquire(20)
+    assert len(clock.sleeps) == 1
+
+
+def test_execute_spends_search_cost(clock):
+    api, http = make_api([ok({'items': [{'id': {'videoId': 'v0'}}]}), ok({'items': [{'id': 'v0'}]})],
+                         quota_per_second=50)
+
+    api.get_videos_by_search_term('query', max_videos=1)
+
+    # the search spends the whole burst, the videos list then waits for one unit
+    assert api.throttle.burst == SEARCH_COST
+    assert [seconds for seconds in clock.sleeps if seconds] == [pytest.approx(1 / 50)]
+    assert len(http.uris) == 2
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-"""Classes for Youtube objects"""
+"""Common classes for social media mentions and users, and a columnar store for many of them"""
 
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
@@ -11,6 +11,13 @@ class TextMention:
     Common text mention class
     """
 
+    __slots__ = ('doc_id', 'domain', 'source', 'url', 'author_id', 'dategmt', 'datelocal', 'datelocalzone', 'snippet',
+                 'sentiment', 'location', 'lat', 'long')
+
+    # the attributes in to_list order
+    fields = ('doc_id', 'domain', 'source', 'url', 'author_id', 'dategmt', 'datelocal', 'datelocalzone', 'snippet',
+              'sentiment', 'location', 'long', 'lat')
+
     def __init__(self):
 
         self.doc_id = None
@@ -34,12 +41,18 @@ class TextMention:
         :return: List of the objects attributes
         """
 
-        list_form = [self.doc_id, self.domain, self.source, self.url, self.author_id, self.dategmt, self.datelocal,
-                     self.datelocalzone, self.snippet, self.sentiment, self.location, self.long, self.lat]
-        return list_form
+        return [getattr(self, field) for field in self.fields]
 
 
 class User:
+    """
+    Common user class
+    """
+
+    __slots__ = ('author_id', 'domain', 'source', 'author_fullname', 'author_username', 'bio', 'profilepictureurl')
+
+    # the attributes in to_list order
+    fields = ('author_id', 'domain', 'source', 'author_fullname', 'author_username', 'bio', 'profilepictureurl')
 
     def __init__(self):
 
@@ -58,7 +71,50 @@ class User:
         :return: List of the objects attributes
         """
 
-        list_form = [self.author_id, self.domain, self.source, self.author_fullname, self.author_username,
-                     self.bio, self.profilepictureurl]
+        return [getattr(self, field) for field in self.fields]
+
+
+class RecordColumns:
+    """
+    Columns of records (e.g. the TwitterTextMentions of an import), each record's fields are appended straight to
+    one list per field as it is parsed so the record objects (and per record lists) do not need to be kept
+    """
+
+    def __init__(self, fields):
+        """
+        :param fields: Tuple of the record attribute names, usually the record class's fields
+        """
+
+        self.fields = tuple(fields)
+        self.columns = dict((field, []) for field in self.fields)
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]]) if self.fields else 0
+
+    def append(self, record):
+        """
+        :param record: Record object (e.g. TwitterTextMention) with the fields as attributes
+        """
+
+        for field in self.fields:
+            self.columns[field].append(getattr(record, field))
+
+    def extend(self, records):
+        """
+        :param records: Iterable of record objects
+        """
+
+        for record in records:
+            self.append(record)
+
+    def to_dict(self, column_names=None):
+        """
+        :param column_names: List of the df column name of each field (in fields order), None to use the field names
+
+        :return: Dict of column name: list of values, ready for pd.DataFrame
+        """
+
+        if column_names is None:
+            column_names = self.fields
 
-        return list_form
+        return dict((name, self.columns[field]) for name, field in zip(column_names, self.fields))
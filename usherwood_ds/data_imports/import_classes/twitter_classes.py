@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-"""Classes for Youtube objects"""
+"""Classes for Twitter objects"""
 
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
@@ -10,10 +10,18 @@ from usherwood_ds.data_imports.import_classes.common_classes import User, TextMe
 
 class TwitterUser(User):
 
+    __slots__ = ('twitter_author_id', 'followers_count', 'profile_image_full', 'verified', 'number_of_statuses',
+                 'created_at')
+
+    fields = ('twitter_author_id', 'domain', 'source', 'author_fullname', 'author_username', 'bio', 'profilepictureurl',
+              'followers_count', 'verified', 'number_of_statuses', 'created_at', 'author_id')
+
     def __init__(self):
 
+        super().__init__()
         self.twitter_author_id = None
         self.followers_count = None
+        self.profile_image_full = None
         self.verified = None
         self.number_of_statuses = None
         self.created_at = None
@@ -25,17 +33,26 @@ class TwitterUser(User):
         :return: List of the objects attributes
         """
 
-        list_form = [self.twitter_author_id, self.domain, self.source, self.author_fullname, self.author_username,
-                     self.bio, self.profilepictureurl, self.followers_count, self.verified,
-                     self.number_of_statuses, self.created_at, self.author_id]
-
-        return list_form
+        return [getattr(self, field) for field in self.fields]
 
 
 class TwitterTextMention(TextMention):
 
+    __slots__ = ('tweet_id', 'retweet_count', 'favorite_count', 'device', 'imageURL', 'is_retweet', 'id_of_reweet',
+                 'id_of_original_tweet_author', 'screen_name_of_original_tweet_author', 'is_response',
+                 'id_of_antecedent_tweet', 'id_of_antecedent_author', 'screen_name_of_antecedent_author', 'is_quoting',
+                 'id_of_quoted_tweet', 'id_of_quoted_author', 'screen_name_of_quoted_author')
+
+    fields = ('tweet_id', 'domain', 'source', 'url', 'author_id', 'dategmt', 'datelocal', 'datelocalzone', 'snippet',
+              'sentiment', 'location', 'long', 'lat', 'retweet_count', 'favorite_count', 'device', 'doc_id',
+              'imageURL', 'is_retweet', 'id_of_reweet', 'id_of_original_tweet_author',
+              'screen_name_of_original_tweet_author', 'is_response', 'id_of_antecedent_tweet',
+              'id_of_antecedent_author', 'screen_name_of_antecedent_author', 'is_quoting', 'id_of_quoted_tweet',
+              'id_of_quoted_author', 'screen_name_of_quoted_author')
+
     def __init__(self):
 
+        super().__init__()
         self.tweet_id = None
         self.retweet_count = None
         self.favorite_count = None
@@ -61,12 +78,4 @@ class TwitterTextMention(TextMention):
         :return: List of the objects attributes
         """
 
-        list_form = [self.tweet_id, self.domain, self.source, self.url, self.author_id, self.dategmt, self.datelocal,
-                     self.datelocalzone, self.snippet, self.sentiment, self.location, self.long, self.lat,
-                     self.retweet_count, self.favorite_count, self.device, self.doc_id, self.imageURL,
-                     self.is_retweet ,self.id_of_reweet, self.id_of_original_tweet_author,
-                     self.screen_name_of_original_tweet_author, self.is_response, self.id_of_antecedent_tweet,
-                     self.id_of_antecedent_author, self.screen_name_of_antecedent_author, self.is_quoting,
-                     self.id_of_quoted_tweet, self.id_of_quoted_author, self.screen_name_of_quoted_author]
-
-        return list_form
+        return [getattr(self, field) for field in self.fields]
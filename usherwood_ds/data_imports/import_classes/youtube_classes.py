@@ -10,6 +10,12 @@ from usherwood_ds.data_imports.import_classes.common_classes import User
 
 class YoutubeTextComment:
 
+    __slots__ = ('youtube_comment_id', 'domain', 'source', 'youtube_author_id', 'author_id', 'author_name', 'date',
+                 'snippet', 'youtube_video_id', 'like_count', 'reply_count', 'profile_picture')
+
+    # the attributes in to_list order
+    fields = __slots__
+
     def __init__(self):
         self.youtube_comment_id = None
         self.domain = None
@@ -31,15 +37,18 @@ class YoutubeTextComment:
         :return: List of the objects attributes
         """
 
-        list_form = [self.youtube_comment_id, self.domain, self.source, self.youtube_author_id, self.author_id,
-                     self.author_name, self.date, self.snippet, self.youtube_video_id, self.like_count,
-                     self.reply_count, self.profile_picture]
-
-        return list_form
+        return [getattr(self, field) for field in self.fields]
 
 
 class YoutubeVideo:
 
+    __slots__ = ('author_id', 'youtube_author_id', 'author_name', 'youtube_video_id', 'title', 'description',
+                 'publish_date', 'view_count', 'like_count', 'dislike_count', 'comment_count')
+
+    # the attributes in to_list order
+    fields = ('youtube_video_id', 'youtube_author_id', 'author_id', 'author_name', 'title', 'description',
+              'publish_date', 'view_count', 'like_count', 'dislike_count', 'comment_count')
+
     def __init__(self):
         self.author_id = None
         self.youtube_author_id = None
@@ -60,17 +69,20 @@ class YoutubeVideo:
         :return: List of the objects attributes
         """
 
-        list_form = [self.youtube_video_id, self.youtube_author_id, self.author_id, self.author_name, self.title,
-                     self.description, self.publish_date, self.view_count, self.like_count, self.dislike_count,
-                     self.comment_count]
-
-        return list_form
+        return [getattr(self, field) for field in self.fields]
 
 
 class YoutubeUser(User):
 
+    __slots__ = ('youtube_author_id', 'view_count', 'comment_count', 'subscriber_count', 'hidden_subscriber_count',
+                 'video_count')
+
+    fields = ('youtube_author_id', 'domain', 'source', 'author_fullname', 'author_username', 'bio', 'profilepictureurl',
+              'view_count', 'comment_count', 'subscriber_count', 'hidden_subscriber_count', 'video_count', 'author_id')
+
     def __init__(self):
 
+        super().__init__()
         self.youtube_author_id = None
         self.view_count = None
         self.comment_count = None
@@ -85,8 +97,4 @@ class YoutubeUser(User):
         :return: List of the objects attributes
         """
 
-        list_form = [self.youtube_author_id, self.domain, self.source, self.author_fullname, self.author_username,
-                     self.bio, self.profilepictureurl, self.view_count, self.comment_count, self.subscriber_count,
-                     self.hidden_subscriber_count, self.video_count, self.author_id]
-
-        return list_form
+        return [getattr(self, field) for field in self.fields]
@@ -6,9 +6,10 @@ __author__ = "Peter J Usherwood"
 __python_version__ = "3.6"
 
 import praw
+from praw.models import MoreComments
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 import copy
 
 from usherwood_ds.data_imports.import_classes.common_classes import TextMention, User
@@ -65,7 +66,8 @@ class RedditAPI:
         subreddit = self.api.subreddit(subreddit)
 
         submissions = []
-        date_m = datetime(date['year'], date['month'], date['day'])
+        # compare the epoch seconds of each post directly rather than building a datetime per post
+        min_created = datetime(date['year'], date['month'], date['day']).timestamp()
 
         if not query:
             if not sort_type:
@@ -73,13 +75,13 @@ class RedditAPI:
             fn = getattr(subreddit, sort_type, None)
             if callable(fn):
                 for submission in fn(limit=max_posts):
-                    if (datetime.fromtimestamp(int(submission.created)) - date_m).total_seconds() > 0:
+                    if int(submission.created) > min_created:
                         submissions += [submission]
         else:
             if not sort_type:
                 sort_type = 'relevant'
             for submission in subreddit.search(query=query, limit=max_posts, sort=sort_type):
-                if (datetime.fromtimestamp(int(submission.created)) - date_m).total_seconds() > 0:
+                if int(submission.created) > min_created:
                     submissions += [submission]
 
         return submissions
@@ -110,11 +112,13 @@ class RedditAPI:
         return all_comments
 
     @staticmethod
-    def parse_comment_to_common_mention(comment):
+    def parse_comment_to_common_mention(comment, parse_dates=True):
         """
         Creates a common text mention from a comment from the Reddit API
 
         :param comment: the Praw comment object
+        :param parse_dates: Bool, convert created_utc to a date here, False to keep the epoch seconds for the df
+        creation to convert in bulk (much faster for large imports)
 
         :return: TextMention, used by unified_import
         """
@@ -134,7 +138,10 @@ class RedditAPI:
             common_mention.doc_id = common_mention.snippet + common_mention.url
             if comment.author:
                 common_mention.author_id = 'reddit.com' + comment.author.name
-            common_mention.dategmt = datetime.fromtimestamp(int(comment.created))
+            if parse_dates:
+                common_mention.dategmt = datetime.fromtimestamp(int(comment.created_utc), tz=timezone.utc)
+            else:
+                common_mention.dategmt = int(comment.created_utc)
             common_mention.datelocal = None #TODO add to class
             common_mention.datelocalzone = None  # TODO add to class
             common_mention.sentiment = 'Not Found because it does not exist'
@@ -12,6 +12,7 @@ import os
 import progressbar
 
 from usherwood_ds.data_imports.reddit_api.api_class import RedditAPI
+from usherwood_ds.data_imports.import_classes.common_classes import TextMention, User, RecordColumns
 from usherwood_ds.data_imports.unified_import import create_common_df
 
 
@@ -32,15 +33,18 @@ def search_comments_to_excel(query='dogs',
         comments += api.get_submission_comments(submission=post)
 
     print(str(len(comments)), 'comments found')
-    mentions = []
-    users = []
+    mentions = RecordColumns(TextMention.fields)
+    users = RecordColumns(User.fields)
     with progressbar.ProgressBar(max_value=len(comments)) as bar:
         for i, comment in enumerate(comments):
             try:
-                mentions += [api.parse_comment_to_common_mention(comment)]
-                users += [api.parse_comment_to_common_user(comment)]
+                mention = api.parse_comment_to_common_mention(comment, parse_dates=False)
+                user = api.parse_comment_to_common_user(comment)
             except Exception as e:
                 print(e)
+            else:
+                mentions.append(mention)
+                users.append(user)
             bar.update(i)
 
     df = create_common_df(mention_list=mentions, user_list=users)
@@ -19,12 +19,19 @@ import re
 from requests.exceptions import Timeout, ConnectionError
 import ssl
 
+from usherwood_ds.data_imports.twitter_api.stream_sink import StreamSink
 from usherwood_ds.data_imports.import_classes.twitter_classes import TwitterTextMention, TwitterUser
 from usherwood_ds.data_imports.import_classes.common_classes import TextMention, User
+from usherwood_ds.data_imports.unified_import import TWITTER_DATE_FORMAT
 
 
-with open(os.path.join(os.path.dirname(__file__), "../api_credentials.json"),'r') as openfile:
-    api_credentials = json.load(openfile)
+CREDENTIALS_PATH = os.path.join(os.path.dirname(__file__), "../api_credentials.json")
+
+# the module can be imported (e.g. for the parsers) without credentials, they are only needed to connect
+api_credentials = None
+if os.path.exists(CREDENTIALS_PATH):
+    with open(CREDENTIALS_PATH, 'r') as openfile:
+        api_credentials = json.load(openfile)
 
 
 class TwitterAPI:
@@ -36,12 +43,17 @@ class TwitterAPI:
                  stream_save_path='raw_tweets.json',
                  regex_rule='test'):
 
+        if api_credentials is None:
+            raise FileNotFoundError('No api_credentials given and ' + CREDENTIALS_PATH + ' does not exist, see '
+                                    'api_credentials.json.template')
+
         self.consumer_key = api_credentials["Twitter"]["consumer_key"]
         self.consumer_secret = api_credentials["Twitter"]["consumer_secret"]
         self.access_token_key = api_credentials["Twitter"]["access_token_key"]
         self.access_token_secret = api_credentials["Twitter"]["access_token_secret"]
         self.api = None
         self.stream_api = None
+        self.listener = None
         self.setup_api(run_time=run_time,
                        save_incrememnt=save_increment,
                        stream_save_path=stream_save_path,
@@ -66,6 +78,22 @@ class TwitterAPI:
 
         self.api = tweepy.API(auth, wait_on_rate_limit=True, wait_on_rate_limit_notify=True)
         self.stream_api = Stream(auth, l)
+        self.listener = l
+
+        return True
+
+    def stream_tweets(self, **filter_kwargs):
+        """
+        Stream tweets until the listener's time limit (this blocks), the tail segment is finished however the stream
+        ends. Read the saved tweets back with stream_sink.read_segments
+
+        :param filter_kwargs: Passed to the tweepy Stream filter, e.g. track=['coffee'] or languages=['en']
+        """
+
+        try:
+            self.stream_api.filter(**filter_kwargs)
+        finally:
+            self.listener.close_sink()
 
         return True
 
@@ -308,11 +336,13 @@ class TwitterAPI:
         return replies_raw
 
     @staticmethod
-    def parse_tweet_to_common_mention(tweet):
+    def parse_tweet_to_common_mention(tweet, parse_dates=True):
         """
         Creates a common text mention from a tweet from the Twitter API
 
         :param tweet: the Twitter json response
+        :param parse_dates: Bool, parse created_at here, False to keep the raw string for the df creation to parse
+        in bulk (much faster for large imports)
 
         :return: TextMention, used by unified_import
         """
@@ -325,7 +355,10 @@ class TwitterAPI:
         common_mention.source = 'TwitterAPI'
         common_mention.url = 'https://twitter.com/'+tweet['user']['screen_name']+'/statuses/' + str(tweet['id'])
         common_mention.author_id = 'twitter.com' + str(tweet['user']['screen_name'])
-        common_mention.dategmt = datetime.strptime(tweet['created_at'], '%a %b %d %H:%M:%S %z %Y')
+        if parse_dates:
+            common_mention.dategmt = datetime.strptime(tweet['created_at'], TWITTER_DATE_FORMAT)
+        else:
+            common_mention.dategmt = tweet['created_at']
         common_mention.datelocal = None #TODO add
         common_mention.datelocalzone = None  # TODO add
         common_mention.snippet = tweet['text']
@@ -364,11 +397,13 @@ class TwitterAPI:
         return common_user
 
     @staticmethod
-    def parse_user_to_twitter_user(user):
+    def parse_user_to_twitter_user(user, parse_dates=True):
         """
         Creates a Twitter user (a Twitter specific extension of the user class) from a user from the Twitter API
 
         :param user: the Twitter json response
+        :param parse_dates: Bool, parse created_at here, False to keep the raw string for the df creation to parse
+        in bulk (much faster for large imports)
 
         :return: TwitterUser
         """
@@ -386,18 +421,23 @@ class TwitterAPI:
         twitter_user.profile_image_full = user['profile_image_url_https'].replace("_normal", "")
         twitter_user.verified = user['verified']
         twitter_user.number_of_statuses = user['statuses_count']
-        twitter_user.created_at = datetime.strptime(user['created_at'], '%a %b %d %H:%M:%S %z %Y')
+        if parse_dates:
+            twitter_user.created_at = datetime.strptime(user['created_at'], TWITTER_DATE_FORMAT)
+        else:
+            twitter_user.created_at = user['created_at']
         twitter_user.author_id = 'twitter.com' + str(user['id'])
 
         return twitter_user
 
     @staticmethod
-    def parse_tweet_to_twitter_mention(tweet):
+    def parse_tweet_to_twitter_mention(tweet, parse_dates=True):
         """
         Creates a Twitter text mention (a Twitter specific extension of the mention class) from a tweet from the
         Twitter API
 
         :param tweet: the Twitter json response
+        :param parse_dates: Bool, parse created_at here, False to keep the raw string for the df creation to parse
+        in bulk (much faster for large imports)
 
         :return: TwitterTextMention
         """
@@ -409,7 +449,10 @@ class TwitterAPI:
         twitter_mention.source = 'TwitterAPI'
         twitter_mention.url = 'https://twitter.com/statuses/' + str(tweet['id'])
         twitter_mention.author_id = 'twitter.com' + str(tweet['user']['id'])
-        twitter_mention.dategmt = datetime.strptime(tweet['created_at'], '%a %b %d %H:%M:%S %z %Y')
+        if parse_dates:
+            twitter_mention.dategmt = datetime.strptime(tweet['created_at'], TWITTER_DATE_FORMAT)
+        else:
+            twitter_mention.dategmt = tweet['created_at']
         twitter_mention.datelocal = None #TODO add
         twitter_mention.datelocalzone = None  # TODO add
         twitter_mention.snippet = tweet['text']
@@ -486,78 +529,88 @@ class StdOutListener(StreamListener):
                  time_limit=60,
                  save_increment=600,
                  stream_save_path='raw_tweets.json',
-                 regex_rule='test'):
+                 regex_rule='test',
+                 max_bytes=100*1024*1024,
+                 compress=False):
+        """
+        Saves the streamed tweets matching regex_rule (searched in the lowercased json) as newline delimited json
+        segments through a StreamSink, read them back with stream_sink.read_segments
+
+        :param time_limit: Float, seconds to stream for
+        :param save_increment: Float, seconds after which a new segment file is started
+        :param stream_save_path: Str, path and start of the segment filenames (any extension is dropped)
+        :param regex_rule: Str, regex a tweet must match to be saved
+        :param max_bytes: Int, bytes after which a new segment file is started
+        :param compress: Bool, gzip the segment files
+        """
+
+        super().__init__()
 
         self.time = time.time()
         self.limit = time_limit
-        self.tweet_data = []
-        self.save_tick = 1
-        self.call_tick = 0
         self.save_increment = save_increment
-        self.path = stream_save_path
-        self.new_file = False
+        self.path = os.path.splitext(stream_save_path)[0]
         self.regex_rule = regex_rule
+        self.regexp = re.compile(regex_rule)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.sink = None
 
     def on_data(self, data):
 
-        if not os.path.exists(self.path):
-            saveFile = io.open(self.path, 'w', encoding='utf-8')
-            self.new_file=True
-            saveFile.close()
-        else:
-            if self.call_tick == 0:
-                file = open(self.path, "r+", encoding="utf-8")
-                file.seek(0, os.SEEK_END)
-                pos = file.tell() - 1
+        if (time.time() - self.time) >= self.limit:
+            self.close_sink()
+            return False
 
-                while pos > 0 and file.read(1) != "\n":
-                    pos -= 1
-                    file.seek(pos, os.SEEK_SET)
+        if self.sink is None:
+            self.sink = StreamSink(path_prefix=self.path, max_bytes=self.max_bytes, max_seconds=self.save_increment,
+                                   compress=self.compress)
 
-                if pos > 0:
-                    file.seek(pos, os.SEEK_SET)
-                    file.truncate()
+        try:
+            matched = self.regexp.search(data.lower())
+        except Exception as e:
+            print('failed ondata,', str(e))
+            return True
 
-                file.close()
+        # a failed sink (e.g. a full disk) raises here and stops the stream
+        if matched:
+            self.sink.write(data)
 
-        saveFile = io.open(self.path, 'a', encoding='utf-8')
+        return True
 
-        while (time.time() - self.time) < self.limit:
+    def on_error(self, status):
+        # the tail segment is finished now, a new one is started if the stream carries on
+        self.close_sink()
+        time.sleep(60)
+        print(status)
 
-            try:
-                regexp = re.compile(self.regex_rule)
-                if regexp.search(data.lower()):
-                    self.tweet_data.append(data)
-                    if (time.time() - self.time) >= self.save_tick*self.save_increment:
-                        print(str(len(self.tweet_data)), 'new records saved')
-                        if self.save_tick == 1 and self.new_file:
-                            saveFile.write(u'[\n')
-                            saveFile.write(','.join(self.tweet_data))
-                        else:
-                            saveFile.write(','+','.join(self.tweet_data))
-
-                        self.tweet_data = []
-                        self.save_tick += 1
-                self.call_tick += 1
-                return True
+    def on_timeout(self):
+        self.close_sink()
 
-            except Exception as e:
-                print('failed ondata,', str(e))
-                time.sleep(60)
-                pass
+    def on_disconnect(self, notice):
+        self.close_sink()
+        print(notice)
 
-        self.save_tick = 0
-        self.call_tick = 0
-        saveFile.write(u'\n]')
-        saveFile.close()
-        return False
+    def on_exception(self, exception):
+        self.close_sink()
+        print(exception)
 
-    def on_error(self, status):
-        time.sleep(60)
-        print(status)
+    def close_sink(self):
+        """
+        Finish the current segment (renaming it from .part) and stop its writer, safe to call when there is no sink
+        """
+
+        if self.sink is None:
+            return
+
+        sink = self.sink
+        self.sink = None
+        sink.close()
+        print(str(sink.n_written), 'records saved to', str(len(sink.segment_paths)), 'files')
 
 
 def finalize_tweet_stream(file_path='raw_tweets_closed.json'):
+    """Close the json array of a stream file saved before the listener wrote newline delimited json segments"""
 
     saveFile = io.open(file_path, 'a', encoding='utf-8')
     saveFile.write(u'\n]\n')
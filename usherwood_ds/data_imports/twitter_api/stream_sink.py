@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+"""Sink for streamed tweets, written as newline delimited json segments by a background thread"""
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.5"
+
+import glob
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+import time
+
+_CLOSE = object()
+
+
+class StreamSink:
+    """
+    Writes raw tweets (json strings) as newline delimited json, one tweet per line. Tweets are queued and written by a
+    background thread so the stream never waits on the disk. The output is split into segments, a new one is started
+    when the current one reaches max_bytes or max_seconds. A segment is written as a .part file and renamed when it is
+    closed, so every finished segment is complete and readable (gzipped too with compress). If the queue fills up
+    (the disk cannot keep up) tweets are dropped and counted in n_dropped. An error in the background thread (e.g. a
+    full disk) stops it and is raised by the next write or close
+    """
+
+    def __init__(self, path_prefix='raw_tweets', max_bytes=100*1024*1024, max_seconds=3600, compress=False,
+                 flush_interval=1.0, max_queue=100000):
+        """
+        :param path_prefix: Str, path and start of the segment filenames, e.g. 'raw_tweets' writes
+        raw_tweets_<start time>_<segment number>.ndjson
+        :param max_bytes: Int, bytes (before compression) after which a new segment is started, None for no limit
+        :param max_seconds: Float, seconds after which a new segment is started, None for no limit
+        :param compress: Bool, gzip the segments
+        :param flush_interval: Float, seconds between flushes of the current segment when tweets are slow to arrive
+        :param max_queue: Int, tweets waiting to be written after which new tweets are dropped, 0 for no limit
+        """
+
+        self.path_prefix = path_prefix
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.compress = compress
+        self.flush_interval = flush_interval
+
+        self.segment_paths = []
+        self.n_written = 0
+        self.n_dropped = 0
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.error = None
+
+        self._file = None
+        self._part_path = None
+        self._segment_bytes = 0
+        self._segment_start = None
+        self._n_segments = 0
+        self._start_time = time.strftime('%Y%m%d%H%M%S')
+
+        directory = os.path.dirname(path_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, data):
+        """
+        Queue a tweet to be written, never blocks (the tweet is dropped if the queue is full)
+
+        :param data: Str (or bytes) json of one tweet
+        """
+
+        if self.error is not None:
+            raise self.error
+
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            self.n_dropped += 1
+
+    def close(self):
+        """
+        Write the queued tweets, close the current segment and stop the background thread
+        """
+
+        while self._thread.is_alive():
+            try:
+                self.queue.put(_CLOSE, timeout=self.flush_interval)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+
+        if self.n_dropped:
+            print(str(self.n_dropped), 'tweets were dropped because the queue was full')
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        try:
+            self._write_queue()
+        except Exception as e:
+            self.error = e
+            # the unfinished segment is left as a .part file
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except Exception:
+                    pass
+                self._file = None
+
+    def _write_queue(self):
+        while True:
+            try:
+                data = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._file is not None:
+                    self._file.flush()
+                    if self._segment_full():
+                        self._close_segment()
+                continue
+
+            if data is _CLOSE:
+                self._close_segment()
+                return
+
+            self._write_line(data)
+
+            # drain whatever else has arrived before flushing
+            while True:
+                try:
+                    data = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if data is _CLOSE:
+                    self._close_segment()
+                    return
+                self._write_line(data)
+
+            # the last line may have closed a full segment
+            if self._file is not None:
+                self._file.flush()
+
+    def _write_line(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        data = data.strip()
+        if not data:
+            return
+
+        if self._file is None:
+            self._open_segment()
+
+        line = (data + '\n').encode('utf-8')
+        self._file.write(line)
+        self._segment_bytes += len(line)
+        self.n_written += 1
+
+        if self._segment_full():
+            self._close_segment()
+
+    def _segment_full(self):
+        if self.max_bytes is not None and self._segment_bytes >= self.max_bytes:
+            return True
+        if self.max_seconds is not None and time.time() - self._segment_start >= self.max_seconds:
+            return True
+        return False
+
+    def _open_segment(self):
+        # skip the numbers of any segments already written with the same start time
+        while True:
+            path = self.path_prefix + '_' + self._start_time + '_' + str(self._n_segments) + '.ndjson'
+            if self.compress:
+                path += '.gz'
+            self._n_segments += 1
+            if not os.path.exists(path) and not os.path.exists(path + '.part'):
+                break
+        self._part_path = path + '.part'
+
+        if self.compress:
+            self._file = gzip.open(self._part_path, 'wb')
+        else:
+            self._file = io.open(self._part_path, 'wb', buffering=1024*1024)
+
+        self.segment_paths.append(path)
+        self._segment_bytes = 0
+        self._segment_start = time.time()
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+
+        self._file.close()
+        os.replace(self._part_path, self.segment_paths[-1])
+        self._file = None
+        self._part_path = None
+
+
+def read_segments(path_prefix='raw_tweets', raw=False):
+    """
+    Read the finished segments written by StreamSink, in the order they were written
+
+    :param path_prefix: Str, the path_prefix the StreamSink was given
+    :param raw: Bool, yield the json strings rather than decoding them (e.g. for create_twitter_mention_df_from_json)
+
+    :return: Generator of tweet dicts (or json strings)
+    """
+
+    paths = glob.glob(glob.escape(path_prefix) + '_*.ndjson') + glob.glob(glob.escape(path_prefix) + '_*.ndjson.gz')
+    paths = sorted(paths, key=lambda path: _segment_order(path, path_prefix))
+
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else io.open
+        with opener(path, 'rt', encoding='utf-8') as openfile:
+            for line in openfile:
+                if raw:
+                    yield line
+                elif line.strip():
+                    yield json.loads(line)
+
+
+def _segment_order(path, path_prefix):
+    start_time, segment = os.path.basename(path)[len(os.path.basename(path_prefix)) + 1:].split('.')[0].split('_')
+    return start_time, int(segment)
@@ -5,16 +5,38 @@
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
 
+import json
+
+import numpy as np
 import pandas as pd
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from usherwood_ds.data_imports.import_classes.twitter_classes import TwitterTextMention, TwitterUser
+from usherwood_ds.data_imports.unified_import import TWITTER_DATE_FORMAT, records_to_columns, parse_date_column
+
+TWITTER_USER_COLUMNS = ['Twitter Author ID', 'Domain', 'Source', 'Full Name', 'Username', 'Bio',
+                        'Profile Picture URL', 'Follower Count', 'Verified', 'Number of Statuses', 'Date Created',
+                        'Author ID']
+TWITTER_MENTION_COLUMNS = ['Tweet ID', 'Domain', 'Source', 'Url', 'Author ID', 'Date (GMT)', 'Date (Local)',
+                           'Date (Local - Zone)', 'Snippet', 'Sentiment', 'Location', 'Long', 'Lat', 'Retweet Count',
+                           'Favorite Count', 'Device', 'ID', 'Image URL', 'is Retweet', 'ID of Reweet',
+                           'ID of Original Tweet Author', 'Screen Name of Original Tweet Author', 'is Response',
+                           'ID of Antecedent Tweet', 'ID of Antecedent Author', 'Screen Name of Antecedent Author',
+                           'is Quoting', 'ID of Quoted Tweet', 'ID of Quoted Author', 'Screen Name of Quoted Author']
 
-def create_twitter_df(mention_list, user_list):
+
+def create_twitter_df(mention_list, user_list, date_errors='raise'):
     """
     Creates a Pandas df of records from python lists of Twitter user objects and Twitter mention objects. A record is
     the combination of a user and a mention
 
     :param mention_list: List of Twitter mention objects
     :param user_list: List of Twitter user objects
+    :param date_errors: Str, 'raise' or 'coerce' dates that do not parse, see parse_date_column
     :return: records_df - A Pandas df where each row is a record, consisting of a mention and user complete
     with meta-variables
     """
@@ -22,8 +44,8 @@ def create_twitter_df(mention_list, user_list):
     mention_list = mention_list
     user_list = user_list
 
-    mentions_df = create_twitter_mention_df(mention_list)
-    users_df = create_twitter_user_df(user_list)
+    mentions_df = create_twitter_mention_df(mention_list, date_errors=date_errors)
+    users_df = create_twitter_user_df(user_list, date_errors=date_errors)
 
     record_df = pd.merge(how='left', left=mentions_df, right=users_df, on=['Author ID', 'Source', 'Domain'])
 
@@ -32,58 +54,171 @@ def create_twitter_df(mention_list, user_list):
     return record_df
 
 
-def create_twitter_user_df(twitter_user_list):
+def create_twitter_user_df(twitter_user_list, date_errors='raise'):
     """
     Creates a Pandas df of users from a list of TwitterUser objects
 
-    :param twitter_user_list: List of TwitterUser objects
+    :param twitter_user_list: List of TwitterUser objects (or RecordColumns of them), raw created_at strings
+    (parse_dates=False) are parsed together
+    :param date_errors: Str, 'raise' or 'coerce' dates that do not parse, see parse_date_column
 
     :return: twitter_users_df - A Pandas df where each row is a user, with all user specific meta variables
     """
 
-    twitter_user_list = twitter_user_list
-
-    user_lists = []
-    for user in twitter_user_list:
-        user_lists.append(user.to_list())
+    columns = records_to_columns(twitter_user_list, TWITTER_USER_COLUMNS, TwitterUser.fields)
+    columns['Date Created'] = parse_date_column(columns['Date Created'], TWITTER_DATE_FORMAT,
+                                               errors=date_errors)
 
-    twitter_users_df = pd.DataFrame(user_lists, columns=['Twitter Author ID', 'Domain', 'Source', 'Full Name',
-                                                         'Username', 'Bio', 'Profile Picture URL', 'Follower Count',
-                                                         'Verified', 'Number of Statuses', 'Date Created', 'Author ID'])
+    twitter_users_df = pd.DataFrame(columns, columns=TWITTER_USER_COLUMNS)
 
     twitter_users_df = twitter_users_df.drop_duplicates(subset=['Twitter Author ID'])
 
     return twitter_users_df
 
 
-def create_twitter_mention_df(twitter_mention_list):
+def create_twitter_mention_df(twitter_mention_list, date_errors='raise'):
     """
     Creates a Pandas df of users from a list of TwitterTextMention objects
 
-    :param twitter_mention_list: List of TwitterTextMention objects
+    :param twitter_mention_list: List of TwitterTextMention objects (or RecordColumns of them), raw created_at
+    strings (parse_dates=False) are parsed together
+    :param date_errors: Str, 'raise' or 'coerce' dates that do not parse, see parse_date_column
+
+    :return: twitter_mentions_df - A Pandas df where each row is a tweet, with all tweet specific meta variables
+    """
+
+    columns = records_to_columns(twitter_mention_list, TWITTER_MENTION_COLUMNS, TwitterTextMention.fields)
+    columns['Date (GMT)'] = parse_date_column(columns['Date (GMT)'], TWITTER_DATE_FORMAT, errors=date_errors)
+
+    twitter_mentions_df = pd.DataFrame(columns, columns=TWITTER_MENTION_COLUMNS)
+
+    twitter_mentions_df.drop_duplicates(subset=['Tweet ID'], inplace=True)
+
+    return twitter_mentions_df
+
+
+def create_twitter_mention_df_from_json(tweets, date_errors='raise'):
+    """
+    Creates the same Pandas df as create_twitter_mention_df straight from raw tweets, without TwitterTextMention
+    objects. Each field is appended to its column buffer as the tweet is read and the dates are parsed together at
+    the end. Counts and flags are int64 columns, or nullable Int64 if a count is missing. JSON lines are decoded with
+    orjson when it is installed
+
+    :param tweets: Iterable of Twitter json responses, either dicts or JSON strings (e.g. an open file of one tweet
+    per line)
+    :param date_errors: Str, 'raise' or 'coerce' dates that do not parse, see parse_date_column
 
     :return: twitter_mentions_df - A Pandas df where each row is a tweet, with all tweet specific meta variables
     """
 
-    twitter_mention_list = twitter_mention_list
-
-    mention_lists = []
-    for mention in twitter_mention_list:
-        mention_lists.append(mention.to_list())
-
-    twitter_mentions_df = pd.DataFrame(mention_lists, columns=['Tweet ID', 'Domain', 'Source', 'Url', 'Author ID',
-                                                               'Date (GMT)', 'Date (Local)', 'Date (Local - Zone)',
-                                                               'Snippet', 'Sentiment', 'Location', 'Long', 'Lat',
-                                                               'Retweet Count', 'Favorite Count', 'Device', 'ID',
-                                                               'Image URL', 'is Retweet', 'ID of Reweet',
-                                                               'ID of Original Tweet Author',
-                                                               'Screen Name of Original Tweet Author',
-                                                               'is Response', 'ID of Antecedent Tweet',
-                                                               'ID of Antecedent Author',
-                                                               'Screen Name of Antecedent Author',
-                                                               'is Quoting', 'ID of Quoted Tweet',
-                                                               'ID of Quoted Author',
-                                                               'Screen Name of Quoted Author'])
+    loads = orjson.loads if orjson is not None else json.loads
+
+    int_columns = ['Retweet Count', 'Favorite Count', 'is Retweet', 'is Response', 'is Quoting']
+    columns = dict((name, []) for name in TWITTER_MENTION_COLUMNS)
+
+    tweet_ids = columns['Tweet ID'].append
+    urls = columns['Url'].append
+    author_ids = columns['Author ID'].append
+    dates = columns['Date (GMT)'].append
+    snippets = columns['Snippet'].append
+    longs = columns['Long'].append
+    lats = columns['Lat'].append
+    retweet_counts = columns['Retweet Count'].append
+    favorite_counts = columns['Favorite Count'].append
+    devices = columns['Device'].append
+    doc_ids = columns['ID'].append
+    image_urls = columns['Image URL'].append
+    is_retweets = columns['is Retweet'].append
+    retweet_ids = columns['ID of Reweet'].append
+    original_author_ids = columns['ID of Original Tweet Author'].append
+    original_screen_names = columns['Screen Name of Original Tweet Author'].append
+    is_responses = columns['is Response'].append
+    antecedent_ids = columns['ID of Antecedent Tweet'].append
+    antecedent_author_ids = columns['ID of Antecedent Author'].append
+    antecedent_screen_names = columns['Screen Name of Antecedent Author'].append
+    is_quotings = columns['is Quoting'].append
+    quoted_ids = columns['ID of Quoted Tweet'].append
+    quoted_author_ids = columns['ID of Quoted Author'].append
+    quoted_screen_names = columns['Screen Name of Quoted Author'].append
+
+    n_tweets = 0
+    for tweet in tweets:
+        if isinstance(tweet, (str, bytes)):
+            if not tweet.strip():
+                continue
+            tweet = loads(tweet)
+        n_tweets += 1
+
+        tweet_id = str(tweet['id'])
+        url = 'https://twitter.com/statuses/' + tweet_id
+        tweet_ids(tweet_id)
+        urls(url)
+        author_ids('twitter.com' + str(tweet['user']['id']))
+        dates(tweet['created_at'])
+        snippets(tweet['text'])
+        favorite_counts(tweet.get('favorite_count'))
+        devices(tweet['source'])
+        doc_ids(str(tweet['text']) + url)
+
+        geo = tweet['geo']
+        if geo is not None:
+            longs(geo['coordinates'][0])
+            lats(geo['coordinates'][1])
+        else:
+            longs(None)
+            lats(None)
+
+        image_url = None
+        if tweet['entities'] is not None and tweet['entities'].get('media'):
+            image_url = tweet['entities']['media'][0].get('media_url') or None
+        image_urls(image_url)
+
+        retweeted_status = tweet.get('retweeted_status')
+        if retweeted_status is not None:
+            # a retweet carries the retweet count of the original tweet so it is set to 0
+            retweet_counts(0)
+            is_retweets(1)
+            retweet_ids(retweeted_status['id'])
+            original_author_ids(retweeted_status['user']['id'])
+            original_screen_names(retweeted_status['user']['screen_name'])
+        else:
+            retweet_counts(tweet.get('retweet_count'))
+            is_retweets(0)
+            retweet_ids(None)
+            original_author_ids(None)
+            original_screen_names(None)
+
+        quoted_status = tweet.get('quoted_status')
+        if quoted_status is not None:
+            is_quotings(1)
+            quoted_ids(quoted_status['id'])
+            quoted_author_ids(quoted_status['user']['id'])
+            quoted_screen_names(quoted_status['user']['screen_name'])
+        else:
+            is_quotings(0)
+            quoted_ids(None)
+            quoted_author_ids(None)
+            quoted_screen_names(None)
+
+        antecedent_ids(tweet['in_reply_to_status_id'])
+        antecedent_screen_names(tweet['in_reply_to_screen_name'])
+        antecedent_author_ids(tweet['in_reply_to_user_id'])
+        is_responses(0 if tweet['in_reply_to_status_id'] is None else 1)
+
+    columns['Domain'] = ['twitter.com'] * n_tweets
+    columns['Source'] = ['TwitterAPI'] * n_tweets
+    columns['Date (Local)'] = [None] * n_tweets
+    columns['Date (Local - Zone)'] = [None] * n_tweets
+    columns['Sentiment'] = ['Not Found'] * n_tweets
+    columns['Location'] = ['Not added'] * n_tweets
+    for name in int_columns:
+        if None in columns[name]:
+            columns[name] = pd.array(columns[name], dtype='Int64')
+        else:
+            columns[name] = np.array(columns[name], dtype=np.int64)
+    columns['Date (GMT)'] = parse_date_column(columns['Date (GMT)'], TWITTER_DATE_FORMAT, errors=date_errors)
+
+    twitter_mentions_df = pd.DataFrame(columns, columns=TWITTER_MENTION_COLUMNS)
 
     twitter_mentions_df.drop_duplicates(subset=['Tweet ID'], inplace=True)
 
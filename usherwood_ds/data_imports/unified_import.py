@@ -5,16 +5,29 @@
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
 
+import warnings
+
+import numpy as np
 import pandas as pd
 
+from usherwood_ds.data_imports.import_classes.common_classes import TextMention, User, RecordColumns
+
+TWITTER_DATE_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+YOUTUBE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+COMMON_USER_COLUMNS = ['Author ID', 'Domain', 'Source', 'Full Name', 'Username', 'Bio', 'Profile Picture URL']
+COMMON_MENTION_COLUMNS = ['ID', 'Domain', 'Source', 'URL', 'Author ID', 'Date (GMT)', 'Date (Local)',
+                          'Date (Local - Zone)', 'Snippet', 'Sentiment', 'Location', 'Long', 'Lat']
+
 
-def create_common_df(mention_list, user_list):
+def create_common_df(mention_list, user_list, date_errors='raise'):
     """
     Creates a Pandas df of records from python lists of common user objects and common mention objects. A record is
     the combination of a user and a mention
 
     :param mention_list: List of common mention objects
     :param user_list: List of common user objects
+    :param date_errors: Str, 'raise' or 'coerce' dates that do not parse, see parse_date_column
     :return: records_df - A Pandas df where each row is a record, consisting of a mention and user complete
     with meta-variables
     """
@@ -22,7 +35,7 @@ def create_common_df(mention_list, user_list):
     mention_list = mention_list
     user_list = user_list
 
-    mentions_df = create_common_mention_df(mention_list)
+    mentions_df = create_common_mention_df(mention_list, date_errors=date_errors)
     users_df = create_common_user_df(user_list)
 
     record_df = pd.merge(how='left', left=mentions_df, right=users_df, on=['Author ID', 'Source', 'Domain'])
@@ -36,42 +49,116 @@ def create_common_user_df(user_list):
     """
     Creates a Pandas df of users from a list of common user objects
 
-    :param user_list: List of common user objects
+    :param user_list: List of common user objects, or RecordColumns of them
     :return: users_df - A Pandas df where each row is a user, with all user specific meta variables
     """
 
-    user_list = user_list
-
-    user_lists = []
-    for user in user_list:
-        user_lists.append(user.to_list())
-
-    users_df = pd.DataFrame(user_lists, columns=['Author ID', 'Domain', 'Source', 'Full Name', 'Username', 'Bio',
-                                                 'Profile Picture URL'])
+    users_df = pd.DataFrame(records_to_columns(user_list, COMMON_USER_COLUMNS, User.fields),
+                            columns=COMMON_USER_COLUMNS)
 
     users_df = users_df.drop_duplicates(subset=['Author ID'])
 
     return users_df
 
 
-def create_common_mention_df(mention_list):
+def create_common_mention_df(mention_list, date_errors='raise'):
     """
     Creates a Pandas df of users from a list of common mention objects
 
-    :param mention_list: List of common mention objects
+    :param mention_list: List of common mention objects, or RecordColumns of them
+    :param date_errors: Str, 'raise' or 'coerce' dates that do not parse, see parse_date_column
     :return: mentions_df - A Pandas df where each row is a mention, with all mention specific meta variables
     """
 
-    mention_list = mention_list
-
-    mention_lists = []
-    for mention in mention_list:
-        mention_lists.append(mention.to_list())
+    columns = records_to_columns(mention_list, COMMON_MENTION_COLUMNS, TextMention.fields)
+    columns['Date (GMT)'] = parse_date_column(columns['Date (GMT)'], errors=date_errors)
 
-    mentions_df = pd.DataFrame(mention_lists, columns=['ID', 'Domain', 'Source', 'URL', 'Author ID', 'Date (GMT)',
-                                                       'Date (Local)', 'Date (Local - Zone)', 'Snippet', 'Sentiment',
-                                                       'Location', 'Long', 'Lat'])
+    mentions_df = pd.DataFrame(columns, columns=COMMON_MENTION_COLUMNS)
 
     mentions_df = mentions_df.drop_duplicates(subset=['ID'])
 
     return mentions_df
+
+
+def records_to_columns(records, column_names, fields):
+    """
+    The columns of a list of record objects (mentions or users) or of a RecordColumns, without building a list per
+    record
+
+    :param records: List of record objects, or RecordColumns
+    :param column_names: List of the df column names, in fields order
+    :param fields: Tuple of the record attribute names, usually the record class's fields
+
+    :return: Dict of column name: list of values
+    """
+
+    if not isinstance(records, RecordColumns):
+        columns = RecordColumns(fields)
+        columns.extend(records)
+        records = columns
+
+    return records.to_dict(column_names)
+
+
+def parse_date_column(dates, date_format=None, errors='raise'):
+    """
+    Parse a column of raw dates in one go, as kept by the api parsers with parse_dates=False. Strings are parsed with
+    date_format (or the Twitter, then the Youtube format) and numbers as epoch seconds (Reddit), to UTC unless
+    date_format has no utc offset (as strptime would). Values that are already dates are converted the same way
+
+    :param dates: List or Pandas series of raw dates
+    :param date_format: Str, strptime format of the date strings, None to try the Twitter then the Youtube format
+    :param errors: Str, 'raise' to raise a ValueError for strings that do not parse, 'coerce' to set them to NaT (with
+    a warning of how many)
+
+    :return: Pandas series of dates
+    """
+
+    if errors not in ['raise', 'coerce']:
+        raise ValueError("errors must be 'raise' or 'coerce', not " + repr(errors))
+
+    dates = pd.Series(dates, dtype=object)
+    types = dates.map(type)
+    strings = types.eq(str).values
+    epochs = types.isin([int, float, np.int64, np.float64]).values & dates.notna().values
+
+    if not strings.any() and not epochs.any():
+        return _to_datetime_column(dates, errors)
+
+    parsed = dates.copy()
+    if strings.any():
+        formats = [date_format] if date_format else [TWITTER_DATE_FORMAT, YOUTUBE_DATE_FORMAT]
+        utc = date_format is None or '%z' in date_format
+        raw = dates[strings]
+        converted = pd.to_datetime(raw, format=formats[0], utc=utc, errors='coerce')
+        for fallback_format in formats[1:]:
+            missing = converted.isna()
+            if missing.any():
+                converted[missing] = pd.to_datetime(raw[missing], format=fallback_format, utc=True, errors='coerce')
+
+        failed = converted.isna()
+        if failed.any():
+            message = (str(failed.sum()) + ' of ' + str(len(dates)) + ' dates do not match ' +
+                       ' or '.join(repr(fmt) for fmt in formats) + ', e.g. ' +
+                       repr(raw[failed].iloc[0]))
+            if errors == 'raise':
+                raise ValueError(message + ", pass errors='coerce' to set them to NaT")
+            warnings.warn(message + ', they have been set to NaT')
+
+        if strings.all():
+            return converted
+        parsed[strings] = list(converted)
+    if epochs.any():
+        if epochs.all():
+            return pd.to_datetime(dates.astype(np.float64), unit='s', utc=True)
+        parsed[epochs] = list(pd.to_datetime(dates[epochs].astype(np.float64), unit='s', utc=True))
+
+    return _to_datetime_column(parsed, errors)
+
+
+def _to_datetime_column(dates, errors):
+    # a datetime64 column from dates that are already parsed, in UTC if any of them has a utc offset (as a
+    # DataFrame of strptime datetimes would be) and naive otherwise
+    utc = bool(dates.map(lambda date: getattr(date, 'tzinfo', None) is not None).any())
+
+    return pd.to_datetime(dates, utc=utc, errors=errors)
@@ -5,27 +5,110 @@
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import os
+import threading
 import time
 from datetime import datetime
 
 from apiclient.discovery import build
+from apiclient.errors import HttpError
 from usherwood_ds.data_imports.import_classes.youtube_classes import YoutubeTextComment, YoutubeVideo, YoutubeUser
 from usherwood_ds.data_imports.import_classes.common_classes import User, TextMention
+from usherwood_ds.data_imports.twitter_api.api_class import chunks
+from usherwood_ds.data_imports.unified_import import YOUTUBE_DATE_FORMAT
 
 
-with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../api_credentials.json"), 'r') as openfile:
-    api_credentials = json.load(openfile)
+CREDENTIALS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "../api_credentials.json")
+
+# the module can be imported (e.g. for the parsers) without credentials, they are only needed to connect
+api_credentials = None
+if os.path.exists(CREDENTIALS_PATH):
+    with open(CREDENTIALS_PATH, 'r') as openfile:
+        api_credentials = json.load(openfile)
+
+
+# the api quota cost of each request type
+SEARCH_COST = 100
+LIST_COST = 1
 
 
 class YoutubeAPI:
 
-    def __init__(self, api_credentials=api_credentials):
+    def __init__(self, api_credentials=api_credentials, http=None, quota_per_second=None, http_factory=None):
+        """
+        :param api_credentials: Dict, the api credentials
+        :param http: httplib2.Http (or a googleapiclient HttpMock for testing) for the requests made from this
+        thread, None for the default
+        :param quota_per_second: Float, the quota units per second to keep the requests under (shared by every
+        thread), None for no throttle
+        :param http_factory: Callable returning a new httplib2.Http (or HttpMock), called once for each worker thread
+        of the concurrent pagers as an Http cannot be shared between threads, None for a default Http per thread
+        """
+
+        if api_credentials is None:
+            raise FileNotFoundError('No api_credentials given and ' + CREDENTIALS_PATH + ' does not exist, see '
+                                    'api_credentials.json.template')
 
         self.developer_key = api_credentials["Youtube"]["developer_key"]
-        self.api = build("youtube", "v3", developerKey=self.developer_key)
+        self.http = http
+        self.http_factory = http_factory
+        self.api = self.build_service(http)
         self.wait_time = 0
+        self.throttle = QuotaThrottle(quota_per_second) if quota_per_second else None
+
+        # set once the quota runs out so the other threads of a concurrent pager stop requesting
+        self.quota_exceeded = threading.Event()
+        # the errors of the ids the last concurrent pager could not page through, id: exception
+        self.page_errors = dict()
+
+        # service objects and their Http are not thread safe, each thread of the concurrent pagers builds its own
+        self._local = threading.local()
+        self._local.api = self.api
+
+    def build_service(self, http=None):
+        """
+        :param http: httplib2.Http (or HttpMock) for the service's requests, None for a new default one
+
+        :return: A new Youtube api service object
+        """
+
+        return build("youtube", "v3", developerKey=self.developer_key, http=http)
+
+    def service(self):
+        """
+        :return: The Youtube api service object of the current thread
+        """
+
+        if getattr(self._local, 'api', None) is None:
+            self._local.api = self.build_service(self.http_factory() if self.http_factory is not None else None)
+
+        return self._local.api
+
+    def execute(self, request, cost=LIST_COST):
+        """
+        Execute a request once the throttle allows its quota cost
+
+        :param request: googleapiclient HttpRequest
+        :param cost: Int, the quota cost of the request
+
+        :return: The json response
+        """
+
+        if self.quota_exceeded.is_set():
+            raise QuotaExceeded('Youtube api daily quota exceeded')
+
+        if self.throttle is not None:
+            self.throttle.acquire(cost)
+
+        try:
+            return request.execute()
+        except HttpError as e:
+            if e.resp.status == 403 and b'quotaExceeded' in e.content:
+                self.quota_exceeded.set()
+                raise QuotaExceeded('Youtube api daily quota exceeded')
+            raise
 
     def fortify_channel(self, channel_id=None, channel_name=None, fortify_with='snippet,statistics'):
         """
@@ -71,6 +154,64 @@ class YoutubeAPI:
             print('All parts not found for video, skipping')
             return {'id':video_id}
 
+    def fortify_videos_batch(self, video_ids, fortify_with='snippet,contentDetails,statistics'):
+        """
+        Fortify many Youtube video ids with the full json responses, 50 per request rather than fortify_video's one
+
+        :param video_ids: List of str, Youtube video ids
+        :param fortify_with: Str, the parts of the json to return
+
+        :return: List of Youtube video json responses in video_ids order, {'id': video_id} for those not found
+        """
+
+        found = dict()
+        for chunk in chunks(list(video_ids), 50):
+            try:
+                response = self.execute(self.service().videos().list(part=fortify_with, id=','.join(chunk),
+                                                                      maxResults=50))
+                for video in response['items']:
+                    found[video['id']] = video
+            except QuotaExceeded:
+                raise
+            except Exception as e:
+                print(e)
+
+        n_missing = len([video_id for video_id in video_ids if video_id not in found])
+        if n_missing:
+            print('All parts not found for', str(n_missing), 'videos, skipping')
+
+        return [found.get(video_id, {'id': video_id}) for video_id in video_ids]
+
+    def fortify_channels_batch(self, channel_ids, fortify_with='snippet,statistics'):
+        """
+        Fortify many channel ids with the full json responses, 50 per request rather than fortify_channel's one
+
+        :param channel_ids: List of str, Youtube channel ids
+        :param fortify_with: Str, the parts of the json to return
+
+        :return: List of Youtube channel json responses in channel_ids order, {'channel_id': channel_id,
+        'channel_name': None, 'found': False} for those not found
+        """
+
+        found = dict()
+        for chunk in chunks(list(channel_ids), 50):
+            try:
+                response = self.execute(self.service().channels().list(part=fortify_with, id=','.join(chunk),
+                                                                        maxResults=50))
+                for channel in response['items']:
+                    found[channel['id']] = channel
+            except QuotaExceeded:
+                raise
+            except Exception as e:
+                print(e)
+
+        n_missing = len([channel_id for channel_id in channel_ids if channel_id not in found])
+        if n_missing:
+            print('All parts not found for', str(n_missing), 'channels, skipping')
+
+        return [found.get(channel_id, {'channel_id': channel_id, 'channel_name': None, 'found': False})
+                for channel_id in channel_ids]
+
     def get_videos_by_search_term(self,
                                   query,
                                   max_videos=50,
@@ -87,7 +228,7 @@ class YoutubeAPI:
 
         time.sleep(self.wait_time)
 
-        videos = []
+        video_ids = []
         n_requests = 0
 
         next_page_token = ""
@@ -97,26 +238,25 @@ class YoutubeAPI:
         else:
             geocode = {'location': str(location[0]) + ',' + str(location[1]), 'location_radius': location[2]}
 
-        while (next_page_token is not None) and (len(videos) < max_videos):
-            response = self.api.search().list(q=query,
-                                              type="video",
-                                              location=geocode['location'],
-                                              locationRadius=geocode['location_radius'],
-                                              part="id",
-                                              maxResults=50,
-                                              pageToken=next_page_token
-                                              ).execute()
+        while (next_page_token is not None) and (len(video_ids) < max_videos):
+            response = self.execute(self.service().search().list(q=query,
+                                                                  type="video",
+                                                                  location=geocode['location'],
+                                                                  locationRadius=geocode['location_radius'],
+                                                                  part="id",
+                                                                  maxResults=50,
+                                                                  pageToken=next_page_token),
+                                    cost=SEARCH_COST)
 
             n_requests += 1
             next_page_token = response.get('nextPageToken')
 
             for item in response['items']:
-                video_id = item['id']['videoId']
-                videos.append(self.fortify_video(video_id))
+                video_ids.append(item['id']['videoId'])
 
         print(str(n_requests * 50), 'videos searched')
 
-        return videos
+        return self.fortify_videos_batch(video_ids)
 
     def get_video_comments(self, video_id, num_comments=100, pt=''):
         """
@@ -132,11 +272,11 @@ class YoutubeAPI:
         comments = []
 
         while True:
-            response = self.api.commentThreads().list(
+            response = self.execute(self.service().commentThreads().list(
                 videoId=video_id,
                 part='snippet',
                 pageToken=pt,
-                maxResults=50).execute()
+                maxResults=50))
 
             for item in response['items']:
                 comments.append(item)
@@ -168,11 +308,10 @@ class YoutubeAPI:
 
         try:
             while True:
-                response = self.api.subscriptions().list(
+                response = self.execute(self.service().subscriptions().list(
                     part='snippet,contentDetails',
                     channelId=youtube_author_id,
-                    pageToken=pt
-                ).execute()
+                    pageToken=pt))
 
                 for item in response['items']:
                     subscriptions.append(item)
@@ -188,11 +327,73 @@ class YoutubeAPI:
 
                     return subscriptions
 
+        except QuotaExceeded:
+            raise
+
         except Exception as e:
 
             print(e)
             return subscriptions
 
+    def get_videos_comments(self, video_ids, num_comments=100, max_workers=8):
+        """
+        Get the comments of many Youtube videos, the videos are paged through concurrently (each thread with its own
+        service object) under the quota throttle. A video whose comments cannot be read (e.g. comments disabled or
+        video not found) gets an empty list and its error is kept in page_errors. If the quota runs out the other
+        threads stop and the videos finished so far are returned
+
+        :param video_ids: List of str, Youtube video ids
+        :param num_comments: Int, the ideal maximum number of comments per video, -1 for all
+        :param max_workers: Int, the number of videos paged through at once
+
+        :return: Dict of video id: list of json Youtube comments, in video_ids order
+        """
+
+        return self._page_concurrently(self.get_video_comments, video_ids, num_comments, max_workers)
+
+    def get_users_subscriptions(self, youtube_author_ids, num_subscriptions=20, max_workers=8):
+        """
+        The subscriptions of many users, paged through concurrently as in get_videos_comments
+
+        :param youtube_author_ids: List of str, Youtube author IDs
+        :param num_subscriptions: Int, Maximum number of subscriptions to return per user
+        :param max_workers: Int, the number of users paged through at once
+
+        :return: Dict of author id: list of jsons, where each json is a user json, in youtube_author_ids order
+        """
+
+        return self._page_concurrently(self.get_user_subscriptions, youtube_author_ids, num_subscriptions,
+                                       max_workers)
+
+    def _page_concurrently(self, pager, ids, max_items, max_workers):
+        results = dict()
+        self.page_errors = dict()
+        self.quota_exceeded.clear()
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = dict((executor.submit(pager, idx, max_items), idx) for idx in ids)
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    try:
+                        results[idx] = future.result()
+                    except QuotaExceeded:
+                        # execute has stopped the running pagers, the queued ones need not start
+                        for queued in futures:
+                            queued.cancel()
+                    except Exception as e:
+                        print(idx, 'skipped,', str(e))
+                        self.page_errors[idx] = e
+                        results[idx] = []
+        finally:
+            self.quota_exceeded.clear()
+
+        if len(results) < len(futures):
+            print('Youtube api daily quota exceeded - returning the', str(len(results)), 'finished of',
+                  str(len(futures)))
+
+        return dict((idx, results[idx]) for idx in ids if idx in results)
+
     def get_playlist_video_ids(self, youtube_playlist_id, pt=''):
         """
         Return a list of video ids given a playlist ID
@@ -286,11 +487,13 @@ class YoutubeAPI:
             return next_page_tokens
 
     @staticmethod
-    def parse_video_to_youtube_video(video):
+    def parse_video_to_youtube_video(video, parse_dates=True):
         """
         Creates a Youtube Video object from a video response from the Youtube Data API
 
         :param video: the Youtube json response for a video
+        :param parse_dates: Bool, parse publishedAt here, False to keep the raw string for the df creation to parse
+        in bulk (much faster for large imports)
 
         :return: YoutubeVideo
         """
@@ -312,10 +515,10 @@ class YoutubeAPI:
         youtube_video.title = snippet.pop('title', None)
         youtube_video.description = snippet.pop('description', None)
         raw_time = snippet.pop('publishedAt', None)
-        if raw_time is None:
-            youtube_video.publish_date = None
+        if raw_time is None or not parse_dates:
+            youtube_video.publish_date = raw_time
         else:
-            youtube_video.publish_date = datetime.strptime(raw_time, '%Y-%m-%dT%H:%M:%S.%fZ')
+            youtube_video.publish_date = datetime.strptime(raw_time, YOUTUBE_DATE_FORMAT)
         youtube_video.view_count = statistics.pop('viewCount', 0)
         youtube_video.like_count = statistics.pop('likeCount', 0)
         youtube_video.dislike_count = statistics.pop('dislikeCount', 0)
@@ -324,11 +527,13 @@ class YoutubeAPI:
         return youtube_video
 
     @staticmethod
-    def parse_comment_to_youtube_comment(comment):
+    def parse_comment_to_youtube_comment(comment, parse_dates=True):
         """
         Creates a Youtube Comment Mention object from a comment from the Youtube Data API
 
         :param comment: the Youtube json response for a video comment
+        :param parse_dates: Bool, parse publishedAt here, False to keep the raw string for the df creation to parse
+        in bulk (much faster for large imports)
 
         :return: YoutubeTextComment
         """
@@ -350,8 +555,9 @@ class YoutubeAPI:
             youtube_comment.author_id = 'Not Found'
 
         youtube_comment.author_name = comment['snippet']['topLevelComment']['snippet']['authorDisplayName']
-        youtube_comment.date = datetime.strptime(comment['snippet']['topLevelComment']['snippet']['publishedAt'],
-                                                 '%Y-%m-%dT%H:%M:%S.%fZ')
+        youtube_comment.date = comment['snippet']['topLevelComment']['snippet']['publishedAt']
+        if parse_dates:
+            youtube_comment.date = datetime.strptime(youtube_comment.date, YOUTUBE_DATE_FORMAT)
         youtube_comment.snippet = comment['snippet']['topLevelComment']['snippet']['textDisplay']
         youtube_comment.youtube_video_id = comment['snippet']['topLevelComment']['snippet']['videoId']
         youtube_comment.like_count = comment['snippet']['topLevelComment']['snippet']['likeCount']
@@ -436,11 +642,13 @@ class YoutubeAPI:
         return common_user
 
     @staticmethod
-    def parse_comment_to_common_mention(comment):
+    def parse_comment_to_common_mention(comment, parse_dates=True):
         """
         Creates a Text Comment Mention object from a comment from the Youtube Data API
 
         :param comment: the Youtube json response for a video comment
+        :param parse_dates: Bool, parse publishedAt here, False to keep the raw string for the df creation to parse
+        in bulk (much faster for large imports)
 
         :return: TextMention
         """
@@ -460,8 +668,9 @@ class YoutubeAPI:
             print(e)
             common_comment.author_id = 'Not Found'
 
-        common_comment.dategmt = datetime.strptime(comment['snippet']['topLevelComment']['snippet']['publishedAt'],
-                                                 '%Y-%m-%dT%H:%M:%S.%fZ')
+        common_comment.dategmt = comment['snippet']['topLevelComment']['snippet']['publishedAt']
+        if parse_dates:
+            common_comment.dategmt = datetime.strptime(common_comment.dategmt, YOUTUBE_DATE_FORMAT)
         common_comment.datelocal = None
         common_comment.datelocalzone = None
         common_comment.snippet = comment['snippet']['topLevelComment']['snippet']['textDisplay']
@@ -471,4 +680,46 @@ class YoutubeAPI:
         common_comment.lat = None
         common_comment.long = None
 
-        return common_comment
\ No newline at end of file
+        return common_comment
+
+
+class QuotaThrottle:
+    """
+    Token bucket shared by threads, keeps the quota units spent per second under a rate
+    """
+
+    def __init__(self, units_per_second, burst=None):
+        """
+        :param units_per_second: Float, the quota units allowed per second
+        :param burst: Float, the most units that can be spent at once, None for one second's worth (at least one search)
+        """
+
+        self.units_per_second = float(units_per_second)
+        self.burst = float(burst) if burst is not None else max(self.units_per_second, SEARCH_COST)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, units=LIST_COST):
+        """
+        Wait until the units can be spent, then spend them
+
+        :param units: Float, quota units of the request
+        """
+
+        units = min(units, self.burst)
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.units_per_second)
+                self.last = now
+                if self.tokens >= units:
+                    self.tokens -= units
+                    return
+                wait = (units - self.tokens) / self.units_per_second
+            time.sleep(wait)
+
+
+class QuotaExceeded(Exception):
+    pass
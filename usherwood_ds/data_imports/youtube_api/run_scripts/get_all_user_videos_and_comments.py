@@ -10,6 +10,8 @@ import pandas as pd
 import os
 
 from usherwood_ds.data_imports.youtube_api.api_class import YoutubeAPI
+from usherwood_ds.data_imports.import_classes.common_classes import RecordColumns
+from usherwood_ds.data_imports.import_classes.youtube_classes import YoutubeVideo, YoutubeTextComment
 from usherwood_ds.data_imports.youtube_import import create_youtube_video_df, create_youtube_comment_df
 
 
@@ -30,13 +32,11 @@ def get_all_user_videos_and_comments(youtube_author_id='UCa1yUHQmV6Z0PpAUtfgNd9g
                                    youtube_author_id)
 
     # Fortify all videos
-    video_jsons = []
-    for video_id in video_ids:
-        video_jsons += [api.fortify_video(video_id)]
+    video_jsons = api.fortify_videos_batch(video_ids)
 
-    parsed_videos = []
+    parsed_videos = RecordColumns(YoutubeVideo.fields)
     for video in video_jsons:
-        parsed_videos += [api.parse_video_to_youtube_video(video)]
+        parsed_videos.append(api.parse_video_to_youtube_video(video, parse_dates=False))
 
     df_video = create_youtube_video_df(parsed_videos)
 
@@ -85,9 +85,9 @@ def get_video_comments_df(api, video_id, max_comments):
                                           num_comments=max_comments)
         print(str(len(comments)), 'comments found.')
 
-        parsed_comments = []
+        parsed_comments = RecordColumns(YoutubeTextComment.fields)
         for comment in comments:
-            parsed_comments += [api.parse_comment_to_youtube_comment(comment)]
+            parsed_comments.append(api.parse_comment_to_youtube_comment(comment, parse_dates=False))
         df_comments = create_youtube_comment_df(parsed_comments)
 
         return df_comments
@@ -9,6 +9,8 @@ import os
 import time
 
 from usherwood_ds.data_imports.youtube_api.api_class import YoutubeAPI
+from usherwood_ds.data_imports.import_classes.common_classes import RecordColumns
+from usherwood_ds.data_imports.import_classes.youtube_classes import YoutubeTextComment
 from usherwood_ds.data_imports.youtube_import import create_youtube_comment_df
 
 
@@ -21,9 +23,9 @@ def video_comments_to_excel(video_id='sr6lr_VRsEo',
     comments = api.get_video_comments(video_id, num_comments=num_comments)
     print(str(len(comments)), 'comments found.')
 
-    parsed_comments = []
+    parsed_comments = RecordColumns(YoutubeTextComment.fields)
     for comment in comments:
-        parsed_comments += [api.parse_comment_to_youtube_comment(comment)]
+        parsed_comments.append(api.parse_comment_to_youtube_comment(comment, parse_dates=False))
     df_comments = create_youtube_comment_df(parsed_comments)
 
     filename = 'downloads/youtube_comments_'+str(video_id)+'_'+str(time.time())+'.xlsx'
@@ -9,6 +9,8 @@ import os
 import time
 
 from usherwood_ds.data_imports.youtube_api.api_class import YoutubeAPI
+from usherwood_ds.data_imports.import_classes.common_classes import RecordColumns
+from usherwood_ds.data_imports.import_classes.youtube_classes import YoutubeVideo
 from usherwood_ds.data_imports.youtube_import import create_youtube_video_df
 
 
@@ -21,9 +23,9 @@ def video_query_to_excel(query='dogs',
     videos = api.get_videos_by_search_term(query, max_videos=max_videos, location=None)
     print(str(len(videos)), 'videos found')
 
-    parsed_videos = []
+    parsed_videos = RecordColumns(YoutubeVideo.fields)
     for video in videos:
-        parsed_videos += [api.parse_video_to_youtube_video(video)]
+        parsed_videos.append(api.parse_video_to_youtube_video(video, parse_dates=False))
     df_video = create_youtube_video_df(parsed_videos)
 
     filename = 'downloads/youtube_video_query_'+str(query)+'_'+str(time.time())+'.xlsx'
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""Background loading of the training chunks saved on disk, so the next chunk is read while the net trains"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.6"
+
+
+class ChunkLoader:
+    """
+    Training chunks read from the memory-mapped "train_Xi.npy" and "train_Yi.npy" files on a background thread, up to
+    prefetch chunks ahead of training. Optionally the chunk order is shuffled and the images of every mix_chunks chunks
+    are shuffled together, so each chunk the net is fit on draws from several chunks on disk
+    """
+
+    def __init__(self,
+                 path_to_training_data,
+                 n_chunks,
+                 prefetch=2,
+                 shuffle=False,
+                 mix_chunks=2):
+        """
+        :param path_to_training_data: Path to a folder containing training data named "train_Xi" and "train_Yi"
+        :param n_chunks: Int, number of chunks, numbered from 1
+        :param prefetch: Int, number of chunks to read ahead (each is held in memory)
+        :param shuffle: Bool, shuffle the chunk order and the images across chunk boundaries
+        :param mix_chunks: Int, number of chunks whose images are shuffled together when shuffle is True
+        """
+
+        self.prefetch = prefetch
+        self.shuffle = shuffle
+        self.mix_chunks = mix_chunks
+
+        # memory-mapped, nothing is read until a chunk is gathered
+        self.X = []
+        self.Y = []
+        for i in range(1, n_chunks + 1):
+            self.X.append(np.load(path_to_training_data + 'train_X' + str(i) + '.npy', mmap_mode='r'))
+            self.Y.append(np.load(path_to_training_data + 'train_Y' + str(i) + '.npy', mmap_mode='r'))
+
+    def __len__(self):
+        return len(self.X)
+
+    def __iter__(self):
+        """
+        Yields tuples of the chunk's images, its targets and the seconds spent reading it. An error reading the chunks
+        is raised here, and the background thread stops if the iteration is left early
+        """
+
+        chunks = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            # give up once the consumer has stopped iterating, rather than waiting on a full queue forever
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_chunks():
+            try:
+                for positions in self.epoch_chunks():
+                    start = time.time()
+                    train_x, train_y = self.read_chunk(positions)
+                    if not put((train_x, train_y, time.time() - start)):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            put(None)
+
+        thread = threading.Thread(target=read_chunks, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            stop.set()
+            thread.join()
+
+    def epoch_chunks(self):
+        """
+        The images making up each chunk to train on, as (chunk on disk, row) pairs
+
+        :return: List of tuples of np arrays, the chunk numbers and rows of the images in each training chunk
+        """
+
+        order = np.arange(len(self.X))
+        if not self.shuffle:
+            return [(np.full(len(self.X[i]), i), np.arange(len(self.X[i]))) for i in order]
+
+        np.random.shuffle(order)
+
+        chunks = []
+        for start in range(0, len(order), self.mix_chunks):
+            group = order[start:start + self.mix_chunks]
+            sizes = [len(self.X[i]) for i in group]
+            disk_chunks = np.repeat(group, sizes)
+            rows = np.concatenate([np.arange(size) for size in sizes])
+
+            permutation = np.random.permutation(len(rows))
+            disk_chunks = disk_chunks[permutation]
+            rows = rows[permutation]
+
+            bounds = np.cumsum(sizes)[:-1]
+            chunks += list(zip(np.split(disk_chunks, bounds), np.split(rows, bounds)))
+
+        return chunks
+
+    def read_chunk(self, positions):
+        """
+        Gather one training chunk from the memory-mapped chunks on disk, each image is copied once
+
+        :param positions: Tuple of np arrays, the chunk numbers and rows of the images
+
+        :return: Tuple of np arrays, images and targets
+        """
+
+        disk_chunks, rows = positions
+
+        if len(np.unique(disk_chunks)) == 1:
+            i = disk_chunks[0]
+            if np.array_equal(rows, np.arange(len(self.X[i]))):
+                return np.array(self.X[i]), np.array(self.Y[i])
+
+        train_x = np.empty((len(rows),) + self.X[disk_chunks[0]].shape[1:], dtype=self.X[disk_chunks[0]].dtype)
+        train_y = np.empty((len(rows),) + self.Y[disk_chunks[0]].shape[1:], dtype=self.Y[disk_chunks[0]].dtype)
+        for i in np.unique(disk_chunks):
+            in_chunk = np.flatnonzero(disk_chunks == i)
+            # reading the rows in file order keeps the disk access sequential
+            file_order = np.argsort(rows[in_chunk])
+            train_x[in_chunk[file_order]] = self.X[i][rows[in_chunk][file_order]]
+            train_y[in_chunk[file_order]] = self.Y[i][rows[in_chunk][file_order]]
+
+        return train_x, train_y
@@ -3,6 +3,7 @@
 """Application of convolution networks using Lasagne and Kerasr"""
 
 import os
+import time
 import numpy as np
 import lasagne
 from lasagne import layers
@@ -10,6 +11,8 @@ from lasagne.updates import nesterov_momentum
 from nolearn.lasagne import NeuralNet
 import progressbar
 
+from usherwood_ds.neural_networks.projects.convolutional.profile_picture_demographics.chunk_loader import ChunkLoader
+
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.6"
 
@@ -78,29 +81,60 @@ class AgeClassifier:
             verbose=1,
         )
 
+    def load_weights(self, filepath='age_model'):
+        """
+        Load weights saved during train_from_disk
+
+        :param filepath: Filepath of the saved weights
+        """
+
+        self.net.initialize()
+        self.net.load_params_from(filepath)
+
+        return True
+
     def train_from_disk(self,
                         path_to_training_data='E:/data_sets/face_ages/group_cropped_and_flipped/training_chunks/',
                         save_every_x=10,
-                        n_chunks=50):
+                        n_chunks=50,
+                        prefetch=2,
+                        shuffle=False,
+                        mix_chunks=2):
         """
-        Train net in chunks using data on hdd
+        Train net in chunks using data on hdd, the next chunks are read on a background thread while the net trains
 
         :param path_to_training_data: Path to a folder containing training data named "train_Xi" and "train_Yi"
+        :param save_every_x: Int, save the weights every this many chunks
+        :param n_chunks: Int, number of chunks to train on, -1 for all of the chunks in the folder
+        :param prefetch: Int, number of chunks to read ahead
+        :param shuffle: Bool, shuffle the chunk order and the images across chunk boundaries
+        :param mix_chunks: Int, number of chunks whose images are shuffled together when shuffle is True
         """
 
         if n_chunks == -1:
             n_chunks = int(len(os.listdir(path_to_training_data)) / 2)
 
+        chunks = ChunkLoader(path_to_training_data,
+                             n_chunks=n_chunks,
+                             prefetch=prefetch,
+                             shuffle=shuffle,
+                             mix_chunks=mix_chunks)
+
         with progressbar.ProgressBar(max_value=n_chunks) as bar:
-            for i in range(1, n_chunks + 1):
-                train_x = np.load(
-                    path_to_training_data + 'train_X' + str(i) + '.npy')
-                train_y = np.load(
-                    path_to_training_data + 'train_Y' + str(i) + '.npy')
+            wait_start = time.time()
+            for i, (train_x, train_y, io_time) in enumerate(chunks, 1):
+                wait_time = time.time() - wait_start
+
+                fit_start = time.time()
                 nn = self.net.fit(train_x, train_y)
-                if i%save_every_x == 0:
+                fit_time = time.time() - fit_start
+
+                print('Chunk', i, 'read:', round(io_time, 2), 's waited:', round(wait_time, 2), 's fit:',
+                      round(fit_time, 2), 's')
+                if i % save_every_x == 0:
                     print('Saving')
                     nn.save_weights_to('age_model')
                 bar.update(i)
+                wait_start = time.time()
 
         return True
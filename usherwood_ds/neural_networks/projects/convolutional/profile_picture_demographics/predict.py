@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+"""Score a folder of profile pictures with the trained age classifier on CPU"""
+
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.6"
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+
+
+def load_image(filepath, size=227, pixel_scale=1.):
+    """
+    Decode an image and resize it to the net's input
+
+    :param filepath: String filepath of the image
+    :param size: Int, width and height of the net's input
+    :param pixel_scale: Float, the pixel values (0 to 255) are multiplied by this, to match the training chunks
+
+    :return: np array of float32 (3, size, size), or None if the image could not be read
+    """
+
+    try:
+        with Image.open(filepath) as image:
+            image = image.convert('RGB').resize((size, size), Image.BILINEAR)
+            pixels = np.asarray(image, dtype=np.float32)
+    except (IOError, OSError, ValueError):
+        return None
+
+    return pixels.transpose(2, 0, 1) * pixel_scale
+
+
+def _load_image_args(args):
+    return load_image(*args)
+
+
+def list_images(path_to_images):
+    """
+    The images in a folder, named by the author ID of the profile they came from (e.g. "12345.jpg")
+
+    :param path_to_images: Path to the folder
+
+    :return: Tuple of lists, author IDs and filepaths
+    """
+
+    author_ids = []
+    filepaths = []
+    for filename in sorted(os.listdir(path_to_images)):
+        author_id, extension = os.path.splitext(filename)
+        if extension.lower() in IMAGE_EXTENSIONS:
+            author_ids.append(author_id)
+            filepaths.append(os.path.join(path_to_images, filename))
+
+    return author_ids, filepaths
+
+
+def image_batches(filepaths, batch_size=64, size=227, pixel_scale=1., processes=None):
+    """
+    Generator of fixed size batches of images, decoded and resized in a pool of worker processes while the previous
+    batch is scored. The last batch is padded with zero images to batch_size
+
+    :param filepaths: List of image filepaths
+    :param batch_size: Int, images per batch
+    :param size: Int, width and height of the net's input
+    :param pixel_scale: Float, the pixel values (0 to 255) are multiplied by this
+    :param processes: Int, number of worker processes, None for one per CPU
+
+    :return: Yields tuples of an np array of float32 (batch_size, 3, size, size) and an np array of the positions of
+     the images in filepaths that were read
+    """
+
+    batch = np.zeros((batch_size, 3, size, size), dtype=np.float32)
+    positions = []
+    n_filled = 0
+
+    with Pool(processes=processes) as pool:
+        images = pool.imap(_load_image_args, [(filepath, size, pixel_scale) for filepath in filepaths],
+                           chunksize=max(1, batch_size // 4))
+        for position, image in enumerate(images):
+            if image is None:
+                print('Could not read', filepaths[position])
+                continue
+            batch[n_filled] = image
+            positions.append(position)
+            n_filled += 1
+            if n_filled == batch_size:
+                yield batch, np.array(positions)
+                batch = np.zeros((batch_size, 3, size, size), dtype=np.float32)
+                positions = []
+                n_filled = 0
+
+    if n_filled:
+        yield batch, np.array(positions)
+
+
+def predict_directory(path_to_images,
+                      weights_filepath='age_model',
+                      output_filepath='age_predictions.csv',
+                      batch_size=64,
+                      pixel_scale=1.,
+                      processes=None):
+    """
+    Predict the age bucket of every profile picture in a folder and save them by author ID
+
+    :param path_to_images: Path to a folder of images named by author ID (e.g. "12345.jpg")
+    :param weights_filepath: Filepath of the weights saved by AgeClassifier.train_from_disk
+    :param output_filepath: Filepath of the csv to write, None to not save
+    :param batch_size: Int, images per forward pass
+    :param pixel_scale: Float, the pixel values (0 to 255) are multiplied by this, to match the training chunks
+    :param processes: Int, number of image decoding processes, None for one per CPU
+
+    :return: Pandas df indexed by Author ID of the predicted age bucket and the probability of each bucket
+    """
+
+    # lasagne is only needed to score, the image loading works without it
+    from nolearn.lasagne import BatchIterator
+    from usherwood_ds.neural_networks.projects.convolutional.profile_picture_demographics.facial_recognition import \
+        AgeClassifier
+
+    classifier = AgeClassifier()
+    classifier.load_weights(weights_filepath)
+    classifier.net.batch_iterator_test = BatchIterator(batch_size=batch_size)
+
+    author_ids, filepaths = list_images(path_to_images)
+
+    predictions = predict_images(classifier.net, author_ids, filepaths, batch_size=batch_size,
+                                 pixel_scale=pixel_scale, processes=processes)
+
+    if output_filepath:
+        predictions.to_csv(output_filepath)
+
+    return predictions
+
+
+def predict_images(net,
+                   author_ids,
+                   filepaths,
+                   batch_size=64,
+                   pixel_scale=1.,
+                   processes=None):
+    """
+    Predict the age bucket of each image, a batch at a time, images that cannot be read are left out
+
+    :param net: Trained net with predict_proba and output_num_units, e.g. AgeClassifier().net
+    :param author_ids: List of the author ID of each image
+    :param filepaths: List of image filepaths
+    :param batch_size: Int, images per forward pass
+    :param pixel_scale: Float, the pixel values (0 to 255) are multiplied by this, to match the training chunks
+    :param processes: Int, number of image decoding processes, None for one per CPU
+
+    :return: Pandas df indexed by Author ID of the predicted age bucket and the probability of each bucket
+    """
+
+    n_buckets = net.output_num_units
+
+    read_positions = []
+    probabilities = []
+    start = time.time()
+    for batch, positions in image_batches(filepaths, batch_size=batch_size, pixel_scale=pixel_scale,
+                                          processes=processes):
+        probabilities.append(net.predict_proba(batch)[:len(positions)])
+        read_positions.append(positions)
+    elapsed = time.time() - start
+
+    if probabilities:
+        probabilities = np.concatenate(probabilities)
+        read_positions = np.concatenate(read_positions)
+    else:
+        probabilities = np.zeros((0, n_buckets))
+        read_positions = np.zeros(0, dtype=int)
+
+    print('Scored', len(read_positions), 'images in', round(elapsed, 2), 's,',
+          round(len(read_positions) / max(elapsed, 1e-9), 1), 'images/s')
+
+    predictions = pd.DataFrame(probabilities,
+                               index=pd.Index(np.array(author_ids, dtype=object)[read_positions], name='Author ID'),
+                               columns=['Age Bucket ' + str(i) + ' Probability' for i in range(n_buckets)])
+    predictions.insert(0, 'Age Bucket', np.argmax(probabilities, axis=1))
+
+    return predictions
+
+
+if __name__ == "__main__":
+    predict_directory('E:/data_sets/profile_pictures/')
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+"""Compare LSTM throughput with every text padded to sequence_length against length bucketed batches"""
+
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.train import NNSentimentTrain
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.bucketing import bucket_batches, feed_lengths
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.5"
+
+
+def random_lengths(n_texts, sequence_length=250, median_length=18):
+    """
+    Tweet-like text lengths, mostly under 30 tokens with a long tail
+
+    :param n_texts: Int, number of texts
+    :param sequence_length: Int, the maximum number of tokens in a text
+    :param median_length: Int, median number of tokens
+
+    :return: np array of int32 lengths
+    """
+
+    lengths = np.random.lognormal(mean=np.log(median_length), sigma=.6, size=n_texts)
+
+    return np.clip(lengths, 1, sequence_length).astype(np.int32)
+
+
+def time_batches(sess, net, batches, lengths, pad_to=None, train=False):
+    """
+    Run the net over batches of random embeddings
+
+    :param sess: tensorflow session of the net's graph
+    :param net: NNSentimentTrain
+    :param batches: List of np arrays, the positions of the texts in each batch
+    :param lengths: np array of the text lengths
+    :param pad_to: Int, pad every batch to this length, None pads each batch to its longest text
+    :param train: Bool, time optimizer steps rather than forward passes
+
+    :return: Float, texts per second
+    """
+
+    n_texts = 0
+    start = time.time()
+    for batch in batches:
+        batch_lengths = lengths[batch]
+        pad_length = pad_to if pad_to is not None else batch_lengths.max()
+
+        data_X = np.zeros((len(batch), pad_length, net.size), dtype=np.float32)
+        for bi, length in enumerate(batch_lengths):
+            data_X[bi, :length] = np.random.standard_normal((length, net.size))
+
+        feed = {net.X: data_X,
+                net.seq_len: feed_lengths(batch_lengths) if pad_to is None else np.full(len(batch), pad_to, np.int32)}
+        if train:
+            feed[net.Y] = np.eye(net.n_classes, dtype=np.float32)[np.random.randint(net.n_classes, size=len(batch))]
+            sess.run(net.optimizer, feed)
+        else:
+            sess.run(net.prediction_softmax, feed)
+        n_texts += len(batch)
+
+    return n_texts / (time.time() - start)
+
+
+def benchmark(n_texts=5000, batch_size=500, sequence_length=250, size=300, train=False):
+    """
+    Print the throughput of padded and bucketed batches on the same texts
+
+    :param n_texts: Int, number of texts
+    :param batch_size: Int, texts per batch
+    :param sequence_length: Int, the maximum number of tokens in a text
+    :param size: Int, size of the word embeddings
+    :param train: Bool, benchmark optimizer steps rather than inference
+
+    :return: Tuple of floats, texts per second padded and bucketed
+    """
+
+    net = NNSentimentTrain(sequence_length=sequence_length,
+                           batch_size=batch_size,
+                           size=size)
+    lengths = random_lengths(n_texts, sequence_length=sequence_length)
+
+    padded_batches = [np.arange(start, min(start + batch_size, n_texts)) for start in range(0, n_texts, batch_size)]
+    bucketed_batches = bucket_batches(lengths, batch_size)
+
+    with tf.Session(graph=net.graph) as sess:
+        with net.graph.as_default():
+            tf.global_variables_initializer().run()
+
+        padded = time_batches(sess, net, padded_batches, lengths, pad_to=sequence_length, train=train)
+        bucketed = time_batches(sess, net, bucketed_batches, lengths, train=train)
+
+    print('mean length:', lengths.mean(), 'padded to:', sequence_length)
+    print('padded:', round(padded, 1), 'texts/s')
+    print('bucketed:', round(bucketed, 1), 'texts/s')
+    print('speed up:', round(bucketed / padded, 2), 'x')
+
+    return padded, bucketed
+
+
+if __name__ == "__main__":
+    print('Inference')
+    benchmark()
+    print('Training')
+    benchmark(batch_size=20, n_texts=2000, train=True)
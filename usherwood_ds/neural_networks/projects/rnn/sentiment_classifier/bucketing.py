@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+"""Length bucketed batching for the LSTM sentiment classifier, so batches are only padded to their longest text"""
+
+import random
+
+import numpy as np
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.5"
+
+
+def bucket_batches(lengths, batch_size, shuffle=False):
+    """
+    Group texts into batches of similar length by sorting on length, each batch then only needs padding to its own
+    longest text rather than to the full sequence_length
+
+    :param lengths: List or np array of the number of tokens in each text
+    :param batch_size: Int, texts per batch
+    :param shuffle: Bool, shuffle the order of the batches (for training)
+
+    :return: List of np arrays, the positions of the texts in each batch
+    """
+
+    order = np.argsort(np.asarray(lengths), kind='mergesort')
+    batches = [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+    if shuffle:
+        random.shuffle(batches)
+
+    return batches
+
+
+def feed_lengths(lengths):
+    """
+    The sequence lengths to feed the net, the LSTM output is read at the last real token so texts with no tokens are
+    given one (zero) step
+
+    :param lengths: List or np array of the number of tokens in each text
+
+    :return: np array of int32 lengths
+    """
+
+    return np.maximum(np.asarray(lengths, dtype=np.int32), 1)
+
@@ -6,7 +6,8 @@ import numpy as np
 import tensorflow as tf
 from nltk.tokenize.casual import TweetTokenizer
 import emoji
-from usherwood_ds.nlp.processing.word_embedding import WordEmbedding
+from usherwood_ds.nlp.processing.word_embedding import load_shared_word2vec_model
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.bucketing import bucket_batches, feed_lengths
 
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
@@ -20,7 +21,20 @@ class NNSentiment:
                  size=300,
                  model_filepath='E:/data_sets/sentiments/tensorflow_run/models/sentiment-20_epochs-5_lstm.ckpt-86000',
                  word_vec_file='E:/data_sets/word2vec_embeddings/GoogleNews-vectors-negative300.bin',
-                 emoji_vec_file='E:/data_sets/word2vec_embeddings/emoji2vec.bin'):
+                 emoji_vec_file='E:/data_sets/word2vec_embeddings/emoji2vec.bin',
+                 dynamic_lengths=False):
+        """
+        :param sequence_length: Int, the maximum number of tokens in a text
+        :param batch_size: Int, texts per sess.run
+        :param n_classes: Int, number of sentiment classes
+        :param size: Int, size of the word embeddings
+        :param model_filepath: Str, the tensorflow checkpoint to restore
+        :param word_vec_file: Str, word2vec embeddings for words
+        :param emoji_vec_file: Str, word2vec embeddings for emoji
+        :param dynamic_lengths: Bool, if True texts are length bucketed and the LSTM output is read at the last real
+        token. Only for models trained with length bucketing, the default checkpoint was trained on texts padded to
+        sequence_length so predictions would change
+        """
 
         self.sequence_length = 0
         self.batch_size = 0
@@ -32,6 +46,7 @@ class NNSentiment:
         self.lstm_units = 0
         self.X = None
         self.Y = None
+        self.seq_len = None
         self.prediction = None
         self.prediction_softmax = None
         self.correctPred = None
@@ -41,6 +56,8 @@ class NNSentiment:
         self.emoji_vec_file = emoji_vec_file
         self.gen_emoji = None
         self.gen_words = None
+        self.tokenizer = TweetTokenizer()
+        self.dynamic_lengths = dynamic_lengths
 
         self.set_up_net(sequence_length=sequence_length,
                         batch_size=batch_size,
@@ -63,20 +80,22 @@ class NNSentiment:
         self.graph = tf.Graph()
 
         with self.graph.as_default():
-            self.Y = tf.placeholder(tf.float32, [self.batch_size, self.n_classes])  # Changed size to match one batch
-            self.X = tf.placeholder(tf.float32, [self.batch_size, self.sequence_length,
-                                                 self.size])  # Changed size to match one batch
+            # the batch and time dimensions are left dynamic so any number of phrases can be scored, each batch only
+            # padded to its longest phrase, without rebuilding the graph
+            self.Y = tf.placeholder(tf.float32, [None, self.n_classes])
+            self.X = tf.placeholder(tf.float32, [None, None, self.size])
+            self.seq_len = tf.placeholder(tf.int32, [None])
 
             self.lstm_units = 64
 
             lstmCell = tf.contrib.rnn.BasicLSTMCell(self.lstm_units)
             lstmCell = tf.contrib.rnn.DropoutWrapper(cell=lstmCell, output_keep_prob=1)
-            value, _ = tf.nn.dynamic_rnn(lstmCell, self.X, dtype=tf.float32)
+            value, _ = tf.nn.dynamic_rnn(lstmCell, self.X, sequence_length=self.seq_len, dtype=tf.float32)
 
             weight = tf.Variable(tf.truncated_normal([self.lstm_units, self.n_classes]))
             bias = tf.Variable(tf.constant(0.1, shape=[self.n_classes]))
-            value = tf.transpose(value, [1, 0, 2])
-            last = tf.gather(value, int(value.get_shape()[0]) - 1)
+            # output at the last real step of each phrase
+            last = tf.gather_nd(value, tf.stack([tf.range(tf.shape(value)[0]), self.seq_len - 1], axis=1))
 
             # raw prediction value
             self.prediction = (tf.matmul(last, weight) + bias)
@@ -94,9 +113,21 @@ class NNSentiment:
 
         self.sess = tf.Session(graph=self.graph)
 
-        saver = tf.train.import_meta_graph(model_filepath + '.meta')
+        # restore into the graph built by set_up_net, the variables are the same as in the checkpoint whatever the
+        # batch size used in training
+        self.saver.restore(self.sess, model_filepath)
 
-        saver.restore(self.sess, model_filepath)
+    def load_embeddings(self):
+        """
+        Lazily open the word and emoji embeddings, memory-mapped so that several inference workers share one
+        page-cached copy. On first use the word2vec .bin files are converted to the native format alongside them
+        """
+
+        print('Loading word2vec models')
+        self.gen_words = load_shared_word2vec_model(self.word_vec_file)
+        self.gen_emoji = load_shared_word2vec_model(self.emoji_vec_file)
+
+        return True
 
     def test_accuracy(self,
                       test_x_filepath='E:/data_sets/sentiments/test_sets/nn/X/test_Xf=0b=0i=0.npy',
@@ -113,7 +144,9 @@ class NNSentiment:
             next_batch_y = file_y_content[i * self.batch_size:(i + 1) * self.batch_size]
 
             if len(next_batch_x) == self.batch_size:
-                acc = (self.sess.run(self.accuracy, {self.X: next_batch_x, self.Y: next_batch_y})) * 100
+                acc = (self.sess.run(self.accuracy, {self.X: next_batch_x,
+                                                     self.Y: next_batch_y,
+                                                     self.seq_len: self.parsed_lengths(next_batch_x)})) * 100
                 final_accuracy_arr.append(acc)
 
         print('average accuracy for this file comprising ', i, 'batches: ',
@@ -123,16 +156,20 @@ class NNSentiment:
 
     def predict_parsed_phrase(self,
                               phrase,
-                              batch_size=-1):
+                              batch_size=-1,
+                              lengths=None):
+        """
+        Predict on already embedded phrases
+
+        :param phrase: np array of shape (n phrases, sequence_length, size)
+        :param batch_size: Deprecated, the graph accepts any batch size
+        :param lengths: List or np array of the number of tokens in each phrase, used with dynamic_lengths
 
-        if self.batch_size != batch_size:
-            self.set_up_net(sequence_length=self.sequence_length,
-                            batch_size=batch_size,
-                            n_classes=self.n_classes,
-                            size=self.size)
-            self.load_model()
+        :return: the argmax sentiment and the array of probabilities
+        """
 
-        probabilities = self.sess.run(self.prediction_softmax, {self.X: phrase})
+        probabilities = self.sess.run(self.prediction_softmax, {self.X: phrase,
+                                                                self.seq_len: self.parsed_lengths(phrase, lengths)})
         sent = np.argmax(probabilities)
 
         return sent, probabilities
@@ -140,49 +177,162 @@ class NNSentiment:
     def predict_sentence(self,
                          phrase,
                          theta=.65):
+        """
+        Predict the sentiment of a single phrase
+
+        :param phrase: Str, the raw text
+        :param theta: Float, the probability mass needed in the two negative (or positive) classes to bin as such
+
+        :return: the argmax sentiment, the array of probabilities and the binned sentiment (-1, 0 or 1)
+        """
+
+        if len(self.tokenizer.tokenize(phrase)) > self.sequence_length:
+            return 'Error text too long'
+
+        max_sents, probabilities, binned_sents = self.predict_many([phrase], theta=theta)
+
+        return max_sents[0], probabilities, binned_sents[0]
+
+    def predict_many(self,
+                     texts,
+                     theta=.65,
+                     batch_size=None):
+        """
+        Predict the sentiment of many phrases, one sess.run per batch
 
-        if self.batch_size != 1:
-            self.set_up_net(sequence_length=self.sequence_length,
-                            batch_size=1,
-                            n_classes=self.n_classes,
-                            size=self.size)
-            self.load_model()
+        :param texts: List or pandas Series of raw texts
+        :param theta: Float, the probability mass needed in the two negative (or positive) classes to bin as such
+        :param batch_size: Int, phrases per sess.run, defaults to the batch_size of the net
+
+        :return: np arrays of the argmax sentiments, the probabilities (n texts, n_classes) and the binned sentiments.
+        Texts longer than sequence_length are not scored, they get NaN probabilities, an argmax sentiment of -1 and a
+        NaN binned sentiment
+        """
+
+        if batch_size is None:
+            batch_size = self.batch_size
 
         if self.gen_words is None or self.gen_emoji is None:
-            print('Loading word2vec models')
-            self.gen_words = WordEmbedding()
-            self.gen_words.load_word2vec_model(self.word_vec_file)
+            self.load_embeddings()
+
+        tokenized = [self.tokenizer.tokenize(text) for text in texts]
+        lengths = np.array([len(words) for words in tokenized], dtype=np.int32)
+        valid_ids = np.flatnonzero(lengths <= self.sequence_length)
+
+        if self.dynamic_lengths:
+            batches = [valid_ids[batch] for batch in bucket_batches(lengths[valid_ids], batch_size)]
+        else:
+            batches = [valid_ids[start:start + batch_size] for start in range(0, len(valid_ids), batch_size)]
+
+        probabilities = np.full((len(tokenized), self.n_classes), np.nan, dtype=np.float32)
+        for batch_ids in batches:
+            if self.dynamic_lengths:
+                pad_length = max(lengths[batch_ids].max(), 1)
+                batch_lengths = feed_lengths(lengths[batch_ids])
+            else:
+                pad_length = self.sequence_length
+                batch_lengths = np.full(len(batch_ids), self.sequence_length, dtype=np.int32)
 
-            self.gen_emoji = WordEmbedding()
-            self.gen_emoji.load_word2vec_model(self.word_vec_file)
+            data_X = self.embed_batch([tokenized[i] for i in batch_ids], pad_length=pad_length)
+            probabilities[batch_ids] = self.sess.run(self.prediction_softmax, {self.X: data_X,
+                                                                               self.seq_len: batch_lengths})
 
-        data_X = np.zeros((1, self.sequence_length, self.size), dtype=np.float32)
+        max_sents = np.full(len(tokenized), -1, dtype=np.int64)
+        max_sents[valid_ids] = np.argmax(probabilities[valid_ids], axis=1)
 
-        words = TweetTokenizer().tokenize(phrase)
-        if len(words) > self.sequence_length:
-            return 'Error text too long'
+        binned_sents = bin_sentiments(probabilities=probabilities,
+                                      theta=theta)
+
+        return max_sents, probabilities, binned_sents
+
+    def embed_batch(self, tokenized, pad_length=None):
+        """
+        Embed a batch of tokenized phrases into one preallocated array, each distinct token is looked up once
+
+        :param tokenized: List of lists of tokens, none longer than pad_length
+        :param pad_length: Int, the length to pad the phrases to, defaults to sequence_length
+
+        :return: np array of shape (len(tokenized), pad_length, size), unknown tokens and padding are zeros
+        """
+
+        if pad_length is None:
+            pad_length = self.sequence_length
 
-        for wi, word in enumerate(words):
-            try:
-                if word in emoji.UNICODE_EMOJI:
-                    data_X[0, wi] = self.gen_emoji.model[word]
-                else:
-                    data_X[0, wi] = self.gen_words.model[word]
-            except KeyError:
-                data_X[0, wi] = np.zeros(self.size)
-
-        probabilities = self.sess.run(self.prediction_softmax, {self.X: data_X})
-        max_sent = np.argmax(probabilities)
-
-        def bin_sents(probs_arr, theta=.65):
-            if probs_arr[0] + probs_arr[1] >= theta:
-                return -1
-            elif probs_arr[3] + probs_arr[4] >= theta:
-                return 1
+        vocab = {}
+        vectors = [np.zeros(self.size, dtype=np.float32)]
+        ids = np.zeros((len(tokenized), pad_length), dtype=np.int32)
+
+        for ri, words in enumerate(tokenized):
+            for wi, word in enumerate(words):
+                if word not in vocab:
+                    vector = self.word_vector(word)
+                    if vector is None:
+                        vocab[word] = 0
+                    else:
+                        vocab[word] = len(vectors)
+                        vectors.append(vector)
+                ids[ri, wi] = vocab[word]
+
+        data_X = np.zeros((len(tokenized), pad_length, self.size), dtype=np.float32)
+        np.take(np.array(vectors, dtype=np.float32), ids, axis=0, out=data_X, mode='clip')
+
+        return data_X
+
+    def parsed_lengths(self, data_X, lengths=None):
+        """
+        The sequence lengths to feed for already embedded phrases. The token counts are needed to read the output at
+        the last real token, they cannot be recovered from the embedding as unknown tokens are zero vectors too
+
+        :param data_X: np array of shape (n phrases, padded length, size)
+        :param lengths: List or np array of the number of tokens in each phrase, None to use the padded length
+
+        :return: np array of int32 lengths
+        """
+
+        if self.dynamic_lengths and lengths is not None:
+            return feed_lengths(lengths)
+        else:
+            return np.full(len(data_X), data_X.shape[1], dtype=np.int32)
+
+    def word_vector(self, word):
+        """
+        Look up a token in the emoji or word embeddings
+
+        :param word: Str, the token
+
+        :return: np array of the embedding, None if the token is not in the embeddings
+        """
+
+        try:
+            if word in emoji.UNICODE_EMOJI:
+                return self.gen_emoji.model[word]
             else:
-                return 0
+                return self.gen_words.model[word]
+        except KeyError:
+            return None
+
+
+def bin_sentiments(probabilities, theta=.65):
+    """
+    Bin class probabilities into negative (-1), neutral (0) and positive (1)
+
+    :param probabilities: np array of shape (n, 5) or (5,), probabilities of the 5 classes
+    :param theta: Float, the probability mass needed in the two negative (or positive) classes to bin as such
+
+    :return: np array of the binned sentiments, rows with NaN probabilities (not scored) are NaN rather than neutral
+    (making the array float)
+    """
+
+    probabilities = np.atleast_2d(probabilities)
+
+    negative = probabilities[:, 0] + probabilities[:, 1] >= theta
+    positive = probabilities[:, 3] + probabilities[:, 4] >= theta
+
+    binned = np.where(negative, -1, np.where(positive, 1, 0))
 
-        binned_sent = bin_sents(probs_arr=probabilities[0],
-                                theta=theta)
+    unscored = np.isnan(probabilities).any(axis=1)
+    if unscored.any():
+        binned = binned.astype(np.float64)
+        binned[unscored] = np.nan
 
-        return max_sent, probabilities, binned_sent
+    return binned
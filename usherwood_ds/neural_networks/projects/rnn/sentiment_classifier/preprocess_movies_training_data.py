@@ -2,6 +2,9 @@
 
 """Preprocess Amazon movies data to use as training or test data in the LSTM NN"""
 
+import json
+import os
+
 import pandas as pd
 import numpy as np
 import gc
@@ -9,7 +12,7 @@ import gc
 from nltk.tokenize.casual import TweetTokenizer
 import emoji
 
-from usherwood_ds.nlp.processing.word_embedding import WordEmbedding
+from usherwood_ds.nlp.processing.word_embedding import load_shared_word2vec_model
 
 
 __author__ = "Peter J Usherwood"
@@ -26,7 +29,8 @@ def parse_big_file_to_batches(file,
                               score_field='Score',
                               file_n='0',
                               classes=[1, 2, 3, 4, 5],
-                              return_df=False):
+                              return_df=False,
+                              vocab=None):
     for start in range(0, 500000, 100000):
 
         df = pd.read_csv(path + file,
@@ -71,7 +75,8 @@ def parse_big_file_to_batches(file,
                                   file_n=file_n,
                                   block=block,
                                   classes=classes,
-                                  return_df=return_df)
+                                  return_df=return_df,
+                                  vocab=vocab)
 
         df = None
         gc.collect()
@@ -89,7 +94,15 @@ def turn_block_to_batches(df,
                           file_n='0',
                           block='0',
                           classes=[1, 2, 3, 4, 5],
-                          return_df=False):
+                          return_df=False,
+                          vocab=None):
+    """
+    Balance the classes of a block of reviews and save it for training
+
+    :param vocab: Dict of token to token id, if given the block is saved as a token id shard (see
+    parse_balanced_df_to_id_shard), otherwise as embedded batches (see parse_balanced_df_to_numpy_batches)
+    """
+
     n_classes = len(classes)
 
     df_parse = df.copy()
@@ -103,6 +116,18 @@ def turn_block_to_batches(df,
 
     if return_df:
         return df
+    elif vocab is not None:
+        parse_balanced_df_to_id_shard(df=df,
+                                      vocab=vocab,
+                                      gen_words=gen_words,
+                                      gen_emoji=gen_emoji,
+                                      sequence_length=sequence_length,
+                                      text_field=text_field,
+                                      score_field=score_field,
+                                      classes=classes,
+                                      file_n=file_n,
+                                      block=block)
+        return True
     else:
         parse_balanced_df_to_numpy_batches(df=df,
                                            gen_words=gen_words,
@@ -117,11 +142,50 @@ def turn_block_to_batches(df,
         return True
 
 
+def drop_unscored(df, score_field='Score', classes=[1, 2, 3, 4, 5]):
+    """
+    Drop the reviews without a score in classes (e.g. NaN), so they never reach the training labels
+
+    :param df: Pandas df of reviews
+    :param score_field: Str, column of the scores
+    :param classes: List of the scores
+
+    :return: df of the scored reviews, with a new index
+    """
+
+    scored = df[score_field].isin(classes)
+    if not scored.all():
+        print('Dropped', str((~scored).sum()), 'reviews without a score in', str(classes))
+
+    return df[scored.values].reset_index(drop=True)
+
+
+def check_scores(df, score_field='Score', classes=None):
+    """
+    Raise a ValueError if any review does not have a score in classes
+
+    :param df: Pandas df of reviews
+    :param score_field: Str, column of the scores
+    :param classes: List of the scores, None to only check that no score is missing
+    """
+
+    if classes is None:
+        unscored = df[score_field].isna()
+    else:
+        unscored = ~df[score_field].isin(classes)
+
+    if unscored.any():
+        raise ValueError(str(unscored.sum()) + ' reviews do not have a score in ' + str(classes) + ', e.g. ' +
+                         repr(df[score_field][unscored.values].iloc[0]) + ', see drop_unscored')
+
+
 def limit_sentence_length_and_balance_classes(df,
                                               sequence_length=250,
                                               text_field='Cleaned',
                                               score_field='Score',
                                               classes=[1, 2, 3, 4, 5]):
+    df = drop_unscored(df, score_field=score_field, classes=classes)
+
     word_counts = []
     for review in df[text_field]:
         try:
@@ -160,60 +224,225 @@ def parse_balanced_df_to_numpy_batches(df,
                                        score_field='Score',
                                        n_classes=5,
                                        file_n='0',
-                                       block='0'):
+                                       block='0',
+                                       batch_size=20,
+                                       save_path='E:/data_sets/sentiments/train_sets/amazon_movies_we_balanced_chunks/'):
+    """
+    Embed a class balanced df and save it as class balanced, length bucketed batches. Each class is sorted by review
+    length so the reviews in a batch are of similar length, and each batch is only padded to its longest review
+    rather than to sequence_length. The review lengths are saved alongside to be fed to the net
+
+    :param df: Class balanced df as returned by limit_sentence_length_and_balance_classes
+    :param gen_words: WordEmbedding of the words
+    :param gen_emoji: WordEmbedding of the emoji
+    :param sequence_length: Int, the maximum number of tokens in a review
+    :param size: Int, size of the word embeddings
+    :param text_field: Str, column of the reviews
+    :param score_field: Str, column of the scores
+    :param n_classes: Int, number of classes
+    :param file_n: Str, file number used in the batch filenames
+    :param block: Str, block number used in the batch filenames
+    :param batch_size: Int, reviews per batch, must be a multiple of n_classes
+    :param save_path: Str, folder containing the X, Y and L folders the batches are saved to
+    """
+
+    check_scores(df, score_field=score_field)
     df.reset_index(drop=True, inplace=True)
 
     data_Y = pd.get_dummies(df[score_field]).reset_index(drop=True).values
-    data_X = np.zeros((len(df), sequence_length, size), dtype=np.float32)
 
-    invalids = []
-    for ri, snippet in enumerate(df[text_field]):
+    tokenizer = TweetTokenizer()
+    tokenized = [tokenizer.tokenize(snippet) for snippet in df[text_field]]
+    lengths = np.array([len(words) for words in tokenized], dtype=np.int32)
 
-        invalid = 0
-        words = TweetTokenizer().tokenize(snippet)
-        for wi, word in enumerate(words):
-            try:
-                if word in emoji.UNICODE_EMOJI:
-                    data_X[ri, wi] = gen_emoji.model[word]
-                else:
-                    data_X[ri, wi] = gen_words.model[word]
-            except KeyError:
-                data_X[ri, wi] = np.zeros(size)
-                invalid += 1
-        invalids += [1 - (invalid / len(words))]
+    size_per_class = int(len(data_Y) / n_classes)
+    batch_size_per_class = int(batch_size / n_classes)
 
-    print(np.array(invalids).mean())
+    # sort the reviews of each class by length, batch i takes the i-th slice of every class so holds similar lengths
+    order = []
+    for j in range(n_classes):
+        class_lengths = lengths[j * size_per_class:(j + 1) * size_per_class]
+        order.append((j * size_per_class) + np.argsort(class_lengths, kind='mergesort'))
 
+    invalids = []
     for i in range(int(len(data_Y) / (batch_size))):
-        size_per_class = int(len(data_Y) / n_classes)
-
-        batch_size_per_class = int(batch_size / n_classes)
 
         start = i * batch_size_per_class
         stop = (i + 1) * batch_size_per_class
 
-        ids = []
-        for j in range(n_classes):
-            ids += [a for a in range((start + (j * size_per_class)), (stop + (j * size_per_class)))]
+        ids = np.concatenate([order[j][start:stop] for j in range(n_classes)])
 
-        train_X = data_X[ids, :, :]
+        train_L = lengths[ids]
+        train_X = np.zeros((len(ids), max(train_L.max(), 1), size), dtype=np.float32)
         train_Y = data_Y[ids, :]
 
+        for bi, ri in enumerate(ids):
+            invalid = 0
+            words = tokenized[ri]
+            for wi, word in enumerate(words):
+                try:
+                    if word in emoji.UNICODE_EMOJI:
+                        train_X[bi, wi] = gen_emoji.model[word]
+                    else:
+                        train_X[bi, wi] = gen_words.model[word]
+                except KeyError:
+                    invalid += 1
+            invalids += [1 - (invalid / max(len(words), 1))]
+
         permutation = np.random.permutation(train_Y.shape[0])
         train_X = train_X[permutation, :, :]
         train_Y = train_Y[permutation, :]
+        train_L = train_L[permutation]
 
-        np.save(
-            'E:/data_sets/sentiments/train_sets/amazon_movies_we_balanced_chunks/X/train_Xf=' + file_n + 'b=' + block + 'i=' + str(
-                i), train_X)
-        np.save(
-            'E:/data_sets/sentiments/train_sets/amazon_movies_we_balanced_chunks/Y/train_Yf=' + file_n + 'b=' + block + 'i=' + str(
-                i), train_Y)
+        name = 'f=' + file_n + 'b=' + block + 'i=' + str(i)
+        np.save(save_path + 'X/train_X' + name, train_X)
+        np.save(save_path + 'Y/train_Y' + name, train_Y)
+        np.save(save_path + 'L/train_L' + name, train_L)
+
+    print(np.array(invalids).mean())
 
     gc.collect()
     return True
 
 
+def token_id(word, vocab, gen_words, gen_emoji):
+    """
+    The id of a token, tokens in the embeddings are added to vocab the first time they are seen
+
+    :param word: Str, the token
+    :param vocab: Dict of token to token id, ids start at 1
+    :param gen_words: WordEmbedding of the words
+    :param gen_emoji: WordEmbedding of the emoji
+
+    :return: Int, the token id, 0 (padding) if the token is not in the embeddings
+    """
+
+    if word in vocab:
+        return vocab[word]
+
+    if word in emoji.UNICODE_EMOJI:
+        model = gen_emoji.model
+    else:
+        model = gen_words.model
+
+    try:
+        model[word]
+    except KeyError:
+        return 0
+
+    vocab[word] = len(vocab) + 1
+
+    return vocab[word]
+
+
+def parse_balanced_df_to_id_shard(df,
+                                  vocab,
+                                  gen_words,
+                                  gen_emoji,
+                                  sequence_length=250,
+                                  text_field='Cleaned',
+                                  score_field='Score',
+                                  classes=[1, 2, 3, 4, 5],
+                                  file_n='0',
+                                  block='0',
+                                  save_path='E:/data_sets/sentiments/train_sets/amazon_movies_id_shards/'):
+    """
+    Save a class balanced df as a compact shard of token ids rather than embedded vectors, about 1 KB per review
+    instead of 300 KB. The embedding lookup is done inside the net (see NNSentimentTrain.train_model_from_ids), using
+    the matrix written by save_vocabulary. Three arrays are saved, sharing the name f=<file_n>b=<block>:
+        ids/train_ids - int32 (n reviews, sequence_length), token ids padded with 0
+        lengths/train_lengths - int32 (n reviews), number of tokens
+        labels/train_labels - int8 (n reviews), the position of the score in classes
+
+    :param df: Class balanced df as returned by limit_sentence_length_and_balance_classes
+    :param vocab: Dict of token to token id, new tokens are added to it
+    :param gen_words: WordEmbedding of the words
+    :param gen_emoji: WordEmbedding of the emoji
+    :param sequence_length: Int, the maximum number of tokens in a review
+    :param text_field: Str, column of the reviews
+    :param score_field: Str, column of the scores
+    :param classes: List of the scores
+    :param file_n: Str, file number used in the shard name
+    :param block: Str, block number used in the shard name
+    :param save_path: Str, folder containing the ids, lengths and labels folders
+    """
+
+    check_scores(df, score_field=score_field, classes=classes)
+
+    tokenizer = TweetTokenizer()
+
+    ids = np.zeros((len(df), sequence_length), dtype=np.int32)
+    lengths = np.zeros(len(df), dtype=np.int32)
+
+    for ri, snippet in enumerate(df[text_field]):
+        words = tokenizer.tokenize(snippet)[:sequence_length]
+        lengths[ri] = len(words)
+        for wi, word in enumerate(words):
+            ids[ri, wi] = token_id(word, vocab, gen_words, gen_emoji)
+
+    labels = np.array([classes.index(score) for score in df[score_field]], dtype=np.int8)
+
+    name = 'f=' + file_n + 'b=' + block
+    np.save(save_path + 'ids/train_ids' + name, ids)
+    np.save(save_path + 'lengths/train_lengths' + name, lengths)
+    np.save(save_path + 'labels/train_labels' + name, labels)
+
+    print(str(len(vocab)), 'tokens in the vocabulary')
+
+    return True
+
+
+def load_vocabulary(filepath):
+    """
+    Load the token to token id vocabulary, so that shards written in separate runs share token ids
+
+    :param filepath: Str, the vocabulary json
+
+    :return: Dict of token to token id, empty if the file does not exist yet
+    """
+
+    if not os.path.exists(filepath):
+        return {}
+
+    with open(filepath, 'r', encoding='utf-8') as openfile:
+        vocab = json.load(openfile)
+
+    return vocab
+
+
+def save_vocabulary(vocab,
+                    gen_words,
+                    gen_emoji,
+                    filepath,
+                    embedding_filepath,
+                    size=300):
+    """
+    Save the vocabulary and the matching embedding matrix, row i of the matrix is the vector of token id i and row 0
+    (padding and unknown tokens) is zeros
+
+    :param vocab: Dict of token to token id
+    :param gen_words: WordEmbedding of the words
+    :param gen_emoji: WordEmbedding of the emoji
+    :param filepath: Str, the vocabulary json
+    :param embedding_filepath: Str, the .npy embedding matrix
+    :param size: Int, size of the word embeddings
+    """
+
+    embedding = np.zeros((len(vocab) + 1, size), dtype=np.float32)
+    for word, wi in vocab.items():
+        if word in emoji.UNICODE_EMOJI:
+            embedding[wi] = gen_emoji.model[word]
+        else:
+            embedding[wi] = gen_words.model[word]
+
+    np.save(embedding_filepath, embedding)
+
+    with open(filepath, 'w', encoding='utf-8') as openfile:
+        json.dump(vocab, openfile, ensure_ascii=False)
+
+    return True
+
+
 if __name__ == "__main__":
     file_n = '3'
     file = 'en_amazon_movies_1p5Mto2M.csv'
@@ -230,11 +459,11 @@ if __name__ == "__main__":
     if batch_size % len(classes) != 0:
         raise Exception('the number of classes must be a fac tor of the batch size so that even chunks can be made')
 
-    gen_words = WordEmbedding()
-    gen_words.load_word2vec_model('E:/data_sets/word2vec_embeddings/GoogleNews-vectors-negative300.bin')
+    gen_words = load_shared_word2vec_model('E:/data_sets/word2vec_embeddings/GoogleNews-vectors-negative300.bin')
+    gen_emoji = load_shared_word2vec_model('E:/data_sets/word2vec_embeddings/emoji2vec.bin')
 
-    gen_emoji = WordEmbedding()
-    gen_emoji.load_word2vec_model('E:/data_sets/word2vec_embeddings/emoji2vec.bin')
+    vocab_filepath = 'E:/data_sets/sentiments/train_sets/amazon_movies_id_shards/vocab.json'
+    vocab = load_vocabulary(vocab_filepath)
 
     df = pd.read_csv('E:/data_sets/sentiments/train_sets/amazon_movies_full/en_amazon_movies_0to500k.csv', nrows=10)
     columns = df.columns
@@ -249,4 +478,12 @@ if __name__ == "__main__":
                               text_field='Cleaned',
                               score_field='Score',
                               file_n=file_n,
-                              classes=classes)
+                              classes=classes,
+                              vocab=vocab)
+
+    save_vocabulary(vocab=vocab,
+                    gen_words=gen_words,
+                    gen_emoji=gen_emoji,
+                    filepath=vocab_filepath,
+                    embedding_filepath='E:/data_sets/sentiments/train_sets/amazon_movies_id_shards/embedding.npy',
+                    size=size)
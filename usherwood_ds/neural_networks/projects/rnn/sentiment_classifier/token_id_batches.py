@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""Background reading of the training batches from the token id shards, so the next batches are read while the net
+trains"""
+
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.bucketing import bucket_batches, feed_lengths
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.5"
+
+
+class TokenIdBatches:
+    """
+    Training batches read from the memory-mapped token id shards written by parse_balanced_df_to_id_shard. Each epoch
+    the reviews are shuffled across all shards, length bucketed within pools of pool_batches batches, and read on a
+    background thread prefetch batches ahead of training
+    """
+
+    def __init__(self,
+                 data_path,
+                 batch_size=20,
+                 n_classes=5,
+                 pool_batches=50,
+                 prefetch=10):
+        """
+        :param data_path: Folder containing the ids, lengths and labels folders
+        :param batch_size: Int, reviews per batch
+        :param n_classes: Int, number of classes
+        :param pool_batches: Int, number of batches of shuffled reviews that are sorted by length together
+        :param prefetch: Int, number of batches to read ahead
+        """
+
+        self.batch_size = batch_size
+        self.n_classes = n_classes
+        self.pool_batches = pool_batches
+        self.prefetch = prefetch
+
+        # only the token ids are memory-mapped, lengths and labels are a few bytes per review
+        self.ids = []
+        lengths = []
+        labels = []
+        shards = []
+        for shard, ids_file in enumerate(sorted(os.listdir(data_path + 'ids/'))):
+            name = ids_file.replace('train_ids', '')
+            self.ids.append(np.load(data_path + 'ids/' + ids_file, mmap_mode='r'))
+            lengths.append(np.load(data_path + 'lengths/train_lengths' + name))
+            labels.append(np.load(data_path + 'labels/train_labels' + name))
+            shards.append(np.full(len(lengths[-1]), shard, dtype=np.int32))
+
+        self.lengths = np.concatenate(lengths)
+        self.labels = np.concatenate(labels)
+        self.shards = np.concatenate(shards)
+        self.rows = np.concatenate([np.arange(len(shard_lengths)) for shard_lengths in lengths])
+
+    def __len__(self):
+        return int(np.ceil(len(self.lengths) / self.batch_size))
+
+    def __iter__(self):
+        """
+        Yields tuples of the batch's token ids, lengths and one hot targets. An error reading the batches is raised
+        here, and the background thread stops if the iteration is left early
+        """
+
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            # give up once the consumer has stopped iterating, rather than waiting on a full queue forever
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_batches():
+            try:
+                for positions in self.epoch_batches():
+                    if not put(self.read_batch(positions)):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            put(None)
+
+        thread = threading.Thread(target=read_batches, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
+            thread.join()
+
+    def epoch_batches(self):
+        """
+        Shuffle all reviews, then sort pools of them by length so each batch is only padded to its longest review
+
+        :return: List of np arrays, the positions of the reviews in each batch
+        """
+
+        permutation = np.random.permutation(len(self.lengths))
+        pool_size = self.batch_size * self.pool_batches
+
+        batches = []
+        for start in range(0, len(permutation), pool_size):
+            pool = permutation[start:start + pool_size]
+            batches += [pool[batch] for batch in bucket_batches(self.lengths[pool], self.batch_size)]
+        random.shuffle(batches)
+
+        return batches
+
+    def read_batch(self, positions):
+        """
+        Read one batch of reviews from the shards
+
+        :param positions: np array, positions of the reviews across all shards
+
+        :return: Tuple of np arrays, token ids (batch, longest review), lengths and one hot targets
+        """
+
+        lengths = self.lengths[positions]
+        pad_length = max(lengths.max(), 1)
+
+        ids = np.zeros((len(positions), pad_length), dtype=np.int32)
+        for shard in np.unique(self.shards[positions]):
+            in_shard = np.flatnonzero(self.shards[positions] == shard)
+            ids[in_shard] = self.ids[shard][self.rows[positions[in_shard]], :pad_length]
+
+        targets = np.eye(self.n_classes, dtype=np.float32)[self.labels[positions]]
+
+        return ids, feed_lengths(lengths), targets
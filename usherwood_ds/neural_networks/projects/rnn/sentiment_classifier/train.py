@@ -9,6 +9,9 @@ import random
 import os
 import tensorflow as tf
 
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.bucketing import feed_lengths
+from usherwood_ds.neural_networks.projects.rnn.sentiment_classifier.token_id_batches import TokenIdBatches
+
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
 
@@ -31,6 +34,10 @@ class NNSentimentTrain:
         self.lstm_units = 0
         self.X = None
         self.Y = None
+        self.seq_len = None
+        self.ids = None
+        self.embedding = None
+        self.embedding_init = None
         self.prediction = None
         self.prediction_softmax = None
         self.correctPred = None
@@ -58,19 +65,29 @@ class NNSentimentTrain:
         self.graph = tf.Graph()
 
         with self.graph.as_default():
-            self.Y = tf.placeholder(tf.float32, [self.batch_size, self.n_classes])
-            self.X = tf.placeholder(tf.float32, [self.batch_size, self.sequence_length, self.size])
+            # batches are length bucketed, so the time dimension (and the last, smaller, batch) vary
+            self.Y = tf.placeholder(tf.float32, [None, self.n_classes])
+            self.seq_len = tf.placeholder(tf.int32, [None])
+
+            # reviews are either fed already embedded to X, or as token ids that are looked up in the embedding
+            # matrix inside the net. The matrix is loaded once per session (sess.run(self.embedding.initializer)),
+            # it is not trained and is kept out of the checkpoints
+            self.ids = tf.placeholder(tf.int32, [None, None])
+            self.embedding_init = tf.placeholder(tf.float32, [None, self.size])
+            self.embedding = tf.Variable(self.embedding_init, trainable=False, validate_shape=False, collections=[])
+            self.X = tf.placeholder_with_default(tf.nn.embedding_lookup(self.embedding, self.ids),
+                                                 [None, None, self.size])
 
             self.lstm_units = 64
 
             lstmCell = tf.contrib.rnn.BasicLSTMCell(self.lstm_units)
             lstmCell = tf.contrib.rnn.DropoutWrapper(cell=lstmCell, output_keep_prob=.5)
-            value, _ = tf.nn.dynamic_rnn(lstmCell, self.X, dtype=tf.float32)
+            value, _ = tf.nn.dynamic_rnn(lstmCell, self.X, sequence_length=self.seq_len, dtype=tf.float32)
 
             weight = tf.Variable(tf.truncated_normal([self.lstm_units, self.n_classes]))
             bias = tf.Variable(tf.constant(0.1, shape=[self.n_classes]))
-            value = tf.transpose(value, [1, 0, 2])
-            last = tf.gather(value, int(value.get_shape()[0]) - 1)
+            # output at the last real step of each review
+            last = tf.gather_nd(value, tf.stack([tf.range(tf.shape(value)[0]), self.seq_len - 1], axis=1))
 
             # raw prediction value
             self.prediction = (tf.matmul(last, weight) + bias)
@@ -87,7 +104,17 @@ class NNSentimentTrain:
     def train_model(self,
                     x_train_path='E:/data_sets/sentiments/train_sets/amazon_movies_we_balanced_chunks/X/',
                     y_train_path='E:/data_sets/sentiments/train_sets/amazon_movies_we_balanced_chunks/Y/',
+                    l_train_path='E:/data_sets/sentiments/train_sets/amazon_movies_we_balanced_chunks/L/',
                     epochs=5):
+        """
+        Train on the length bucketed batches written by parse_balanced_df_to_numpy_batches
+
+        :param x_train_path: Folder of embedded batches, train_X...npy
+        :param y_train_path: Folder of one hot targets, train_Y...npy
+        :param l_train_path: Folder of review lengths, train_L...npy, if a lengths file is missing the whole padded
+        length is fed (unknown tokens are zero vectors too, so the lengths cannot be recovered from the padding)
+        :param epochs: Int, passes over the training set
+        """
 
         model_name = 'sentiment-' + str(self.batch_size) + '_epochs-' + str(epochs) + '_lstm'
         print('model saved as:', model_name)
@@ -111,31 +138,32 @@ class NNSentimentTrain:
                 with progressbar.ProgressBar(max_value=len(os.listdir(x_train_path))) as bar:
 
                     # randomizing file list
-                    listzip = list(zip(os.listdir(x_train_path),
-                                       os.listdir(y_train_path)))
-                    random.shuffle(listzip)
+                    x_files = os.listdir(x_train_path)
+                    random.shuffle(x_files)
 
-                    for x_file, y_file in listzip:
+                    for x_file in x_files:
 
-                        # Next Batch of reviews
+                        # Next Batch of reviews, each batch is only padded to its longest review
                         next_batch_x = np.load(x_train_path + x_file)
-                        next_batch_y = np.load(y_train_path + y_file)
+                        next_batch_y = np.load(y_train_path + x_file.replace('train_X', 'train_Y'))
+                        l_file = l_train_path + x_file.replace('train_X', 'train_L')
+                        if os.path.exists(l_file):
+                            next_batch_l = feed_lengths(np.load(l_file))
+                        else:
+                            next_batch_l = np.full(len(next_batch_x), next_batch_x.shape[1], dtype=np.int32)
 
                         # randomizing/shuffling batches
-                        batch_pairs_list = list(zip(next_batch_x, next_batch_y))
-                        random.shuffle(batch_pairs_list)
-
-                        # extract the two things into two arrays again
-                        next_batch_x, next_batch_y = zip(*batch_pairs_list)
-                        next_batch_x = np.array(next_batch_x)
-                        next_batch_y = np.array(next_batch_y)
+                        permutation = np.random.permutation(len(next_batch_y))
+                        feed = {self.X: next_batch_x[permutation],
+                                self.Y: next_batch_y[permutation],
+                                self.seq_len: next_batch_l[permutation]}
 
-                        sess.run(self.optimizer, {self.X: next_batch_x, self.Y: next_batch_y})
+                        sess.run(self.optimizer, feed)
 
                         # Write summary to Tensorboard
                         if i % 200 == 0:
                             writer = tf.summary.FileWriter(logdir, sess.graph)
-                            summary = sess.run(merged, {self.X: next_batch_x, self.Y: next_batch_y})
+                            summary = sess.run(merged, feed)
                             writer.add_summary(summary, i)
 
                         # Save the network
@@ -150,3 +178,69 @@ class NNSentimentTrain:
             writer.close()
 
         print('Done')
+
+    def train_model_from_ids(self,
+                             data_path='E:/data_sets/sentiments/train_sets/amazon_movies_id_shards/',
+                             embedding_filepath='E:/data_sets/sentiments/train_sets/amazon_movies_id_shards/'
+                                                'embedding.npy',
+                             epochs=5,
+                             prefetch=10):
+        """
+        Train on the token id shards written by parse_balanced_df_to_id_shard, the embedding lookup is done in the
+        net and batches are shuffled across all shards and prefetched on a background thread
+
+        :param data_path: Folder containing the ids, lengths and labels folders
+        :param embedding_filepath: The embedding matrix written by save_vocabulary
+        :param epochs: Int, passes over the training set
+        :param prefetch: Int, number of batches to read ahead
+        """
+
+        batches = TokenIdBatches(data_path=data_path,
+                                 batch_size=self.batch_size,
+                                 n_classes=self.n_classes,
+                                 prefetch=prefetch)
+
+        model_name = 'sentiment-' + str(self.batch_size) + '_epochs-' + str(epochs) + '_lstm'
+        print('model saved as:', model_name)
+
+        with tf.Session(graph=self.graph) as sess:
+
+            tf.summary.scalar('Loss', self.loss)
+            tf.summary.scalar('Accuracy', self.accuracy)
+            merged = tf.summary.merge_all()
+            logdir = "tensorboard/" + model_name + datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + "/"
+            writer = tf.summary.FileWriter(logdir, sess.graph)
+
+            tf.global_variables_initializer().run()
+            sess.run(self.embedding.initializer, {self.embedding_init: np.load(embedding_filepath)})
+            saver = tf.train.Saver(keep_checkpoint_every_n_hours=1,
+                                   max_to_keep=15)
+
+            i = 0
+            for e in range(epochs):
+                print('in epoch', e)
+                with progressbar.ProgressBar(max_value=len(batches)) as bar:
+                    for local_i, (next_batch_ids, next_batch_l, next_batch_y) in enumerate(batches):
+
+                        feed = {self.ids: next_batch_ids,
+                                self.Y: next_batch_y,
+                                self.seq_len: next_batch_l}
+
+                        sess.run(self.optimizer, feed)
+
+                        # Write summary to Tensorboard
+                        if i % 200 == 0:
+                            summary = sess.run(merged, feed)
+                            writer.add_summary(summary, i)
+
+                        # Save the network
+                        if i % 1000 == 0 and i != 0:
+                            save_path = saver.save(sess, "models/" + model_name + ".ckpt", global_step=i)
+                            print("saved to %s" % save_path)
+
+                        i += 1
+                        bar.update(local_i + 1)
+
+            writer.close()
+
+        print('Done')
@@ -2,7 +2,10 @@
 
 """Implementation of a feed-forward neural network"""
 
+import json
+import os
 import pickle
+import uuid
 
 import scipy.special
 from numpy.linalg import pinv
@@ -13,19 +16,22 @@ import progressbar
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.6"
 
+NETWORK_FORMAT_VERSION = 2
+
 
 class NeuralNetwork:
     """
     Feedforward Neural Network, the most simple form of a neural network, it is not recurrent as data only flows forward
     """
 
-    def __init__(self, input_nodes=10, hidden_layers=None, output_nodes=3, learning_rate=.3):
+    def __init__(self, input_nodes=10, hidden_layers=None, output_nodes=3, learning_rate=.3, dtype=np.float64):
         """
         :param input_nodes: Int number of input nodes
         :param hidden_layers: Array of ints, length of array is the number of hidden layers, values are the number of nodes
         per layer
         :param output_nodes: Int number of output hidden nodes
         :param learning_rate: Float, learning rate
+        :param dtype: Numpy float type of the weights and of the computation, np.float32 halves memory and is faster
         """
 
         if not hidden_layers:
@@ -42,75 +48,163 @@ class NeuralNetwork:
         for i in range(1, self.hidden_layers):
             self.m += [np.random.normal(0, pow(self.hnodes[i], -.5), (self.hnodes[i], self.hnodes[i - 1]))]
         self.m += [np.random.normal(0, pow(self.onodes, -.5), (self.onodes, self.hnodes[-1]))]
+        self.m = [m.astype(dtype) for m in self.m]
+
+    @classmethod
+    def from_weights(cls, weights, learning_rate=.3):
+        """
+        Build a network from existing weight matrices rather than random initialisation
+
+        :param weights: List of np arrays, the weight matrices of each layer (as in self.m), these are used as is so may
+         be memory-mapped
+        :param learning_rate: Float, learning rate
+
+        :return: Instance of NeuralNetwork
+        """
+
+        network = cls.__new__(cls)
+        network.inodes = weights[0].shape[1]
+        network.hidden_layers = len(weights) - 1
+        network.hnodes = [m.shape[0] for m in weights[:-1]]
+        network.onodes = weights[-1].shape[0]
+        network.lr = learning_rate
+        network.m = list(weights)
+
+        return network
 
     @staticmethod
-    def activation_function(self, inputs):
-        output = np.array([[scipy.special.expit(value[0])] for value in inputs])
-        return output
+    def activation_function(inputs):
+        return scipy.special.expit(inputs)
 
     @staticmethod
-    def inverse_activation_function(self, inputs):
-        output = np.array([[scipy.special.logit(value[0])] for value in inputs])
-        return output
+    def inverse_activation_function(inputs):
+        return scipy.special.logit(inputs)
 
-    def train_element(self, inputs_list, targets_list):
+    def forward(self, inputs):
         """
-        Update the NN by training it with a single record
+        Forward pass of a batch of records
 
-        :param inputs_list: List of input node values (pre-scaled)
-        :param targets_list: List of targets (1 per possible target outcome), with the maximum range of the activation
-         function for the desired class; minimum range of the activation function for the remaining classes
+        :param inputs: np array (records x input nodes) of input node values (pre-scaled)
+
+        :return: List of the layer outputs, starting with the inputs and ending with the output layer
+        """
+
+        y = [inputs]
+        for m in self.m:
+            y += [self.activation_function(np.dot(y[-1], m.T))]
+
+        return y
+
+    def train_batch(self, inputs, targets):
+        """
+        Update the NN by training it with a mini-batch of records, the weight updates are averaged over the batch
+
+        :param inputs: np array (records x input nodes) of input node values (pre-scaled)
+        :param targets: np array (records x output nodes) of targets, with the maximum range of the activation function
+         for the desired class; minimum range of the activation function for the remaining classes
 
         :return: Updates the model
         """
 
-        inputs = np.array(inputs_list, ndmin=2).T
-        targets = np.array(targets_list, ndmin=2).T
+        dtype = self.m[0].dtype
+        inputs = np.asarray(inputs, dtype=dtype)
+        targets = np.asarray(targets, dtype=dtype)
 
-        # input to first hidden
-        x = [np.dot(self.m[0], inputs)]
-        y = [self.activation_function(x[0])]
+        y = self.forward(inputs)
 
-        # between hidden layers
-        for i in range(1, self.hidden_layers):
-            x += [np.dot(self.m[i], y[i - 1])] # changed x to y
-            y += [self.activation_function(x[i])]
+        errors = targets - y[-1]
+        scale = self.lr / len(inputs)
 
-        # last hidden and the output
-        x += [np.dot(self.m[-1], y[-1])]
-        y += [self.activation_function(x[-1])]
+        # back propagate the errors through the weights before updating them, output layer first
+        for i in range(len(self.m) - 1, -1, -1):
+            gradient = np.dot((errors * y[i + 1] * (1 - y[i + 1])).T, y[i])
+            errors = np.dot(errors, self.m[i])
+            self.m[i] += scale * gradient
 
-        errors = [targets - y[-1]]
+    def train_element(self, inputs_list, targets_list):
+        """
+        Update the NN by training it with a single record
 
-        for i in range(0, self.hidden_layers):
-            errors += [np.dot(self.m[-(1 + i)].T, errors[i])]
+        :param inputs_list: List of input node values (pre-scaled)
+        :param targets_list: List of targets (1 per possible target outcome), with the maximum range of the activation
+         function for the desired class; minimum range of the activation function for the remaining classes
 
-        # update weights for all but first hidden layer
-        for i in range(0, self.hidden_layers):
-            self.m[-(1 + i)] += self.lr * np.dot((errors[i] * y[-(1 + i)] * (1 - y[-(1 + i)])), y[-(2 + i)].T)
+        :return: Updates the model
+        """
 
-        # first hidden layer
-        self.m[0] += self.lr * np.dot((errors[-1] * y[0] * (1 - y[0])), inputs.T)
+        self.train_batch(np.array(inputs_list, ndmin=2), np.array(targets_list, ndmin=2))
 
-    def train(self, train_X, train_Y, epochs=2):
+    def train(self, train_X, train_Y, epochs=2, batch_size=1, shuffle=False):
         """
         The primary function for training the neural network
 
-        :param train_X: Pandas df of training records, values must be between 0.01 and 0.99
-        :param train_Y: Pandas df of targets, values must be between 0.01 and 0.99
+        :param train_X: Pandas df or np array of training records, values must be between 0.01 and 0.99
+        :param train_Y: Pandas df or np array of targets, values must be between 0.01 and 0.99
         :param epochs: The number of times to iterate over the training coprus
+        :param batch_size: Int, records per weight update, 1 updates after every record
+        :param shuffle: Bool, shuffle the records every epoch
         """
 
-        train_X.reset_index(drop=True, inplace=True)
-        train_Y.reset_index(drop=True, inplace=True)
+        dtype = self.m[0].dtype
+        train_X = np.asarray(train_X, dtype=dtype)
+        train_Y = np.asarray(train_Y, dtype=dtype)
 
         train_length = len(train_X)
 
         with progressbar.ProgressBar(max_value=train_length * epochs) as bar:
             for e in range(epochs):
-                for i in range(train_length):
-                    self.train_element(train_X.iloc[i], train_Y.iloc[i])
-                    bar.update(i + (e * train_length))
+                if shuffle:
+                    order = np.random.permutation(train_length)
+                for start in range(0, train_length, batch_size):
+                    if shuffle:
+                        batch = order[start:start + batch_size]
+                    else:
+                        batch = slice(start, start + batch_size)
+                    self.train_batch(train_X[batch], train_Y[batch])
+                    bar.update(min(start + batch_size, train_length) + (e * train_length))
+
+    def train_from_disk(self, x_filepath, y_filepath, min_val, max_val, epochs=2, batch_size=100,
+                        checkpoint_every=None, checkpoint_path=None):
+        """
+        Train the neural network by streaming mini-batches from disk, only one batch is held in memory at a time
+
+        :param x_filepath: String filepath of the (unscaled) training records, a .npy file (memory-mapped) or a
+         .parquet file with one column per input node
+        :param y_filepath: String filepath of the targets in the same format and order, values must be between 0.01
+         and 0.99
+        :param min_val: Float, minimum of the training records (see compute_scaling_stats)
+        :param max_val: Float, maximum of the training records (see compute_scaling_stats)
+        :param epochs: The number of times to iterate over the training coprus
+        :param batch_size: Int, records per weight update
+        :param checkpoint_every: Int, save the network every this many batches, None to never checkpoint
+        :param checkpoint_path: String filepath the checkpoints are saved to (with save_network)
+        """
+
+        if checkpoint_every and not checkpoint_path:
+            raise ValueError('checkpoint_path is needed to checkpoint the network')
+
+        dtype = self.m[0].dtype
+        train_length = disk_rows(x_filepath)
+        if disk_rows(y_filepath) != train_length:
+            raise ValueError('The records and targets files have a different number of rows')
+
+        n_batches = 0
+        with progressbar.ProgressBar(max_value=train_length * epochs) as bar:
+            for e in range(epochs):
+                seen = 0
+                for batch_X, batch_Y in zip(disk_batches(x_filepath, batch_size, dtype=dtype),
+                                            disk_batches(y_filepath, batch_size, dtype=dtype)):
+                    self.train_batch(scale_df_to_nn(batch_X, min_val=min_val, max_val=max_val), batch_Y)
+
+                    n_batches += 1
+                    if checkpoint_every and n_batches % checkpoint_every == 0:
+                        save_network(self, checkpoint_path)
+
+                    seen += len(batch_X)
+                    bar.update(seen + (e * train_length))
+
+        if checkpoint_every:
+            save_network(self, checkpoint_path)
 
     def back_query_element(self, output_vector):
 
@@ -132,31 +226,27 @@ class NeuralNetwork:
 
         return inputs
 
-    def query_element(self, inputs_list):
+    def query_many(self, inputs):
         """
-        Take a list of values for each input node and find the result
+        Find the result for a batch of records, one matrix multiply per layer
 
-        :param inputs_list: List of input node values (pre-scaled)
+        :param inputs: Pandas df or np array (records x input nodes) of input node values (pre-scaled)
 
-        :return: Probabilities of each target class
+        :return: np array (records x output nodes), probabilities of each target class
         """
 
-        inputs = np.array(inputs_list, ndmin=2).T
+        return self.forward(np.asarray(inputs, dtype=self.m[0].dtype))[-1]
 
-        # input to first hidden
-        x = [np.dot(self.m[0], inputs)]
-        y = [self.activation_function(x[0])]
+    def query_element(self, inputs_list):
+        """
+        Take a list of values for each input node and find the result
 
-        # between hidden layers
-        for i in range(1, self.hidden_layers):
-            x += [np.dot(self.m[i], x[i - 1])]
-            y += [self.activation_function(x[i])]
+        :param inputs_list: List of input node values (pre-scaled)
 
-        # last hidden and the output
-        x += [np.dot(self.m[-1], y[-1])]
-        y += [self.activation_function(x[-1])]
+        :return: Probabilities of each target class
+        """
 
-        return [el[0] for el in y[-1]]
+        return self.query_many(np.array(inputs_list, ndmin=2))[0].tolist()
 
     def accuracy(self, test_X, test_Y):
         """
@@ -169,64 +259,197 @@ class NeuralNetwork:
         The score card (whether each record was correct or not)
         """
 
-        test_X.reset_index(drop=True, inplace=True)
-        test_Y.reset_index(drop=True, inplace=True)
-        score_card = []
-        output_arrays = []
-        for i, input_list in enumerate(test_X.values):
-            output_array = self.query_element(input_list)
-            output_arrays.append(output_array)
-            value = np.argmax(output_array)
-            if value == np.argmax(test_Y.iloc[i].values):
-                score_card += [1]
-            else:
-                score_card += [0]
+        output_arrays = self.query_many(test_X)
+        score_card = (np.argmax(output_arrays, axis=1) == np.argmax(np.asarray(test_Y), axis=1)).astype(int)
 
-        accuracy = sum(score_card) / len(test_X)
+        accuracy = score_card.sum() / len(score_card)
 
         return accuracy, output_arrays, score_card
 
 
 def save_network(network, filepath):
     """
-    Saves (pickles) the above class once trained
+    Saves the above class once trained. A filepath ending .pkl or .pickle pickles the whole instance (the old format),
+    any other filepath is saved as a directory of one .npy file per weight matrix and a network.json of the layer
+    sizes, learning rate, format version and layer files, this loads far faster and can be memory-mapped by
+    load_network. Saving again over a directory (e.g. checkpoints) is safe while it is being loaded
 
     :param network: Instance of class NeuralNetwork
     :param filepath: String filepath
     """
 
-    with open(filepath, 'wb') as output:
-        pickle.dump(network, output, pickle.HIGHEST_PROTOCOL)
+    if filepath.endswith('.pkl') or filepath.endswith('.pickle'):
+        with open(filepath + '.tmp', 'wb') as output:
+            pickle.dump(network, output, pickle.HIGHEST_PROTOCOL)
+        os.replace(filepath + '.tmp', filepath)
+        return True
+
+    os.makedirs(filepath, exist_ok=True)
+
+    # every save writes new layer files and then swaps network.json to point at them in one os.replace, so a reader
+    # (or one that memory-mapped the previous save) never sees a partly written network
+    save_id = uuid.uuid4().hex[:12]
+    layer_files = ['layer_' + str(i) + '_' + save_id + '.npy' for i in range(len(network.m))]
+    for layer_file, m in zip(layer_files, network.m):
+        np.save(os.path.join(filepath, layer_file), m)
+
+    metadata = {'format_version': NETWORK_FORMAT_VERSION,
+                'input_nodes': network.inodes,
+                'hidden_layers': network.hnodes,
+                'output_nodes': network.onodes,
+                'learning_rate': network.lr,
+                'dtype': np.dtype(network.m[0].dtype).name,
+                'layer_files': layer_files}
+    temp_filepath = os.path.join(filepath, 'network.json.' + save_id + '.tmp')
+    with open(temp_filepath, 'w') as output:
+        json.dump(metadata, output, indent=2)
+    os.replace(temp_filepath, os.path.join(filepath, 'network.json'))
+
+    # the previous layer files are no longer referenced, a reader that has them memory-mapped keeps its copy (where
+    # the os will not remove a mapped file it is left for the next save)
+    for filename in os.listdir(filepath):
+        if filename.startswith('layer_') and filename.endswith('.npy') and filename not in layer_files:
+            try:
+                os.remove(os.path.join(filepath, filename))
+            except OSError:
+                pass
 
     return True
 
 
-def load_network(filepath):
+def load_network(filepath, mmap_mode=None):
     """
-    Load a previously trained and pickled model
+    Load a previously trained and saved model, either a pickle or a directory saved by save_network
 
     :param filepath: String filepath
+    :param mmap_mode: None to read the weights into memory, 'r' to memory-map them read only so several scoring
+     processes share one copy (such a network can be queried but not trained), only for directory saved networks
+
     :return: The saved and trained instance of the NeuralNetwork class
     """
 
-    with open(filepath, 'rb') as input_f:
-        network = pickle.load(input_f)
+    if not os.path.isdir(filepath):
+        with open(filepath, 'rb') as input_f:
+            network = pickle.load(input_f)
+        return network
+
+    with open(os.path.join(filepath, 'network.json')) as input_f:
+        metadata = json.load(input_f)
+
+    if metadata['format_version'] > NETWORK_FORMAT_VERSION:
+        raise ValueError('Network saved with format version ' + str(metadata['format_version']) +
+                         ', only versions up to ' + str(NETWORK_FORMAT_VERSION) + ' can be loaded')
+
+    n_layers = len(metadata['hidden_layers']) + 1
+    # format version 1 networks have unversioned layer files
+    layer_files = metadata.get('layer_files', ['layer_' + str(i) + '.npy' for i in range(n_layers)])
+    weights = [np.load(os.path.join(filepath, layer_file), mmap_mode=mmap_mode) for layer_file in layer_files]
+
+    shapes = [m.shape for m in weights]
+    nodes = [metadata['input_nodes']] + metadata['hidden_layers'] + [metadata['output_nodes']]
+    if shapes != [(nodes[i + 1], nodes[i]) for i in range(n_layers)]:
+        raise ValueError('Weight matrices ' + str(shapes) + ' do not match the layer sizes ' + str(nodes))
 
-    return network
+    return NeuralNetwork.from_weights(weights, learning_rate=metadata['learning_rate'])
 
 
-def scale_df_to_nn(matrix):
+def scale_df_to_nn(matrix, min_val=None, max_val=None):
     """
     Scales the input df to between 0.01 and 0.99
 
     :param matrix: np array (matrix or pd dataframe) to be scaled
+    :param min_val: Float, minimum to scale from, None to use the minimum of the matrix (pass precomputed stats when
+     scaling a batch of a larger dataset)
+    :param max_val: Float, maximum to scale from, None to use the maximum of the matrix
 
     output scaled matrix: Scaled matrix as a pd dataframe
     """
 
-    min_val = matrix.min().min()
-    max_val = matrix.max().max()
+    if min_val is None:
+        min_val = matrix.min().min()
+    if max_val is None:
+        max_val = matrix.max().max()
 
     scaled_matrix = (((matrix - min_val) / (max_val - min_val)) * .98) + 0.01
 
     return scaled_matrix
+
+
+def is_parquet(filepath):
+    return filepath.endswith('.parquet') or filepath.endswith('.pq')
+
+
+def disk_rows(filepath):
+    """
+    Number of records in a .npy or .parquet file, read from the header / metadata only
+
+    :param filepath: String filepath
+
+    :return: Int
+    """
+
+    if is_parquet(filepath):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(filepath).metadata.num_rows
+
+    return np.load(filepath, mmap_mode='r').shape[0]
+
+
+def disk_batches(filepath, batch_size, dtype=np.float64):
+    """
+    Generator of batches of records from a .npy file (memory-mapped) or a .parquet file (read a row group slice at a
+    time), every batch but the last has exactly batch_size records
+
+    :param filepath: String filepath
+    :param batch_size: Int, records per batch
+    :param dtype: Numpy type of the batches
+
+    :return: Yields np arrays (records x columns)
+    """
+
+    if not is_parquet(filepath):
+        data = np.load(filepath, mmap_mode='r')
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        for start in range(0, len(data), batch_size):
+            yield np.asarray(data[start:start + batch_size], dtype=dtype)
+        return
+
+    import pyarrow.parquet as pq
+
+    buffer = []
+    buffered = 0
+    for record_batch in pq.ParquetFile(filepath).iter_batches(batch_size=batch_size):
+        buffer += [np.column_stack([column.to_numpy(zero_copy_only=False) for column in record_batch.columns])
+                   .astype(dtype, copy=False)]
+        buffered += record_batch.num_rows
+        if buffered >= batch_size:
+            rows = np.concatenate(buffer)
+            for start in range(0, buffered - batch_size + 1, batch_size):
+                yield rows[start:start + batch_size]
+            rows = rows[buffered - buffered % batch_size:]
+            buffer = [rows]
+            buffered = len(rows)
+
+    if buffered:
+        yield np.concatenate(buffer)
+
+
+def compute_scaling_stats(filepath, batch_size=10000):
+    """
+    Find the minimum and maximum of a .npy or .parquet file of records, one batch at a time, to scale batches with
+    scale_df_to_nn when training from disk
+
+    :param filepath: String filepath
+    :param batch_size: Int, records read at a time
+
+    :return: Tuple of floats, min_val and max_val
+    """
+
+    min_val = np.inf
+    max_val = -np.inf
+    for batch in disk_batches(filepath, batch_size):
+        min_val = min(min_val, batch.min())
+        max_val = max(max_val, batch.max())
+
+    return float(min_val), float(max_val)
@@ -2,6 +2,16 @@
 
 """word embeddings using Googles word2vec"""
 
+from contextlib import contextmanager
+import glob
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 import gensim
 import numpy as np
 from usherwood_ds.nlp.preprocessing.tokenizer import tokenizer_sentence
@@ -9,6 +19,9 @@ from usherwood_ds.nlp.preprocessing.tokenizer import tokenizer_sentence
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
 
+# Embeddings already opened by load_shared_word2vec_model in this process, keyed by the native filepath
+_shared_models = {}
+
 
 class MySentences(object):
     """
@@ -47,6 +60,29 @@ class WordEmbedding(object):
         self.model = gensim.models.KeyedVectors.load_word2vec_format(filename,
                                                                      binary=binary)
 
+    def save_native_model(self, filename):
+        """
+        Save the loaded embeddings in gensim's native format, the vectors are written as a separate .npy file so they
+        can later be memory-mapped by load_native_model
+
+        :param filename: filepath to save the embeddings to
+        """
+
+        self.model.save(filename)
+
+        return True
+
+    def load_native_model(self, filename, mmap='r'):
+        """
+        Load embeddings saved with save_native_model. With mmap='r' the vectors are memory-mapped read only rather
+        than read into RAM, so every process opening the same file shares one page-cached copy
+
+        :param filename: filepath to the native embeddings
+        :param mmap: Str or None, numpy mmap mode for the vectors, None reads them fully into memory
+        """
+
+        self.model = gensim.models.KeyedVectors.load(filename, mmap=mmap)
+
     def create_word2vec_model(self, filename, workers=4, min_count=5, size=200):
         """
         Trains the model
@@ -77,6 +113,103 @@ class WordEmbedding(object):
         return True
 
 
+def native_model_path(filename):
+    """
+    The filepath used for the native (memory-mappable) copy of a word2vec format file
+
+    :param filename: filepath to word2vec format embeddings, e.g. GoogleNews-vectors-negative300.bin
+
+    :return: Str, the filepath with the extension replaced by .kv
+    """
+
+    return os.path.splitext(filename)[0] + '.kv'
+
+
+def convert_word2vec_to_native(filename, native_filename=None, binary=True):
+    """
+    One-time conversion of word2vec format embeddings into gensim's native format, this only needs to be run once
+    per embeddings file, after that load_shared_word2vec_model will memory-map the result
+
+    :param filename: filepath to word2vec format embeddings
+    :param native_filename: filepath to save the native embeddings to, defaults to native_model_path(filename)
+    :param binary: Bool, if True then filename is .bin
+
+    :return: Str, the filepath of the native embeddings
+    """
+
+    if native_filename is None:
+        native_filename = native_model_path(filename)
+
+    # gensim writes the .kv file and its .npy arrays separately, so save under a temporary name and move the arrays
+    # then the .kv into place, the .kv only exists once every file it needs is complete
+    temp_filename = native_filename + '.tmp' + str(os.getpid())
+
+    embedding = WordEmbedding()
+    embedding.load_word2vec_model(filename, binary=binary)
+    embedding.save_native_model(temp_filename)
+
+    for temp_array in glob.glob(glob.escape(temp_filename) + '.*.npy'):
+        os.replace(temp_array, native_filename + temp_array[len(temp_filename):])
+    os.replace(temp_filename, native_filename)
+
+    return native_filename
+
+
+@contextmanager
+def file_lock(lock_filename):
+    """
+    Hold an exclusive lock on a lock file, blocking until any other process holding it releases it
+
+    :param lock_filename: filepath of the lock file, created if it does not exist
+    """
+
+    with open(lock_filename, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def load_shared_word2vec_model(filename, binary=True):
+    """
+    Load embeddings memory-mapped read only, converting them to the native format first if that has not been done
+    yet. The vectors live in the OS page cache rather than in each process, so any number of workers can share one
+    copy of e.g. the 3.6 GB GoogleNews model, and repeated calls within a process return the same object
+
+    :param filename: filepath to word2vec format embeddings, or to embeddings already saved in the native format
+    :param binary: Bool, if True then filename is .bin (only used if a conversion is required)
+
+    :return: WordEmbedding with a memory-mapped model
+    """
+
+    if filename.endswith('.kv'):
+        native_filename = filename
+    else:
+        native_filename = native_model_path(filename)
+        if not os.path.exists(native_filename):
+            # only one process converts, the others wait for it then load the result
+            with file_lock(native_filename + '.lock'):
+                if not os.path.exists(native_filename):
+                    print('Converting', filename, 'to', native_filename)
+                    convert_word2vec_to_native(filename, native_filename=native_filename, binary=binary)
+
+    if native_filename not in _shared_models:
+        embedding = WordEmbedding()
+        embedding.load_native_model(native_filename, mmap='r')
+        _shared_models[native_filename] = embedding
+
+    return _shared_models[native_filename]
+
+
 def snippets_to_file(snippet_series, folder):
     """
     Write snippet_series to file to be used to create embeddings, does not preprocess, preferably use other method
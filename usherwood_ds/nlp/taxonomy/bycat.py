@@ -4,6 +4,9 @@
 
 import pandas as pd
 import numpy as np
+from scipy import sparse
+
+from usherwood_ds.nlp.taxonomy.category_matrix import CategoryMatrix
 
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.6"
@@ -63,7 +66,8 @@ def encoded_to_bycat_counts(df_encoded,
                             sentiment_column_key='Sentiment',
                             categorical_sentiment=True,
                             date_column_key='Date (Local)',
-                            manual_range=pd.date_range('2015-10-31', '2017-11-01')):
+                            manual_range=pd.date_range('2015-10-31', '2017-11-01'),
+                            categories=None):
     """
     Transform a standard encoded file into a bycat (by category) file
 
@@ -78,6 +82,8 @@ def encoded_to_bycat_counts(df_encoded,
     :param manual_range: pandas date range, manually specify the domain for prediction, this is vital if you are
     splitting a big data set in half as keeping the range constant allows the derivatives to be summed. E.g.
     bycat1 + bycat2 = bycat_total
+    :param categories: CategoryMatrix of the taxonomy with the same rows as df_encoded, used in place of the
+    tax_col_indicator columns
 
     :return: bycat_counts df with the taxonomy as rows and counts of the cross sectional variables as columns
     """
@@ -87,7 +93,11 @@ def encoded_to_bycat_counts(df_encoded,
 
     df_encoded.fillna(0, inplace=True)
 
-    tax_cols = list(df_encoded.columns[pd.Series(df_encoded.columns).str.startswith(tax_col_indicator)])
+    if categories is None:
+        tax_cols = list(df_encoded.columns[pd.Series(df_encoded.columns).str.startswith(tax_col_indicator)])
+        categories = CategoryMatrix.from_df(df_encoded, columns=tax_cols)
+    else:
+        tax_cols = categories.columns
     cross_cols = list(df_encoded.columns[pd.Series(df_encoded.columns).str.startswith(cross_col_indicator)])
 
     if include_sentiment:
@@ -99,54 +109,101 @@ def encoded_to_bycat_counts(df_encoded,
                 cross_cols += ['Sentiment ' + str(col)]
             df_encoded = pd.concat([df_encoded, sents], axis=1)
 
-    df_cross = df_encoded[tax_cols+cross_cols]
-
-    counts = df_cross[tax_cols].sum().values
+    # only the tax x cross block of the co-occurrence matrix is needed
+    cross_matrix = sparse.csr_matrix(df_encoded[cross_cols].to_numpy(dtype=np.float64))
 
-    cooc_full = df_cross.T.dot(df_cross)
+    counts = categories.counts().values
 
-    bycat_counts = cooc_full.ix[tax_cols,cross_cols]
+    bycat_counts = pd.DataFrame(categories.cooccurrence(cross_matrix).toarray(), index=tax_cols, columns=cross_cols)
     bycat_counts.insert(0, 'Volume', value=counts)
 
     if prediction:
-        df_encoded.index = pd.to_datetime(df_encoded[date_column_key])
-        df_encoded['Volume'] = 1
+        weeks = week_numbers(pd.to_datetime(df_encoded[date_column_key]))
+        if manual_range is not None:
+            manual_weeks = week_numbers(pd.Series([manual_range.min(), manual_range.max()]))
+        else:
+            manual_weeks = None
 
-        dvolumedts = []
-        dsentimentdts = []
-        for tax in tax_cols:
-            sub = df_encoded[df_encoded[tax] == 1].ix[:, [date_column_key, 'Volume', sentiment_column_key]]
-            if manual_range is not None:
-                df2 = pd.DataFrame(0, index=manual_range, columns=['Volume'])
-                df2[date_column_key] = df2.index
-                df2[sentiment_column_key] = 0
-                df_encoded['Volume'] = 1
-                sub = sub.combine_first(df2)
+        dvolumedts, dsentimentdts = weekly_trend_slopes(categories.matrix,
+                                                         weeks,
+                                                         df_encoded[sentiment_column_key].values.astype(float),
+                                                         manual_weeks=manual_weeks)
 
-            #sent = sub.resample('W').mean()[sentiment_column_key]\
-            #    .fillna(sub.resample('W').mean()[sentiment_column_key].mean())
+        bycat_counts.insert(1, 'dVolume dt', value=dvolumedts)
+        bycat_counts.insert(1, 'dSentiment dt', value=dsentimentdts)
 
-            #volume = sub.resample('W').sum()['Volume'].fillna(sub.resample('W').sum()['Volume'].mean())
+    return bycat_counts
 
-            sent = sub.resample('W').sum()[sentiment_column_key].fillna(0)
 
-            volume = sub.resample('W').sum()['Volume'].fillna(0)
+def week_numbers(dates):
+    """
+    Number the weeks (Monday to Sunday, as resample('W')) of a series of dates
 
-            x = np.arange(len(volume))
+    :param dates: Pandas series of datetimes
 
-            if len(x) <= 1:
-                mv, ms = 0, 0
-            else:
-                mv, cv = np.polyfit(x=x, y=volume, deg=1)
-                ms, cs = np.polyfit(x=x, y=sent, deg=1)
+    :return: np array of ints, consecutive weeks have consecutive numbers
+    """
 
-            dvolumedts.append(mv)
-            dsentimentdts.append(ms)
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
 
-        bycat_counts.insert(1, 'dVolume dt', value=dvolumedts)
-        bycat_counts.insert(1, 'dSentiment dt', value=dsentimentdts)
+    days = dates.dt.normalize().values.astype('datetime64[D]').astype(np.int64)
 
-    return bycat_counts
+    # day 0 (1 Jan 1970) is a Thursday, so shifting by 3 days starts each week on a Monday
+    return (days + 3) // 7
+
+
+def weekly_trend_slopes(membership, weeks, sentiment, manual_weeks=None):
+    """
+    The least squares slopes of the weekly volume and summed sentiment of every category, the weeks of each category
+    run from its first to its last mention (extended to manual_weeks) with missing weeks counted as 0. All categories
+    are solved at once from per category sums rather than fitting each weekly series
+
+    :param membership: Scipy sparse matrix (mentions x categories), non zero where a mention is in the category
+    :param weeks: np array of ints, the week number of each mention (see week_numbers)
+    :param sentiment: np array of floats, the sentiment of each mention
+    :param manual_weeks: np array of the first and last week numbers every category's weeks must span, None to use each
+    category's own range
+
+    :return: Tuple of np arrays, the volume slopes and sentiment slopes of each category
+    """
+
+    membership = sparse.csc_matrix(membership, dtype=bool).astype(np.float64)
+    weeks = np.asarray(weeks, dtype=np.int64)
+
+    # shifted so every mention's week is at least 1 and empty categories (max 0) can be told apart
+    offset = weeks.min() - 1 if len(weeks) else 0
+    if manual_weeks is not None:
+        offset = min(offset, manual_weeks.min() - 1)
+    shifted = (weeks - offset).astype(np.float64)
+    top = shifted.max() + 1 if len(weeks) else 1
+
+    n_mentions = np.asarray(membership.sum(axis=0)).ravel()
+    last = np.asarray(membership.multiply(shifted[:, None]).max(axis=0).todense()).ravel()
+    first = top - np.asarray(membership.multiply((top - shifted)[:, None]).max(axis=0).todense()).ravel()
+
+    if manual_weeks is not None:
+        manual_first, manual_last = manual_weeks.min() - offset, manual_weeks.max() - offset
+        first = np.where(n_mentions > 0, np.minimum(first, manual_first), manual_first)
+        last = np.where(n_mentions > 0, np.maximum(last, manual_last), manual_last)
+
+    n_weeks = np.where((n_mentions > 0) | (manual_weeks is not None), last - first + 1, 0)
+
+    # sum over weeks of (x - mean x) * y, where x counts the weeks from each category's first week
+    mean_x = (n_weeks - 1) / 2
+    sum_xx = n_weeks * (n_weeks ** 2 - 1) / 12
+    fitted = sum_xx > 0
+
+    slopes = []
+    for values in [np.ones(len(weeks)), sentiment]:
+        sum_y = membership.T.dot(values)
+        sum_wy = membership.T.dot(shifted * values)
+        sum_xy = sum_wy - first * sum_y
+        slope = np.zeros(membership.shape[1])
+        slope[fitted] = (sum_xy[fitted] - mean_x[fitted] * sum_y[fitted]) / sum_xx[fitted]
+        slopes.append(slope)
+
+    return slopes[0], slopes[1]
 
 
 def bycat_counts_to_bycat_scores(bycat_counts, cross_lists):
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""A sparse boolean matrix of which categories each mention is in, in place of dense 0/1 category columns"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.6"
+
+
+class CategoryMatrix:
+    """
+    Mentions x categories, stored as a scipy CSR matrix of bools with the category names as its columns
+    """
+
+    def __init__(self, matrix, columns, index=None):
+        """
+        :param matrix: Scipy sparse matrix or np array (mentions x categories), non zero where a mention is in a category
+        :param columns: List of the category names
+        :param index: Pandas index of the mentions, None for a range index
+        """
+
+        self.matrix = sparse.csr_matrix(matrix, dtype=bool)
+        self.matrix.eliminate_zeros()
+        self.columns = list(columns)
+        self.column_index = {column: i for i, column in enumerate(self.columns)}
+        self.index = index if index is not None else pd.RangeIndex(self.matrix.shape[0])
+
+        if len(self.column_index) != len(self.columns):
+            raise ValueError('Category names must be unique')
+        if self.matrix.shape != (len(self.index), len(self.columns)):
+            raise ValueError('The matrix shape ' + str(self.matrix.shape) + ' does not match the ' +
+                             str(len(self.index)) + ' mentions and ' + str(len(self.columns)) + ' categories')
+
+    @classmethod
+    def from_df(cls, df, columns=None, col_indicator=None):
+        """
+        Build from the dense category columns of a df, one column at a time so no dense copy is made
+
+        :param df: Pandas df with 0/1 category columns
+        :param columns: List of the category columns, None to use col_indicator
+        :param col_indicator: String, the pattern that starts all category columns (e.g. 'e_'), None for all columns
+
+        :return: CategoryMatrix
+        """
+
+        if columns is None:
+            columns = [column for column in df.columns
+                       if col_indicator is None or str(column).startswith(col_indicator)]
+
+        rows = []
+        cols = []
+        for i, column in enumerate(columns):
+            in_category = np.flatnonzero(df[column].fillna(0).values != 0)
+            rows.append(in_category)
+            cols.append(np.full(len(in_category), i, dtype=np.int64))
+
+        data_rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        data_cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        matrix = sparse.coo_matrix((np.ones(len(data_rows), dtype=bool), (data_rows, data_cols)),
+                                   shape=(len(df), len(columns)))
+
+        return cls(matrix, columns, index=df.index)
+
+    def to_df(self, dtype=np.int64):
+        """
+        The dense df layout, one 0/1 column per category
+
+        :param dtype: Numpy type of the columns
+
+        :return: Pandas df
+        """
+
+        return pd.DataFrame(self.matrix.toarray().astype(dtype), index=self.index, columns=self.columns)
+
+    def to_sparse_df(self):
+        """
+        A pandas df of sparse 0/1 columns, for when the dense layout will not fit in memory
+
+        :return: Pandas df
+        """
+
+        return pd.DataFrame.sparse.from_spmatrix(self.matrix.astype(np.int64), index=self.index, columns=self.columns)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def __contains__(self, column):
+        return column in self.column_index
+
+    def __getitem__(self, column):
+        """
+        :param column: String, a category name
+
+        :return: np array of bools, whether each mention is in the category
+        """
+
+        return self.matrix[:, self.column_index[column]].toarray().ravel()
+
+    def select(self, columns):
+        """
+        :param columns: List of category names
+
+        :return: CategoryMatrix of only those categories
+        """
+
+        return CategoryMatrix(self.matrix[:, [self.column_index[column] for column in columns]], columns, self.index)
+
+    def counts(self):
+        """
+        :return: Pandas series of the number of mentions in each category
+        """
+
+        return pd.Series(np.asarray(self.matrix.sum(axis=0)).ravel(), index=self.columns)
+
+    def cooccurrence(self, other):
+        """
+        Sum the values of other over the mentions in each category
+
+        :param other: CategoryMatrix, scipy sparse matrix or np array (mentions x columns) with the same mentions
+
+        :return: Scipy sparse matrix or np array (categories x columns)
+        """
+
+        if isinstance(other, CategoryMatrix):
+            other = other.matrix.astype(np.int64)
+
+        return self.matrix.T.astype(np.int64).dot(other)
+
+    def any_of(self, groups):
+        """
+        OR reduce groups of categories, a mention is in a group if it is in any of the group's categories. All groups
+        are reduced with one sparse product
+
+        :param groups: Dict, group name: list of category names (names not in the matrix are ignored)
+
+        :return: CategoryMatrix with one category per group
+        """
+
+        names = list(groups.keys())
+        member_rows = []
+        member_cols = []
+        for j, name in enumerate(names):
+            members = [self.column_index[column] for column in groups[name] if column in self.column_index]
+            member_rows += members
+            member_cols += [j] * len(members)
+
+        membership = sparse.csr_matrix((np.ones(len(member_rows), dtype=np.int32), (member_rows, member_cols)),
+                                       shape=(len(self.columns), len(names)))
+
+        return CategoryMatrix(self.matrix.astype(np.int32).dot(membership) > 0, names, self.index)
+
+    def hstack(self, other):
+        """
+        Add the categories of other, any that already exist are replaced
+
+        :param other: CategoryMatrix with the same mentions
+
+        :return: CategoryMatrix
+        """
+
+        keep = [column for column in self.columns if column not in other.column_index]
+        kept = self.matrix[:, [self.column_index[column] for column in keep]]
+
+        return CategoryMatrix(sparse.hstack([kept, other.matrix], format='csr'), keep + other.columns, self.index)
@@ -2,97 +2,92 @@
 
 """Functions for plotting taxonomy categories"""
 
+import numpy as np
+
+from usherwood_ds.nlp.taxonomy.category_matrix import CategoryMatrix
+
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.6"
 
 
 def create_map(attribute_cols):
+    """
+    Create the level maps of the summary (-ALL) tags of a dotted tag hierarchy, e.g. 'a.b-ALL' is 'a.b' and every tag
+    below it. Each tag is parsed once into a tree, so this is linear in the number of tags
 
-    max_depth = check_max_depth(attribute_cols)
+    :param attribute_cols: List[str], complete list of categories
 
-    level_tags = split_tags_to_levels(attribute_cols=attribute_cols,
-                                      max_depth=max_depth)
-    level_tags, summary_tags = create_summary_tags(level_tags=level_tags,
-                                                   max_depth=max_depth)
-    level_maps = create_level_maps(level_tags=level_tags,
-                                   summary_tags=summary_tags,
-                                   max_depth=max_depth)
-    return level_maps
+    :return: list of dicts (one per level, starting with the lowest) of summary tag: the tags and summary tags in it
+    """
 
+    tree = build_tag_tree(attribute_cols)
+    max_depth = max(node['depth'] for node in tree.values())
 
-def check_max_depth(attribute_cols):
-    max_depth = 0
-    tag_depths = [(len(tag.split('.')) - 1) for tag in attribute_cols]
-    max_depth = max(tag_depths)
+    level_maps = [dict() for _ in range(max_depth)]
+    for path, node in tree.items():
+        if not node['children']:
+            continue
 
-    return max_depth
+        members = []
+        for child in node['children']:
+            if tree[child]['is_tag']:
+                members += [child]
+            if tree[child]['children']:
+                members += [child + '-ALL']
+        if node['is_tag']:
+            members += [path]
 
+        level_maps[max_depth - node['depth'] - 1][path + '-ALL'] = members
 
-def split_tags_to_levels(attribute_cols, max_depth):
-    """
-    Split the list of tags in attribute cols into sub lists grouped by level
+    return level_maps
 
-    :param attribute_cols: List[str], complete list of categories
-    :param max_depth:  Int, Max depth of categories
 
-    :return: list of lists where each sub list are the tags of that level, starting with the lowest
+def build_tag_tree(attribute_cols):
     """
+    Parse dotted tags into a tree (trie) of their paths
 
-    level_tags = []
-    for i in range(0, max_depth):
-        level = max_depth - i
-        current_level_tags = []
-        for att in attribute_cols:
-            att_level = len(att.split('.')) - 1
-            if att_level == level:
-                current_level_tags += [att]
-
-        level_tags.append(current_level_tags)
-
-    return level_tags
-
-
-def create_summary_tags(max_depth, level_tags):
-    summary_tags = []
-    for i in range(0, max_depth):
-        level = max_depth - i
-        current_summary_tags = []
-        for att in level_tags[i]:
-            summary_tag = ".".join(att.split('.')[:-1]) + '-ALL'
-            current_summary_tags += [summary_tag]
+    :param attribute_cols: List[str], complete list of categories
 
-        current_summary_tags = list(set(current_summary_tags))
-        summary_tags.append(current_summary_tags)
+    :return: dict of path: {'depth': number of dots, 'is_tag': whether the path is itself a tag, 'children': list of
+    the paths one level below}
+    """
 
-        if i <= max_depth - 2:
-            level_tags[i + 1] += current_summary_tags
+    tree = dict()
+    for tag in attribute_cols:
+        parts = tag.split('.')
+        parent = None
+        for depth in range(len(parts)):
+            path = tag if depth == len(parts) - 1 else '.'.join(parts[:depth + 1])
+            if path not in tree:
+                tree[path] = {'depth': depth, 'is_tag': False, 'children': []}
+                if parent is not None:
+                    tree[parent]['children'].append(path)
+            parent = path
+        tree[tag]['is_tag'] = True
 
-    return level_tags, summary_tags
+    return tree
 
 
-def create_level_maps(max_depth, level_tags, summary_tags):
+def populate_matrix_with_macro_cats(categories, level_maps):
     """
-    stage three, create map of summary = column of same name in level above + all tags containing in level
+    Adds the summary categories to a category matrix. Going up the levels, each summary is resolved to the sub tags
+    under it, so every summary is then one sparse OR reduction of the matrix
 
-    :param max_depth:
-    :param level_tags:
-    :param summary_tags:
+    :param categories: CategoryMatrix with the sub tags already populated
+    :param level_maps: level_maps as created above
 
-    :return:
+    :return: CategoryMatrix with the summary categories
     """
 
-    level_maps = []
-    for i in range(0, max_depth - 1):
-        level_map = dict()
-        level = max_depth - i
-        for summary in summary_tags[i]:
-            all_sub_tags = [att for att in level_tags[i] if summary[:-4] == ".".join(att.split('.')[:-1])]
-            matching_tag_above = [att for att in level_tags[i + 1] if summary[:-4] == att]
-            level_map[summary] = all_sub_tags + matching_tag_above
-
-        level_maps.append(level_map)
+    sub_tags = dict()
+    for level_map in level_maps:
+        for summary_att, atts in level_map.items():
+            resolved = []
+            for att in atts:
+                resolved += sub_tags.get(att, [att])
+            sub_tags[summary_att] = list(dict.fromkeys(resolved))
 
-    return level_maps
+    return categories.hstack(categories.any_of(sub_tags))
 
 
 def populate_df_with_macro_cats(df, level_maps):
@@ -104,8 +99,13 @@ def populate_df_with_macro_cats(df, level_maps):
 
     :return: df with summary columns
     """
-    for level_map in level_maps:
-        for summary_att, atts in level_map.items():
-            df[summary_att] = df[atts].sum(axis=1).apply(lambda e: 1 if e >= 1 else 0)
+
+    summary_cols = [summary_att for level_map in level_maps for summary_att in level_map]
+    sub_cols = list(dict.fromkeys(att for level_map in level_maps for atts in level_map.values() for att in atts
+                                  if att not in summary_cols))
+
+    categories = populate_matrix_with_macro_cats(CategoryMatrix.from_df(df, columns=sub_cols), level_maps)
+
+    df[summary_cols] = categories.select(summary_cols).matrix.toarray().astype(np.int64)
 
     return df
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+
+"""Capability for mass tagging of text snippets using regex query writing, on one machine over a process pool."""
+
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import regex
+from scipy import sparse
+
+from usherwood_ds.nlp.taxonomy.category_matrix import CategoryMatrix
+from usherwood_ds.nlp.taxonomy.rule_prefilter import RulePrefilter
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.6"
+
+_worker_rules = None
+_worker_prefilter = None
+
+
+def read_rule_list(rulelist_filename):
+    """
+    Read a (translated) csv rulelist, skipping comments and blank lines
+
+    :param rulelist_filename: Filename (and relative path) to the rulelist file
+
+    :return: List of [category name, query] lists, starting with the header row
+    """
+
+    rulelist = []
+    with open(rulelist_filename, 'r', encoding='utf-8') as ofile:
+        for row in ofile.readlines():
+            if len(row) > 0 and row[0] != '#' and not regex.fullmatch(r'\s+', row):
+                x = row.split(',', 1)
+                # removing the new line character that is read in at the very end of each rule
+                x[-1] = x[-1].replace('\n', '')
+                rulelist += [x]
+
+    return rulelist
+
+
+def translate_rule_list(rulelist_filename, accents=False):
+    """
+    Translate a csv rulelist of boolean queries to regex with translate_batch, which is not part of this package
+
+    :param rulelist_filename: Filename (and relative path) to the rulelist file
+    :param accents: Bool, passed to translate_batch
+
+    :return: Filename of the translated rulelist, saved next to the original
+    """
+
+    try:
+        from utils.linguistics.text_mining.feature_extraction.categorizer.translate_rules import translate_batch
+    except ImportError:
+        raise ImportError('Translating rulelists needs translate_rules (utils.linguistics.text_mining.'
+                          'feature_extraction.categorizer), write the rules as regex and load them with '
+                          'translate=False')
+
+    outputf = rulelist_filename.replace('.csv', 'Translated_Regex.csv')
+    translate_batch(rulelist_filename, outputf, accents)
+
+    return outputf
+
+
+def compile_rules(rules, print_errors=True):
+    """
+    Compile the rule queries, invalid rules are reported and left out
+
+    :param rules: List of (category name, query) tuples
+    :param print_errors: Bool, print the invalid rules
+
+    :return: List of (category name, compiled regex) tuples
+    """
+
+    compiled = []
+    for querytitle, querystring in rules:
+        try:
+            compiled.append((querytitle, regex.compile(querystring, flags=regex.IGNORECASE)))
+        except regex.error as e:
+            if print_errors:
+                print(querytitle, 'is invalid:', e)
+
+    return compiled
+
+
+def _init_worker(rules, prefilter):
+    global _worker_rules, _worker_prefilter
+    _worker_rules = compile_rules(rules, print_errors=False)
+    if prefilter:
+        _worker_prefilter = RulePrefilter([querystring for _, querystring in rules])
+
+
+def match_snippets(snippets, compiled_rules, prefilter=None):
+    """
+    Test every snippet against every rule
+
+    :param snippets: List of strings
+    :param compiled_rules: List of (category name, compiled regex) tuples
+    :param prefilter: RulePrefilter of the rules, to only run the rules whose required literals are in each snippet,
+    None to run every rule
+
+    :return: Tuple of np arrays, the snippet and rule positions of every match
+    """
+
+    rows = []
+    cols = []
+    if prefilter is None:
+        for j, (_, rule) in enumerate(compiled_rules):
+            for i, snippet in enumerate(snippets):
+                if rule.search(snippet) is not None:
+                    rows.append(i)
+                    cols.append(j)
+    else:
+        for i, snippet in enumerate(snippets):
+            for j in prefilter.candidate_rules(snippet):
+                if compiled_rules[j][1].search(snippet) is not None:
+                    rows.append(i)
+                    cols.append(j)
+
+    return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+
+def _match_chunk(snippets):
+    return match_snippets(snippets, _worker_rules, _worker_prefilter)
+
+
+class LocalCategorizer:
+    """
+    Tags a df of snippets with the categories of regex rule lists, the same steps as the spark Categorizer without a
+    spark cluster. Rules are compiled once per worker process and the snippets are split into chunks across the pool,
+    the results are kept as a sparse CategoryMatrix (snippets x categories). With prefilter each snippet is only tested
+    against the rules whose required literals it contains
+    """
+
+    def __init__(self, df_path=None, df=None, id_field='Url', snippet_field='Cleaned Snippet', processes=None,
+                 chunk_size=5000, prefilter=True):
+        """
+        :param df_path: Path to a csv containing cleaned snippets and ids (as a maximum)
+        :param df: Pandas df to use in place of df_path
+        :param id_field: the id field in source df
+        :param snippet_field: the field containing the text data to search in
+        :param processes: Int, number of worker processes, None for one per CPU, 1 to run in this process
+        :param chunk_size: Int, snippets sent to a worker at a time
+        :param prefilter: Bool, skip the rules whose required literals are not in a snippet
+        """
+
+        if df is None:
+            df = pd.read_csv(df_path, encoding='utf-8')
+
+        self.df_path = df_path
+        self.df = df
+        self.rulelist_filename = None
+        self.rulelist = None
+        self.id_field = id_field
+        self.snippet_field = snippet_field
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.prefilter = prefilter
+        self.categories = None
+
+    def load_rule_list(self, rulelist_filename, accents=False, translate=False):
+        """
+        Step - repeatable, loads in a csv rulelist from the hdd. This rulelist should have a header row and be
+        formatted into two columns, each row corresponds to one catagory:
+        The first should contain the catagory names
+        The second should contain the boolean search queries
+
+        This should be created and saved in utf-8, note this CANNOT BE DONE IN EXCEL, use google docs or text editor
+
+        :param rulelist_filename: Filename (and relative path) to the rulelist file.
+        :param accents: Bool, passed to translate_batch
+        :param translate: Bool, translate boolean queries to regex first (see translate_rule_list), by default the
+        rulelist is already regex
+        """
+        print(rulelist_filename)
+
+        self.rulelist_filename = rulelist_filename
+
+        if translate:
+            self.rulelist_filename = translate_rule_list(rulelist_filename, accents)
+
+        self.rulelist = read_rule_list(self.rulelist_filename)
+
+        print(self.rulelist_filename + ' has been loaded successfully')
+
+        return True
+
+    def categorize_rulefile(self, print_results_found=True):
+        """
+        Step - repeatable per rulelist, tags the snippets that match the query criteria for the loaded rulelist
+        rules, one catagory per rule. The output can be seen in categories (and added to df with categories_df)
+
+        :param print_results_found: Bool, prints the number of matches
+        """
+
+        # the first row is the header, a repeated category name takes the last query as the spark columns would
+        rules = list(dict((row[0], row[1]) for row in self.rulelist[1:]).items())
+        compiled_rules = compile_rules(rules)
+        valid_rules = [(querytitle, rule.pattern) for querytitle, rule in compiled_rules]
+
+        snippets = self.df[self.snippet_field].fillna('').astype(str).tolist()
+        chunks = [snippets[start:start + self.chunk_size] for start in range(0, len(snippets), self.chunk_size)]
+
+        if self.processes == 1:
+            prefilter = RulePrefilter([querystring for _, querystring in valid_rules]) if self.prefilter else None
+            matches = [match_snippets(chunk, compiled_rules, prefilter) for chunk in chunks]
+        else:
+            with Pool(processes=self.processes, initializer=_init_worker,
+                      initargs=(valid_rules, self.prefilter)) as pool:
+                matches = pool.map(_match_chunk, chunks)
+
+        # the match rows are positions within each chunk
+        rows = [np.zeros(0, dtype=np.int64)]
+        cols = [np.zeros(0, dtype=np.int64)]
+        for i, (chunk_rows, chunk_cols) in enumerate(matches):
+            rows.append(chunk_rows + i * self.chunk_size)
+            cols.append(chunk_cols)
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+
+        matrix = sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)),
+                                   shape=(len(snippets), len(compiled_rules)))
+        categories = CategoryMatrix(matrix, [title for title, _ in compiled_rules],
+                                    index=pd.Index(self.df[self.id_field]))
+
+        if print_results_found:
+            for querytitle, count in categories.counts().items():
+                print(querytitle, str(count), 'records found')
+
+        if self.categories is None:
+            self.categories = categories
+        else:
+            self.categories = self.categories.hstack(categories)
+
+        return True
+
+    def categories_df(self):
+        """
+        The df with a 0/1 column per category, the layout the spark Categorizer saves
+
+        :return: Pandas df
+        """
+
+        categories = self.categories.to_df()
+        categories.index = self.df.index
+
+        return pd.concat([self.df.drop(columns=[col for col in categories.columns if col in self.df.columns]),
+                          categories], axis=1)
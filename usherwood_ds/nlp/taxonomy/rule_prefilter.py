@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+"""Skip regex rules that cannot match a snippet, by first looking for the literal text every match of the rule needs"""
+
+import re
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.6"
+
+# syntax the regex module reads differently to (or that is missing from) sre, e.g. sre reads the fuzzy match
+# '(foo){e<=1}' as 'foo' followed by the literal text '{e<=1}', patterns using any of it are always run
+_REGEX_ONLY_SYNTAX = re.compile('|'.join([
+    r'\\[pPLXGKmM]',                               # unicode properties, named lists, graphemes and word boundaries
+    r'\{[^{}]*[^\d,\s{}][^{}]*\}',                 # braces that are not a counted repeat, e.g. fuzzy {e<=1}
+    r'\[(?:\\.|[^\]\\])*?(?:\[|--|&&|\|\||~~)',    # nested sets, posix classes and set operations
+    r'\(\?[a-zA-Z-]*[VbefrwW]',                    # regex module flags, e.g. (?V1) and full case folding (?f)
+    r'\(\?(?:\||R|&|[+-]?\d)',                     # branch reset, recursion and group calls
+]))
+
+_REPEATS = tuple(getattr(sre_parse, op) for op in ['MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT']
+                 if hasattr(sre_parse, op))
+
+
+def required_literals(pattern):
+    """
+    Find literals at least one of which is in any text the pattern matches (ignoring case), e.g.
+    '\\b(pizza|burger)s?\\b' needs 'pizza' or 'burger'. Patterns using syntax only the regex module understands are
+    not analysed
+
+    :param pattern: String regex
+
+    :return: Set of casefolded strings, or None if no literal is required (or the pattern could not be analysed)
+    """
+
+    if _REGEX_ONLY_SYNTAX.search(pattern):
+        return None
+
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+
+    literals = _sequence_literals(parsed)
+    if literals is None:
+        return None
+
+    return set(literal.casefold() for literal in literals)
+
+
+def _sequence_literals(items):
+    """
+    The best required literals of a parsed sequence, each run of literals and each required group in the sequence is a
+    candidate, the candidate whose shortest literal is longest is the most selective
+    """
+
+    candidates = []
+    run = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+
+        if run:
+            candidates.append({''.join(run)})
+            run = []
+
+        literals = None
+        if op is sre_parse.SUBPATTERN:
+            literals = _sequence_literals(av[-1])
+        elif op in _REPEATS:
+            min_repeat, _, item = av
+            if min_repeat >= 1:
+                literals = _sequence_literals(item)
+        elif op is sre_parse.BRANCH:
+            alternatives = [_sequence_literals(alternative) for alternative in av[1]]
+            if all(alternative is not None for alternative in alternatives):
+                literals = set().union(*alternatives)
+        elif op is sre_parse.ASSERT:
+            literals = _sequence_literals(av[1])
+        elif hasattr(sre_parse, 'ATOMIC_GROUP') and op is sre_parse.ATOMIC_GROUP:
+            literals = _sequence_literals(av)
+
+        if literals:
+            candidates.append(literals)
+
+    if run:
+        candidates.append({''.join(run)})
+
+    if not candidates:
+        return None
+
+    return max(candidates, key=lambda literals: (min(len(literal) for literal in literals), -len(literals)))
+
+
+class RulePrefilter:
+    """
+    Finds the rules worth running on a text: the rules with none of their required literals in the text are skipped,
+    rules with no required literals are always run. The literals of every rule are searched for in one pass with an
+    Aho-Corasick automaton (from the pyahocorasick package when it is installed, otherwise each literal is searched
+    for in turn)
+    """
+
+    def __init__(self, patterns):
+        """
+        :param patterns: List of string regexes, the rules
+        """
+
+        self.always = []
+        self.literal_rules = dict()
+        for j, pattern in enumerate(patterns):
+            literals = required_literals(pattern)
+            if literals is None:
+                self.always.append(j)
+                continue
+            for literal in literals:
+                self.literal_rules.setdefault(literal, []).append(j)
+
+        self.literals = list(self.literal_rules.keys())
+
+        self.automaton = None
+        if ahocorasick is not None and self.literals:
+            self.automaton = ahocorasick.Automaton()
+            for i, literal in enumerate(self.literals):
+                self.automaton.add_word(literal, i)
+            self.automaton.make_automaton()
+
+    def candidate_rules(self, text):
+        """
+        :param text: String
+
+        :return: Set of the positions of the rules that may match the text
+        """
+
+        # casefolded like the literals, so 'STRASSE' finds 'straße' and a final 'Σ' finds 'σ'
+        folded = text.casefold()
+
+        if self.automaton is not None:
+            found = set(i for _, i in self.automaton.iter(folded))
+            found = [self.literals[i] for i in found]
+        else:
+            found = [literal for literal in self.literals if literal in folded]
+
+        candidates = set(self.always)
+        for literal in found:
+            candidates.update(self.literal_rules[literal])
+
+        return candidates
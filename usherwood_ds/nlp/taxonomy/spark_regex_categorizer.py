@@ -4,48 +4,94 @@
 
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.6"
-__spark_version__ = "2.1.1"
+__spark_version__ = "3.0"
 
-import pyspark
-from pyspark.sql.functions import udf
-from pyspark.sql.types import IntegerType
+import pandas as pd
 
-import regex
-import csv
+from usherwood_ds.nlp.taxonomy.category_matrix import CategoryMatrix
+from usherwood_ds.nlp.taxonomy.regex_categorizer import read_rule_list, compile_rules, translate_rule_list
+from usherwood_ds.nlp.taxonomy.rule_prefilter import RulePrefilter
 
-from utils.linguistics.text_mining.feature_extraction.categorizer.translate_rules import translate_batch
+# compiled rules and prefilters of each executor process, by rule list
+_compiled_rule_lists = dict()
+
+
+def get_spark_session(master='local[*]', app_name='regex_categorizer', config=None):
+    """
+    Get (or create) a spark session, pyspark is only imported here so importing this module does not start a JVM
+
+    :param master: String, the spark master, 'local[*]' runs on every core of this machine
+    :param app_name: String, the spark app name
+    :param config: Dict of extra spark config settings
+
+    :return: pyspark SparkSession
+    """
+
+    from pyspark.sql import SparkSession
+
+    builder = SparkSession.builder.master(master).appName(app_name)
+    builder = builder.config('spark.sql.execution.arrow.pyspark.enabled', 'true')
+    for key, value in (config or dict()).items():
+        builder = builder.config(key, value)
+
+    return builder.getOrCreate()
+
+
+def match_rule_indices(snippets, rules):
+    """
+    The rules each snippet matches, the rules are compiled once per process
+
+    :param snippets: Pandas series of strings
+    :param rules: Tuple of (category name, query) tuples, all valid
+
+    :return: Pandas series of lists of the positions of the matching rules
+    """
+
+    if rules not in _compiled_rule_lists:
+        _compiled_rule_lists[rules] = (compile_rules(rules, print_errors=False),
+                                       RulePrefilter([querystring for _, querystring in rules]))
+    compiled_rules, prefilter = _compiled_rule_lists[rules]
+
+    matches = []
+    for snippet in snippets.fillna(''):
+        matches.append([j for j in sorted(prefilter.candidate_rules(snippet))
+                        if compiled_rules[j][1].search(snippet) is not None])
+
+    return pd.Series(matches)
 
-sc = pyspark.SparkContext.getOrCreate()
-sql = pyspark.SQLContext(sc)
 
 class Categorizer():
     """
     The parent class for creating and viewing labeled categories on a dataframe of snippets and other metadata
     """
 
-    def __init__(self, df_path, sc=sc, sql=sql, id_field='Url', snippet_field='Cleaned Snippet'):
+    def __init__(self, df_path, spark=None, id_field='Url', snippet_field='Cleaned Snippet'):
         """
-        :param df_path: Pandas df containing cleaned snippets and ids (as a maximum)
-        :param sc: spark context
-        :param sql: spark.sql context
+        :param df_path: Path to a csv containing cleaned snippets and ids (as a maximum)
+        :param spark: pyspark SparkSession, None to get a local one with get_spark_session
         :param id_field: the id field in source df
         :param snippet_field: the field containing the text data to search in
         """
 
+        if spark is None:
+            spark = get_spark_session()
+
         self.df_path = df_path
-        self.sc = sc
-        self.sql = sql
-        self.df = (sql.read
-                   .format("com.databricks.spark.csv")
+        self.spark = spark
+        self.sc = spark.sparkContext
+        self.df = (spark.read
                    .option("header", "true")
-                   .load(self.df_path))
+                   .option("multiLine", "true")
+                   .option("escape", '"')
+                   .csv(self.df_path))
         self.rulelist_filename = None
         self.rulelist = None
         self.id_field = id_field
         self.snippet_field = snippet_field
+        self.categories = []
 
 
-    def load_rule_list(self, rulelist_filename, accents=False):
+    def load_rule_list(self, rulelist_filename, accents=False, translate=False):
         """
         Step - repeatable, loads in a csv rulelist from the hdd. This rulelist should have a header row and be
         formatted into two columns, each row corresponds to one catagory:
@@ -55,56 +101,40 @@ class Categorizer():
         This should be created and saved in utf-8, note this CANNOT BE DONE IN EXCEL, use google docs or text editor
 
         :param rulelist_filename: Filename (and relative path) to the rulelist file.
+        :param accents: Bool, passed to translate_batch
+        :param translate: Bool, translate boolean queries to regex first (see translate_rule_list), by default the
+        rulelist is already regex
         """
         print(rulelist_filename)
 
         self.rulelist_filename = rulelist_filename
-        self.rulelist = []
-
-        outputf = rulelist_filename.replace('.csv','Translated_Regex.csv')
-        translate_batch(rulelist_filename,outputf, accents)
-        # update rulelist filename
-        self.rulelist_filename = outputf
-        rulelist_filename = self.rulelist_filename
-
-        with open(rulelist_filename, 'r', encoding='utf-8') as ofile:
-            reader = ofile.readlines()
-            for row in reader:
-                if len(row) > 0 and row[0] != '#' and not regex.fullmatch('\s+', row):
-                    x = row.split(',', 1)
-                    # removing the new line character that is read in at the very end of each rule
-                    x[-1] = x[-1].replace('\n', '')
-                    self.rulelist += [x]
+
+        if translate:
+            self.rulelist_filename = translate_rule_list(rulelist_filename, accents)
+
+        self.rulelist = read_rule_list(self.rulelist_filename)
 
         print(self.rulelist_filename + ' has been loaded successfully')
 
         return True
 
-    def categorize_rulefile(self, print_results_found=True):
+    def categorize_rulefile(self, print_results_found=True, output_path=None):
         """
         Step - repeatable per rulelist, tags entries in df that match the query criteria for the loaded rulelist
         rules, one catagory per rule. Entries that match are allocated a 1, non-matched entries are given a 0. The
         output can be seen in df
 
         :param print_results_found: Bool, prints the number of matches
+        :param output_path: Path to save df to as parquet, None to not save
         """
 
-        firstline = True
-        for row in self.rulelist:
+        # the first row is the header
+        rules = [(row[0], row[1]) for row in self.rulelist[1:]]
+        self.categorize_rules(rules, print_results_found=print_results_found)
 
-            if firstline:
-                firstline = False
-                continue
-
-            querytitle = row[0]
-            querystring = row[1]
-
-            self.categorize_rule(querytitle=querytitle,
-                                 querystring=querystring,
-                                 print_results_found=print_results_found)
-
-        print('Saving df')
-        self.df.toPandas().to_csv(self.df_path, index=False, encoding='utf-8', quoting=csv.QUOTE_ALL)
+        if output_path is not None:
+            print('Saving df')
+            self.df.write.mode('overwrite').parquet(output_path)
 
         return True
 
@@ -118,17 +148,63 @@ class Categorizer():
         :param print_results_found: Bool, print the number of each category found
         """
 
-        print(querytitle)
+        return self.categorize_rules([(querytitle, querystring)], print_results_found=print_results_found)
+
+    def categorize_rules(self, rules, print_results_found=True):
+        """
+        Categorize a list of rules in one pass, a vectorized (arrow batched) pandas udf finds the rules each snippet
+        matches, then one column per rule is added to df with a 1 or 0, invalid rules receive a 2
+
+        :param rules: List of (category name, query) tuples
+        :param print_results_found: Bool, print the number of each category found
+        """
+
+        from pyspark.sql import functions as F
+        from pyspark.sql.types import ArrayType, IntegerType
+
+        compiled_rules = compile_rules(rules)
+        valid_rules = tuple((querytitle, rule.pattern) for querytitle, rule in compiled_rules)
+        valid_positions = dict((querytitle, j) for j, (querytitle, _) in enumerate(valid_rules))
 
-        try:
-            my_udf = udf(lambda s: 1 if regex.search(querystring, s, flags=regex.IGNORECASE) is not None else 0,
-                         IntegerType())
+        def match(snippets: pd.Series) -> pd.Series:
+            return match_rule_indices(snippets, valid_rules)
+
+        match_udf = F.pandas_udf(match, ArrayType(IntegerType()))
+
+        titles = list(dict.fromkeys(querytitle for querytitle, _ in rules))
+        columns = []
+        for querytitle in titles:
+            if querytitle in valid_positions:
+                columns.append(F.array_contains('_matches', valid_positions[querytitle]).cast('int').alias(querytitle))
+            else:
+                columns.append(F.lit(2).alias(querytitle))
+
+        self.df = (self.df
+                   .withColumn('_matches', match_udf(F.col(self.snippet_field)))
+                   .select([F.col('`' + col + '`') for col in self.df.columns if col not in titles] + columns))
+        for querytitle in titles:
+            if querytitle not in self.categories:
+                self.categories.append(querytitle)
+
+        if print_results_found:
+            counts = self.df.agg(*[F.sum(F.when(F.col('`' + querytitle + '`') == 1, 1).otherwise(0)).alias(querytitle)
+                                   for querytitle in titles]).collect()[0]
+            for querytitle in titles:
+                print(querytitle, str(counts[querytitle]), 'records found')
+
+        return True
+
+    def to_category_matrix(self):
+        """
+        Collect the categorized columns as a sparse category matrix indexed by id_field
+
+        :return: CategoryMatrix
+        """
 
-            self.df = self.df.withColumn(querytitle, my_udf('Snippet'))
-            if print_results_found:
-                print(str(self.df.select(querytitle).rdd.flatMap(list).sum()), 'records found')
-            return True
-        except Exception as e:
-            print(e)
+        from pyspark.sql import functions as F
 
+        df = (self.df.select([F.col('`' + col + '`') for col in [self.id_field] + self.categories])
+              .toPandas().set_index(self.id_field))
+        df = df.apply(lambda column: column == 1)
 
+        return CategoryMatrix.from_df(df, columns=self.categories)
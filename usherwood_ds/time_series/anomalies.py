@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+"""Anomaly detection over many time series at once, e.g. the weekly volumes of every category as a date x category
+matrix"""
+
+import numpy as np
+import pandas as pd
+
+__author__ = "Peter J Usherwood"
+__python_version__ = "3.5"
+
+
+def as_matrix(y):
+    """
+    :param y: Pandas series or df, or np array of one series (dates) or many (dates x series)
+
+    :return: np array of float (dates x series)
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    if y.ndim == 1:
+        y = y.reshape(-1, 1)
+
+    return y
+
+
+def moving_averages(y, window_size):
+    """
+    Centred moving average of every series, the same as np.convolve(series, np.ones(window_size) / window_size,
+    'same'): the window is cut short (and still divided by window_size) at the ends
+
+    :param y: Pandas series or df, or np array (dates x series)
+    :param window_size: Int, rolling window size
+
+    :return: np array (dates x series)
+    """
+
+    y = as_matrix(y)
+    window_size = int(window_size)
+    n_dates = len(y)
+
+    # the window of date i covers dates i + half - window_size + 1 to i + half
+    half = (window_size - 1) // 2
+    cumulative = np.vstack([np.zeros((1, y.shape[1])), np.cumsum(y, axis=0)])
+    ends = np.minimum(np.arange(n_dates) + half, n_dates - 1) + 1
+    starts = np.maximum(np.arange(n_dates) + half - window_size + 1, 0)
+
+    return (cumulative[ends] - cumulative[starts]) / float(window_size)
+
+
+def stationary_stds(residuals):
+    """
+    :param residuals: np array (dates x series)
+
+    :return: np array (series), the standard deviation of each series
+    """
+
+    return np.std(residuals, axis=0)
+
+
+def rolling_stds(residuals, window_size):
+    """
+    Trailing rolling standard deviation (ddof 1) of every series, the first window_size - 1 dates (which have no full
+    window) take the first full window's value. Rounded to 3 decimal places
+
+    :param residuals: np array (dates x series)
+    :param window_size: Int, rolling window size
+
+    :return: np array (dates x series)
+    """
+
+    stds = pd.DataFrame(residuals).rolling(int(window_size)).std().to_numpy(copy=True)
+    if len(stds) >= window_size:
+        stds[:window_size - 1] = stds[window_size - 1]
+
+    return np.round(stds, 3)
+
+
+def detect_anomalies(y, window_size, sigma=1.0, rolling_std=False):
+    """
+    Flag the points further than sigma standard deviations of the residual from the centred moving average, for every
+    series at once
+
+    :param y: Pandas series or df, or np array of one series (dates) or many (dates x series)
+    :param window_size: Int, rolling window size
+    :param sigma: Float, number of standard deviations from the moving average that is an anomaly
+    :param rolling_std: Bool, use the rolling standard deviation of the residual rather than its stationary standard
+    deviation
+
+    :return: Dict of np arrays (dates x series): 'anomalies' bools, 'z_scores' residuals in standard deviations,
+    'moving_average', 'standard_deviation' (per date), and 'stationary_standard_deviation' (per series)
+    """
+
+    y = as_matrix(y)
+
+    averages = moving_averages(y, window_size)
+    residuals = y - averages
+    stationary = stationary_stds(residuals)
+
+    if rolling_std:
+        stds = rolling_stds(residuals, window_size)
+    else:
+        stds = np.broadcast_to(stationary, y.shape)
+
+    anomalies = (y > averages + (sigma * stds)) | (y < averages - (sigma * stds))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_scores = residuals / stds
+
+    return {'anomalies': anomalies,
+            'z_scores': z_scores,
+            'moving_average': averages,
+            'standard_deviation': np.array(stds),
+            'stationary_standard_deviation': stationary}
+
+
+class StreamingAnomalyDetector:
+    """
+    Flags anomalies in many series as each new point (e.g. week) arrives. Each point is compared with the mean and
+    standard deviation (ddof 1) of the window_size points before it, the running sums of the window are updated per
+    point so history is never recomputed
+    """
+
+    def __init__(self, n_series, window_size, sigma=1.0):
+        """
+        :param n_series: Int, number of series (e.g. categories)
+        :param window_size: Int, number of previous points to compare each point with
+        :param sigma: Float, number of standard deviations from the window mean that is an anomaly
+        """
+
+        self.window_size = int(window_size)
+        self.sigma = sigma
+        self.window = np.zeros((self.window_size, n_series))
+        self.sums = np.zeros(n_series)
+        self.squared_sums = np.zeros(n_series)
+        self.n_points = 0
+
+    def update(self, values):
+        """
+        Test the next point of every series then add it to the window
+
+        :param values: List or np array (series), the new point of each series
+
+        :return: Tuple of np arrays (series), anomaly bools and z-scores (nan until the window has 2 points)
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        count = min(self.n_points, self.window_size)
+
+        if count >= 2:
+            means = self.sums / count
+            variances = np.clip((self.squared_sums - count * means ** 2) / (count - 1), 0, None)
+            stds = np.sqrt(variances)
+            anomalies = (values > means + (self.sigma * stds)) | (values < means - (self.sigma * stds))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z_scores = (values - means) / stds
+        else:
+            anomalies = np.zeros(len(values), dtype=bool)
+            z_scores = np.full(len(values), np.nan)
+
+        position = self.n_points % self.window_size
+        if self.n_points >= self.window_size:
+            self.sums -= self.window[position]
+            self.squared_sums -= self.window[position] ** 2
+        self.window[position] = values
+        self.sums += values
+        self.squared_sums += values ** 2
+        self.n_points += 1
+
+        return anomalies, z_scores
+
+    def update_many(self, y):
+        """
+        Feed several points of every series in order
+
+        :param y: Pandas df or np array (dates x series)
+
+        :return: Tuple of np arrays (dates x series), anomaly bools and z-scores
+        """
+
+        results = [self.update(values) for values in as_matrix(y)]
+
+        return np.array([anomalies for anomalies, _ in results]), np.array([z_scores for _, z_scores in results])
@@ -5,30 +5,96 @@
 import numpy as np
 import pandas as pd
 import collections
-from itertools import count
+from scipy import sparse
+
+from usherwood_ds.nlp.taxonomy.category_matrix import CategoryMatrix
+from usherwood_ds.time_series.anomalies import moving_averages, detect_anomalies
 
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.5"
 
 
+DAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def day_hour_slots(df):
+    """
+    The day of week x hour of day slot (day * 24 + hour) of every mention
+
+    :param df: Pandas df with 'when: Day of Week' (0 is Monday) and 'when: Hour of Day' columns
+
+    :return: np array of ints, -1 where the day or hour is missing or out of range
+    """
+
+    days = df['when: Day of Week'].values.astype(float)
+    hours = df['when: Hour of Day'].values.astype(float)
+
+    valid = (days >= 0) & (days <= 6) & (hours >= 0) & (hours <= 23)
+    slots = np.full(len(df), -1, dtype=np.int64)
+    slots[valid] = days[valid].astype(np.int64) * 24 + hours[valid].astype(np.int64)
+
+    return slots
+
+
 def day_of_week_and_hour_cross(df, dependent_variable):
+    """
+    The total of a variable in each hour of each day of the week
+
+    :param df: Pandas df with 'when: Day of Week' (0 is Monday) and 'when: Hour of Day' columns
+    :param dependent_variable: String, 'Volume' to count the mentions, otherwise the column to sum
+
+    :return: Pandas df, days (Mon to Sun) x hours (0 to 23)
+    """
+
+    slots = day_hour_slots(df)
+    valid = slots >= 0
 
     if dependent_variable == 'Volume':
-        cross = pd.get_dummies(df['when: Day of Week']).T.dot(pd.get_dummies(df['when: Hour of Day']))
+        cross = np.bincount(slots[valid], minlength=7 * 24)
     else:
-        cross = (pd.get_dummies(df['when: Day of Week']).multiply(df[dependent_variable], axis="index")).T.\
-            dot(pd.get_dummies(df['when: Hour of Day']).multiply(df[dependent_variable], axis="index"))
+        weights = np.nan_to_num(df[dependent_variable].values.astype(float))
+        cross = np.bincount(slots[valid], weights=weights[valid], minlength=7 * 24)
 
-    for i in list(set(range(24)) - set(cross.columns)):
-        cross.insert(1, i, np.zeros(len(cross)))
-    for i in list(set(range(7)) - set(cross.index)):
-        cross = cross.append(pd.DataFrame([np.zeros(len(cross.columns)).tolist()], columns=cross.columns, index=[i]))
-    cross = cross.sort_index(1)
-    cross = cross.sort_index(0)
+    return pd.DataFrame(cross.reshape(7, 24), index=DAY_NAMES, columns=range(24))
 
-    cross.index = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
 
-    return cross
+def day_of_week_and_hour_crosses(df, dependent_variable, segment_col=None, cats=None):
+    """
+    day_of_week_and_hour_cross for every segment (values of a column) or every category, in one pass
+
+    :param df: Pandas df with 'when: Day of Week' (0 is Monday) and 'when: Hour of Day' columns
+    :param dependent_variable: String, 'Volume' to count the mentions, otherwise the column to sum
+    :param segment_col: String, the column whose values are the segments (e.g. client)
+    :param cats: List of 0/1 category columns, used when segment_col is None (a mention can be in many)
+
+    :return: Dict of segment or category: Pandas df, days (Mon to Sun) x hours (0 to 23)
+    """
+
+    slots = day_hour_slots(df)
+    valid = slots >= 0
+
+    if dependent_variable == 'Volume':
+        weights = np.ones(len(df))
+    else:
+        weights = np.nan_to_num(df[dependent_variable].values.astype(float))
+
+    if segment_col is not None:
+        codes, segments = pd.factorize(df[segment_col])
+        valid &= codes >= 0
+        crosses = np.bincount(codes[valid] * 7 * 24 + slots[valid], weights=weights[valid],
+                              minlength=len(segments) * 7 * 24).reshape(len(segments), 7 * 24)
+    else:
+        segments = cats
+        slot_matrix = sparse.csr_matrix((weights[valid], (np.flatnonzero(valid), slots[valid])),
+                                        shape=(len(df), 7 * 24))
+        categories = CategoryMatrix.from_df(df[cats].eq(1), columns=cats).matrix.astype(np.float64)
+        crosses = categories.T.dot(slot_matrix).toarray()
+
+    if dependent_variable == 'Volume':
+        crosses = crosses.astype(np.int64)
+
+    return dict((segment, pd.DataFrame(crosses[i].reshape(7, 24), index=DAY_NAMES, columns=range(24)))
+                for i, segment in enumerate(segments))
 
 
 def create_cat_summary_table(df,
@@ -37,60 +103,105 @@ def create_cat_summary_table(df,
                              sentiment_column_key='Sentiment',
                              reach_column_key='Reach',
                              categorical_sentiment=True):
+    """
+    Weekly summary of one category, see create_cat_summary_tables
+
+    :return: Pandas df, one row per week
+    """
+
+    return create_cat_summary_tables(df,
+                                     year_list=year_list,
+                                     cats=[cat],
+                                     sentiment_column_key=sentiment_column_key,
+                                     reach_column_key=reach_column_key,
+                                     categorical_sentiment=categorical_sentiment)[cat]
+
+
+def create_cat_summary_tables(df,
+                              year_list,
+                              cats,
+                              sentiment_column_key='Sentiment',
+                              reach_column_key='Reach',
+                              categorical_sentiment=True):
+    """
+    Weekly volume, sentiment and reach of many categories at once. Every mention is assigned to a (year, week) slot,
+    then each summary column is one sparse product of the slots with the category matrix. Week 0 of every year but the
+    first is counted in week 52 of the year before (except the sentiment dummies, which it is left out of)
+
+    :param df: Pandas df of mentions with 'when: Year', 'when: Week' and 0/1 category columns
+    :param year_list: List of the years to summarise
+    :param cats: List of the category columns
+    :param sentiment_column_key: String, the name of the sentiment column
+    :param reach_column_key: String, the name of the reach column
+    :param categorical_sentiment: Bool, add the weekly count of each sentiment value
+
+    :return: Dict of category: pandas df, one row per week
+    """
+
+    n_years = len(year_list)
+
+    year_positions = pd.Index(year_list).get_indexer(df['when: Year'])
+    week_numbers = df['when: Week'].values.astype(float)
+    in_range = (year_positions >= 0) & (week_numbers >= 0) & (week_numbers <= 52) & (week_numbers % 1 == 0)
+
+    rows = np.flatnonzero(in_range)
+    year_positions = year_positions[rows]
+    week_numbers = week_numbers[rows].astype(int)
+
+    slots = year_positions * 53 + week_numbers
+    rollover = (week_numbers == 0) & (year_positions > 0)
+    slots[rollover] -= 1
+
+    categories = CategoryMatrix.from_df(df[cats].eq(1), columns=cats).matrix.astype(np.float64)
 
+    def weekly_sums(values, include_rollover=True):
+        keep = slice(None) if include_rollover else ~rollover
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64)[rows][keep])
+        slot_matrix = sparse.csr_matrix((values, (slots[keep], rows[keep])), shape=(n_years * 53, len(df)))
+        return slot_matrix.dot(categories).toarray()
+
+    def column_sums(column_key):
+        if column_key not in df.columns:
+            return np.zeros((n_years * 53, len(cats)), dtype=np.int64)
+        sums = weekly_sums(df[column_key].values)
+        if df[column_key].dtype.kind in 'biu':
+            sums = sums.astype(np.int64)
+        return sums
+
+    volumes = weekly_sums(np.ones(len(df))).astype(np.int64)
+    sentiments = column_sums(sentiment_column_key)
+    reach = column_sums(reach_column_key)
+
+    sent_cols = []
+    cat_sentiments = []
     if categorical_sentiment:
-        sent_cols = []
-        cat_sentiments = []
         sents = pd.get_dummies(df[sentiment_column_key])
         for col in sents.columns:
-            sents.rename(columns={col:'Sentiment ' + str(col)}, inplace=True)
             sent_cols += ['Sentiment ' + str(col)]
-            cat_sentiments.append([])
-        df = pd.concat([df, sents], axis=1)
-
-    volumes = []
-    sentiments = []
-    reach = []
-    weeks = []
-    years = []
-    combi_id = []
-
-    if sentiment_column_key not in df.columns:
-        df[sentiment_column_key] = 0
-    if reach_column_key not in df.columns:
-        df[reach_column_key] = 0
-
-    for year in year_list:
-        for week in range(0, 53):
-            sub = df[(df['when: Year'] == year) & (df['when: Week'] == week) & (df[cat] == 1)]
-
-            if week == 0 and year != year_list[0]:
-                volumes[len(volumes) - 1] += len(sub)
-                sentiments[len(sentiments) - 1] += sub[sentiment_column_key].sum()
-                reach[len(reach) - 1] += sub[reach_column_key].sum()
-            else:
-                volumes.append(len(sub))
-                reach.append(sub[reach_column_key].sum())
-                sentiments.append(sub[sentiment_column_key].sum())
-
-                if categorical_sentiment:
-                    for i, col in enumerate(sent_cols):
-                        cat_sentiments[i].append(sub[col].sum())
-
-                weeks += [week]
-                years += [year]
-                combi_id += [int(str(year) + str(week))]
-
-    summary = pd.DataFrame(np.array([combi_id, years, weeks, volumes, sentiments, reach]).T,
-                           columns=['ID', 'Year', 'Week', 'Volume', 'Sentiment', 'Reach'])
+            cat_sentiments.append(weekly_sums(sents[col].values, include_rollover=False).astype(np.int64))
 
-    if categorical_sentiment:
-        cat_sents_df = pd.DataFrame(np.array(cat_sentiments).T, columns=sent_cols)
+    # week 0 is only its own row in the first year
+    output_slots = np.array([year * 53 + week for year in range(n_years) for week in range(53)
+                             if week > 0 or year == 0], dtype=int)
+    years = [year_list[slot // 53] for slot in output_slots]
+    weeks = [slot % 53 for slot in output_slots]
+    combi_id = [int(str(year) + str(week)) for year, week in zip(years, weeks)]
+
+    summaries = dict()
+    for j, cat in enumerate(cats):
+        summary = pd.DataFrame(np.array([combi_id, years, weeks, volumes[output_slots, j],
+                                         sentiments[output_slots, j], reach[output_slots, j]]).T,
+                               columns=['ID', 'Year', 'Week', 'Volume', 'Sentiment', 'Reach'])
+
+        if categorical_sentiment:
+            cat_sents_df = pd.DataFrame(np.array([sums[output_slots, j] for sums in cat_sentiments]).T,
+                                        columns=sent_cols)
+            summary = pd.concat([summary, cat_sents_df], axis=1)
 
-    summary = pd.concat([summary, cat_sents_df], axis=1)
+        summary['Week Cumm'] = np.arange(len(summary))
+        summaries[cat] = summary
 
-    summary['Week Cumm'] = np.arange(len(summary))
-    return summary
+    return summaries
 
 
 def moving_average(data, window_size):
@@ -103,9 +214,7 @@ def moving_average(data, window_size):
     :returns: ndarray of linear convolution
     """
 
-    window = np.ones(int(window_size)) / float(window_size)
-    rolling_avg = np.convolve(data, window, 'same')
-    return rolling_avg
+    return moving_averages(data, window_size)[:, 0]
 
 
 def explain_anomalies(y, window_size, sigma=1.0):
@@ -121,16 +230,12 @@ def explain_anomalies(y, window_size, sigma=1.0):
         containing information about the points indentified as anomalies
     """
 
-    avg = moving_average(y, window_size).tolist()
-    residual = y - avg
-    std = np.std(residual)
+    events = detect_anomalies(y, window_size, sigma=sigma)
+    positions = np.flatnonzero(events['anomalies'][:, 0])
+    values = np.asarray(y)[positions]
 
-    anomalies_dict = collections.OrderedDict([(index, y_i) for
-                                              index, y_i, avg_i in zip(count(), y, avg)
-                                              if (y_i > avg_i + (sigma * std)) | (y_i < avg_i - (sigma * std))])
-
-    master_dict = {'standard_deviation': round(std, 3),
-                   'anomalies_dict': anomalies_dict}
+    master_dict = {'standard_deviation': round(events['stationary_standard_deviation'][0], 3),
+                   'anomalies_dict': collections.OrderedDict(zip(positions.tolist(), values.tolist()))}
     return master_dict
 
 
@@ -147,21 +252,13 @@ def explain_anomalies_rolling_std(y, window_size, sigma=1.0):
         a dict (dict of 'standard_deviation': int, 'anomalies_dict': (index: value))
         containing information about the points indentified as anomalies
     """
-    avg = moving_average(y, window_size)
-    avg_list = avg.tolist()
-    residual = y - avg
-    # Calculate the variation in the distribution of the residual
-    testing_std = pd.rolling_std(residual, window_size)
-    testing_std_as_df = pd.DataFrame(testing_std)
-    rolling_std = testing_std_as_df.replace(np.nan,
-                                            testing_std_as_df.ix[window_size - 1]).round(3).iloc[:, 0].tolist()
-    std = np.std(residual)
-    return {'stationary standard_deviation': round(std, 3),
-            'anomalies_dict': collections.OrderedDict([(index, y_i)
-                                                       for index, y_i, avg_i, rs_i in zip(count(),
-                                                                                          y, avg_list, rolling_std)
-                                                       if (y_i > avg_i + (sigma * rs_i)) | (
-                                                       y_i < avg_i - (sigma * rs_i))])}
+
+    events = detect_anomalies(y, window_size, sigma=sigma, rolling_std=True)
+    positions = np.flatnonzero(events['anomalies'][:, 0])
+    values = np.asarray(y)[positions]
+
+    return {'stationary standard_deviation': round(events['stationary_standard_deviation'][0], 3),
+            'anomalies_dict': collections.OrderedDict(zip(positions.tolist(), values.tolist()))}
 
 
 def plot_anomalies_and_ts(x,
@@ -210,32 +307,145 @@ def plot_anomalies_and_ts(x,
     return ax
 
 
+class WeekRowIndex:
+    """
+    Lookup of the rows of df in each (year, week, category), built once and shared across categories. The rows of each
+    category are sorted by week so a lookup is a binary search
+    """
+
+    def __init__(self, df, cats):
+        """
+        :param df: Pandas df of mentions with 'when: Year', 'when: Week' and 0/1 category columns
+        :param cats: List of the category columns
+        """
+
+        years = df['when: Year'].values.astype(float)
+        weeks = df['when: Week'].values.astype(float)
+        keys = years * 53 + weeks
+
+        self.rows = dict()
+        self.keys = dict()
+        for cat in cats:
+            cat_rows = np.flatnonzero((df[cat].values == 1) & ~np.isnan(keys))
+            order = np.argsort(keys[cat_rows], kind='mergesort')
+            self.rows[cat] = cat_rows[order]
+            self.keys[cat] = keys[cat_rows][order]
+
+    def week_rows(self, cat, year, week):
+        """
+        :param cat: String, the category
+        :param year: Int
+        :param week: Int, week 52 also includes week 0 of the next year
+
+        :return: np array of the row positions
+        """
+
+        keys = self.keys[cat]
+        start, end = np.searchsorted(keys, [year * 53 + week, year * 53 + week + 1])
+        rows = self.rows[cat][start:end]
+
+        if week == 52:
+            start, end = np.searchsorted(keys, [(year + 1) * 53, (year + 1) * 53 + 1])
+            rows = np.concatenate([rows, self.rows[cat][start:end]])
+
+        return rows
+
+
+def top_values_per_anomaly(df, row_index, cat, weeks, years, fields, top_n=20):
+    """
+    The most common values of fields (e.g. snippets and authors) in each anomalous week of a category, from one grouped
+    value_counts per field
+
+    :param df: Pandas df of mentions
+    :param row_index: WeekRowIndex of df
+    :param cat: String, the category
+    :param weeks: List of the anomalous weeks
+    :param years: List of the years of the anomalous weeks
+    :param fields: List of the columns to count
+    :param top_n: Int, number of values to keep per anomaly
+
+    :return: Pandas df with columns 'Anomaly' (position in weeks), 'Year', 'Week', 'Field', 'Value' and 'Count'
+    """
+
+    anomaly_rows = [row_index.week_rows(cat, year, week) for year, week in zip(years, weeks)]
+    rows = np.concatenate(anomaly_rows) if anomaly_rows else np.zeros(0, dtype=int)
+    anomalies = np.repeat(np.arange(len(anomaly_rows)), [len(r) for r in anomaly_rows])
+
+    tops = []
+    for field in fields:
+        values = pd.DataFrame({'Anomaly': anomalies, 'Value': df[field].values[rows]})
+        counts = values.groupby('Anomaly')['Value'].value_counts().rename('Count').reset_index()
+        counts = counts.sort_values(['Anomaly', 'Count'], ascending=[True, False], kind='mergesort')
+        counts = counts.groupby('Anomaly').head(top_n)
+        counts.insert(1, 'Field', field)
+        tops.append(counts)
+
+    tops = pd.concat(tops, ignore_index=True) if tops else pd.DataFrame(columns=['Anomaly', 'Field', 'Value', 'Count'])
+    tops.insert(1, 'Year', np.asarray(years)[tops['Anomaly'].values.astype(int)] if len(tops) else [])
+    tops.insert(2, 'Week', np.asarray(weeks)[tops['Anomaly'].values.astype(int)] if len(tops) else [])
+
+    return tops
+
+
 def get_top_snippets_and_authors_per_anomoly_for_cat(cat,
                                                      summaries,
                                                      df,
-                                                     snippet_key_field='Snippet'):
+                                                     snippet_key_field='Snippet',
+                                                     row_index=None,
+                                                     top_n=20):
+    """
+    The top snippets and authors of each anomalous week of a category
+
+    :param cat: String, the category
+    :param summaries: Dict of category: summary df with 'Anomaly', 'Year' and 'Week' columns
+    :param df: Pandas df of mentions
+    :param snippet_key_field: String, the snippet column
+    :param row_index: WeekRowIndex of df covering cat, build it once to reuse it across categories
+    :param top_n: Int, number of snippets and authors to keep per anomaly
+
+    :return: Lists of the top snippets and top authors (value_counts series) per anomaly, the weeks and the years
+    """
 
     weeks = summaries[cat][summaries[cat]['Anomaly'] == True]['Week'].tolist()
     years = summaries[cat][summaries[cat]['Anomaly'] == True]['Year'].tolist()
 
+    if row_index is None:
+        row_index = WeekRowIndex(df, [cat])
+
+    tops = top_values_per_anomaly(df, row_index, cat, weeks, years, [snippet_key_field, 'Username'], top_n=top_n)
+
+    # split the long table once by anomaly and field, anomalies without mentions get empty series
+    grouped = dict((key, top) for key, top in tops.groupby(['Anomaly', 'Field'], sort=False))
+    empty = tops.iloc[:0]
+
     top_snippets = []
     top_authors = []
-
     for i in range(len(weeks)):
+        for field, top_list in [(snippet_key_field, top_snippets), ('Username', top_authors)]:
+            top = grouped.get((i, field), empty)
+            top_list.append(pd.Series(top['Count'].values, index=pd.Index(top['Value'].values, name=field),
+                                      name='count'))
 
-        week = weeks[i]
-        year = years[i]
+    return top_snippets, top_authors, weeks, years
 
-        if week == 52:
-            sub = df[(df['when: Year'] == year) & (df['when: Week'] == week) & (df[cat] == 1)]
-            sub.append(df[(df['when: Year'] == year + 1) & (df['when: Week'] == 0) & (df[cat] == 1)])
-        else:
-            sub = df[(df['when: Year'] == year) & (df['when: Week'] == week) & (df[cat] == 1)]
 
-        top_snippets.append(sub[snippet_key_field].value_counts()[:20])
-        top_authors.append(sub['Username'].value_counts()[:20])
+def save_top_values_per_anomaly(tops, filepath, sheet_name='Anomalies'):
+    """
+    Write the output of top_values_per_anomaly (for one or many categories concatenated) in one go
 
-    return top_snippets, top_authors, weeks, years
+    :param tops: Pandas df
+    :param filepath: String filepath, .parquet for parquet otherwise an excel file
+    :param sheet_name: String, the excel sheet name
+
+    :return: True
+    """
+
+    if filepath.endswith('.parquet'):
+        tops.astype({'Value': str}).to_parquet(filepath, index=False)
+    else:
+        tops.to_excel(filepath, sheet_name=sheet_name, index=False)
+
+    return True
 
 
 def create_excel_for_one_cat(writer,
@@ -2,16 +2,33 @@
 
 """Convert a gmt time column in a pandas dataframe to a local time specified by a secondary column."""
 
+from functools import lru_cache
+
 from dateutil import tz
-import progressbar
+import numpy as np
+import pandas as pd
 
 __author__ = "Peter J Usherwood"
 __python_version__ = "3.6"
 
 
+@lru_cache(maxsize=None)
+def get_zone(zone):
+    """
+    Cached tz.gettz
+
+    :param zone: Str, zone name (e.g. 'America/Sao_Paulo')
+
+    :return: dateutil tzinfo, None if the zone is unknown
+    """
+
+    return tz.gettz(zone)
+
+
 def df_convert_gmt_to_local(df, gmt_col='Date (GMT)', zone_col='Date (Local - Zone)', output_col='Date (Local)'):
     """
-    Convert a gmt time to a local time using a specified zone, all in a pandas df
+    Convert a gmt time to a local time using a specified zone, all in a pandas df. The rows of each zone are converted
+    together, rows without a zone keep the gmt time and rows with an unknown zone (which is printed) are left empty
 
     :param df: Pandas dataframe
     :param gmt_col: Str, column name of column containing gmt
@@ -19,23 +36,21 @@ def df_convert_gmt_to_local(df, gmt_col='Date (GMT)', zone_col='Date (Local - Zo
     :param output_col: Str, name of output column
     """
 
-    with progressbar.ProgressBar(max_value=len(df)) as bar:
-        for i in range(len(df)):
-
-            gmt_time = df[gmt_col].iloc[i]
-            #print(type(gmt_time))
-            zone = df[zone_col].iloc[i]
-
-            if gmt_time is not None:
-                if (zone is None) or (zone == 'nan'):
-                    df.set_value(index=i, col=output_col, value=gmt_time)
-                else:
-                    try:
-                        to_zone = tz.gettz(zone)
-                        original_time = gmt_time.replace(tzinfo=tz.gettz('UTC'))
-                        local = original_time.astimezone(to_zone)
-                        df[output_col] = local
-                    except Exception as e:
-                        print(zone)
-                        print(gmt_time)
-            bar.update(i)
+    gmt = pd.to_datetime(df[gmt_col], utc=True)
+    zones = df[zone_col]
+
+    has_time = gmt.notna().values
+    no_zone = (zones.isna() | (zones.astype(str) == 'nan')).values
+
+    local = np.full(len(df), None, dtype=object)
+    local[has_time & no_zone] = df[gmt_col].values[has_time & no_zone]
+
+    with_zone = pd.Series(np.flatnonzero(has_time & ~no_zone))
+    for zone, positions in with_zone.groupby(zones.values[with_zone.values]):
+        to_zone = get_zone(zone)
+        if to_zone is None:
+            print(zone)
+            continue
+        local[positions.values] = list(gmt.iloc[positions.values].dt.tz_convert(to_zone))
+
+    df[output_col] = pd.Series(local, index=df.index).infer_objects()
@@ -16,6 +16,8 @@ import progressbar
 
 from usherwood_ds.data_imports.twitter_import import create_twitter_user_df
 from usherwood_ds.data_imports.twitter_api.api_class import TwitterAPI
+from usherwood_ds.data_imports.import_classes.common_classes import RecordColumns
+from usherwood_ds.data_imports.import_classes.twitter_classes import TwitterUser
 
 
 def influencer_identification(handles,
@@ -119,9 +121,9 @@ def fortify_tm_without_engamements(handles, api, save_path=''):
 
     print(TM_SIZE)
 
-    target_market_arr = []
+    target_market_arr = RecordColumns(TwitterUser.fields)
     for user in users:
-        target_market_arr += [api.parse_user_to_twitter_user(user)]
+        target_market_arr.append(api.parse_user_to_twitter_user(user))
 
     target_market = create_twitter_user_df(target_market_arr)
 
@@ -173,9 +175,9 @@ def fortify_tm_with_previous_posts(handles, api, max_tweets=100, save_path=''):
             print(e)
 
 
-    target_market_arr = []
+    target_market_arr = RecordColumns(TwitterUser.fields)
     for user in users:
-        target_market_arr += [api.parse_user_to_twitter_user(user)]
+        target_market_arr.append(api.parse_user_to_twitter_user(user))
 
     target_market = create_twitter_user_df(target_market_arr)
     target_market['Engagements in Past 100 Tweets'] = engagements
@@ -249,9 +251,9 @@ def get_amplification_influencers(TM_SIZE,
     influencers = influencers[:TOP_X_CONNECTED]
     influencers_jsons = api.fortify_twitter_users_batch(user_ids=influencers['Twitter Author ID'].values.tolist())
 
-    influencers_arr = []
+    influencers_arr = RecordColumns(TwitterUser.fields)
     for user in influencers_jsons:
-        influencers_arr += [api.parse_user_to_twitter_user(user)]
+        influencers_arr.append(api.parse_user_to_twitter_user(user))
 
     influencers_fort = create_twitter_user_df(influencers_arr)
 
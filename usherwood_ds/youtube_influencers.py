@@ -14,6 +14,8 @@ from scipy.stats import percentileofscore
 import progressbar
 
 from usherwood_ds.data_imports.youtube_api.api_class import YoutubeAPI
+from usherwood_ds.data_imports.import_classes.common_classes import RecordColumns
+from usherwood_ds.data_imports.import_classes.youtube_classes import YoutubeTextComment, YoutubeUser
 from usherwood_ds.data_imports.youtube_import import create_youtube_user_df, create_youtube_comment_df
 
 import warnings
@@ -82,9 +84,9 @@ def retrieve_similar_influencer_auidence(api,
         comments += api.get_video_comments(video_id, num_comments=num_comments)
         print(str(len(comments)), 'comments found.')
 
-    parsed_comments = []
+    parsed_comments = RecordColumns(YoutubeTextComment.fields)
     for comment in comments:
-        parsed_comments += [api.parse_comment_to_youtube_comment(comment)]
+        parsed_comments.append(api.parse_comment_to_youtube_comment(comment))
     df_comments = create_youtube_comment_df(parsed_comments)
 
     target_market_ids = pd.DataFrame(df_comments['Youtube Author ID'].value_counts().index,
@@ -105,19 +107,17 @@ def fortify_tm_without_engamements(tm_ids, api, save_path=''):
     :return: target_market - pandas df of fortified Youtube users
     """
 
-    channels = []
-    for idx in tm_ids['Youtube Channel ID'].tolist():
-        json_response = api.fortify_channel(channel_id=idx, fortify_with='snippet,statistics')
-        if json_response.pop('found', True) is not False:
-            channels.append(json_response)
+    channels = [channel for channel in api.fortify_channels_batch(tm_ids['Youtube Channel ID'].tolist(),
+                                                                  fortify_with='snippet,statistics')
+                if channel.pop('found', True) is not False]
 
     TM_SIZE = len(channels)
 
     print(TM_SIZE)
 
-    target_market_arr = []
+    target_market_arr = RecordColumns(YoutubeUser.fields)
     for user in channels:
-        target_market_arr += [api.parse_user_to_youtube_user(user)]
+        target_market_arr.append(api.parse_user_to_youtube_user(user))
 
     target_market = create_youtube_user_df(target_market_arr)
 
@@ -183,15 +183,13 @@ def get_amplification_influencers(TM_SIZE,
 
     influencers = influencers[:TOP_X_CONNECTED]
 
-    influencers_jsons = []
-    with progressbar.ProgressBar(max_value=len(influencers['Youtube Author ID'])) as bar:
-        for i, idx in enumerate(influencers['Youtube Author ID'].values.tolist()):
-            influencers_jsons += [api.fortify_channel(channel_id=idx, fortify_with='snippet,statistics')]
-            bar.update(i)
+    influencers_jsons = [channel for channel in api.fortify_channels_batch(
+                             influencers['Youtube Author ID'].values.tolist(), fortify_with='snippet,statistics')
+                         if channel.pop('found', True) is not False]
 
-    influencers_arr = []
+    influencers_arr = RecordColumns(YoutubeUser.fields)
     for user in influencers_jsons:
-        influencers_arr += [api.parse_user_to_youtube_user(user)]
+        influencers_arr.append(api.parse_user_to_youtube_user(user))
 
     influencers_fort = create_youtube_user_df(influencers_arr)
 